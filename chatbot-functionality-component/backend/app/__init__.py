@@ -1,31 +1,95 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
 import os
+import threading
 
 db = SQLAlchemy()
 
-def create_app():
+def _env_flag(name, default):
+    """Read a boolean setting from the environment."""
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+def _engine_options(database_uri):
+    """Build SQLAlchemy engine options from environment variables.
+
+    Server databases get a sized connection pool with pre-ping and recycling;
+    PostgreSQL additionally gets a per-statement timeout. SQLite only gets a
+    busy timeout, since its pools do not take sizing options.
+
+    Args:
+        database_uri (str): Database URI the engine is created for
+
+    Returns:
+        dict: Options for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    backend = make_url(database_uri).get_backend_name()
+    if backend == 'sqlite':
+        return {'connect_args': {'timeout': float(os.getenv('DB_BUSY_TIMEOUT', '30'))}}
+
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '20')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _env_flag('DB_POOL_PRE_PING', 'true'),
+    }
+    statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    if backend == 'postgresql' and statement_timeout_ms > 0:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+    return options
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """Put each new SQLite connection in WAL mode so readers do not block the writer."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+    finally:
+        cursor.close()
+
+def create_app(config_name=None):
     app = Flask(__name__)
     
     # Configure database
-    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///chatbot.db')
+    if config_name == 'testing':
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///chatbot.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     
     # Initialize extensions
     CORS(app)
     db.init_app(app)
     
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and _env_flag('SQLITE_WAL', 'true'):
+            event.listen(db.engine, 'connect', _configure_sqlite)
+    
     # Register blueprints
-    from .routes import chat_bp
+    from .routes import chat_bp, rag_service, ingestion_queue
     app.register_blueprint(chat_bp, url_prefix='/api/chat')
     
+    # Optionally load the embedding model in the background instead of on the first chat request
+    if os.getenv('RAG_WARM_UP', '').lower() in ('1', 'true', 'yes'):
+        threading.Thread(target=rag_service.warm_up, name='rag-warm-up', daemon=True).start()
+    
     @app.route('/')
     def hello():
         return {"message": "Hello from Chatbot API"}
     
-    # Create database tables
+    # Create database tables, and bring tables from earlier versions up to date
     with app.app_context():
         db.create_all()
+        from .schema import upgrade_schema
+        upgrade_schema(db.engine)
+    
+    # Queue again the uploads a previous process accepted but did not finish
+    if _env_flag('INGESTION_RECOVER', 'true'):
+        ingestion_queue.recover(app)
     
     return app
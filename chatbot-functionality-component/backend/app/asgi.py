@@ -0,0 +1,217 @@
+"""ASGI entry point serving the chat routes asynchronously.
+
+Run with an ASGI server, e.g.::
+
+    uvicorn --factory app.asgi:create_asgi_app --host 0.0.0.0 --port 5000
+
+Sending a chat message, plain or streamed, is handled natively: the
+connection is held by a coroutine, retrieval and database work run in a
+bounded thread pool, and waits on the query batcher and the message
+write-behind buffer are awaited without occupying a thread. All other
+routes are passed to the Flask application through a2wsgi's WSGI
+middleware, so both serving modes expose the same API. The request logic
+itself lives in helpers in app/routes.py that both serving paths call; this
+module only decides which steps run in the pool and which are awaited.
+
+Uploads (POST /documents) deliberately stay on the Flask path. The request
+only copies the multipart body to local storage and inserts a 'pending'
+row; parsing, S3 upload and indexing already run on the ingestion queue's
+workers. Serving it natively would need a multipart parser of our own and
+would free a thread for no longer than the body takes to arrive.
+"""
+
+import os
+import re
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+from a2wsgi import WSGIMiddleware
+
+logger = logging.getLogger(__name__)
+
+_SEND_MESSAGE = re.compile(r'^/api/chat/sessions/(\d+)/messages$')
+_STREAM_MESSAGE = re.compile(r'^/api/chat/sessions/(\d+)/messages/stream$')
+
+
+class AsyncChatApp:
+    """ASGI application wrapping the Flask app with asynchronous chat routes."""
+
+    def __init__(self, flask_app, max_workers: int = int(os.getenv('ASYNC_EXECUTOR_WORKERS', '32'))):
+        """Initialize the ASGI application.
+
+        Args:
+            flask_app (Flask): Application providing the routes, database and services
+            max_workers (int): Threads available for blocking work, and separately for
+                requests served by Flask. Defaults to ASYNC_EXECUTOR_WORKERS env var.
+        """
+        from . import routes
+
+        self.flask_app = flask_app
+        self.routes = routes
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgi')
+        self.wsgi_app = WSGIMiddleware(flask_app.wsgi_app, workers=max_workers)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['method'] == 'POST':
+            match = _STREAM_MESSAGE.match(scope['path'])
+            if match:
+                await self._stream_message(receive, send, int(match.group(1)))
+                return
+            match = _SEND_MESSAGE.match(scope['path'])
+            if match:
+                await self._send_message(receive, send, int(match.group(1)))
+                return
+        await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        """Answer ASGI lifespan events; write buffered messages and stop the pool on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.routes.message_buffer is not None:
+                    await self._run(self.routes.message_buffer.close)
+                self.executor.shutdown(wait=True)
+                self.wsgi_app.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _run(self, function: Callable, *args: Any) -> Any:
+        """Run a blocking function in the bounded pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args))
+
+    async def _read_body(self, receive: Callable) -> bytes:
+        """Read the complete request body."""
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    async def _respond_json(self, send: Callable, status: int, payload: Dict[str, Any]) -> None:
+        """Send a complete JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _in_context(self, function: Callable, *args: Any) -> Any:
+        """Call one of the shared route helpers inside an application context; runs in the pool."""
+        with self.flask_app.app_context():
+            return function(*args)
+
+    async def _search(self, query: str, session_id: int) -> List[Dict[str, Any]]:
+        """Retrieve context; awaits the query batcher when enabled instead of holding a thread."""
+        document_ids = await self._run(self._in_context, self.routes._session_scope, session_id)
+        if self.routes.query_batcher is not None:
+            return await asyncio.wrap_future(self.routes.query_batcher.submit(query, 5, document_ids))
+        return await self._run(self.routes.rag_service.search, query, 5, document_ids)
+
+    async def _buffer_message(self, session_id: int, content: str,
+                              message_type: str) -> Tuple[asyncio.Future, Dict[str, Any]]:
+        """Queue a message on the write-behind buffer; the returned future can be awaited."""
+        with self.flask_app.app_context():
+            future, message = self.routes._buffer_message(session_id, content, message_type)
+        return asyncio.wrap_future(future), message
+
+    async def _store_message(self, session_id: int, content: str, message_type: str) -> Dict[str, Any]:
+        """Persist a chat message, through the write-behind buffer when it is enabled."""
+        if self.routes.message_buffer is None:
+            return (await self._run(self._in_context, self.routes._save_messages,
+                                    session_id, [(content, message_type)]))[0]
+        message_id, message = await self._buffer_message(session_id, content, message_type)
+        message['id'] = await message_id
+        return message
+
+    async def _send_message(self, receive: Callable, send: Callable, session_id: int) -> None:
+        """Asynchronous equivalent of routes.send_message."""
+        try:
+            data = json.loads(await self._read_body(receive) or b'{}')
+            content = data.get('content')
+            if not content:
+                await self._respond_json(send, 400, {'error': self.routes.MISSING_CONTENT})
+                return
+
+            if self.routes.message_buffer is None:
+                # Like the synchronous route, both messages are committed together after retrieval
+                assistant_response = self.routes._compose_response(await self._search(content, session_id))
+                user_message, assistant_message = await self._run(
+                    self._in_context, self.routes._save_messages, session_id,
+                    [(content, 'user'), (assistant_response, 'assistant')])
+            else:
+                user_id, user_message = await self._buffer_message(session_id, content, 'user')
+                assistant_response = self.routes._compose_response(await self._search(content, session_id))
+                assistant_id, assistant_message = await self._buffer_message(
+                    session_id, assistant_response, 'assistant')
+                user_message['id'] = await user_id
+                assistant_message['id'] = await assistant_id
+
+            await self._respond_json(send, 200, self.routes._message_reply(user_message, assistant_message))
+        except Exception as e:
+            logger.error(f"Error sending message: {str(e)}")
+            await self._respond_json(send, 500, {'error': str(e)})
+
+    async def _stream_message(self, receive: Callable, send: Callable, session_id: int) -> None:
+        """Asynchronous equivalent of routes.stream_message."""
+        try:
+            data = json.loads(await self._read_body(receive) or b'{}')
+        except ValueError:
+            data = {}
+        content = data.get('content')
+        if not content:
+            await self._respond_json(send, 400, {'error': self.routes.MISSING_CONTENT})
+            return
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no')
+        ]})
+
+        async def emit(event: str, payload: Any) -> None:
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': self.routes._sse_event(event, payload).encode('utf-8')})
+
+        try:
+            await emit('user_message', await self._store_message(session_id, content, 'user'))
+
+            context = await self._search(content, session_id)
+            await emit('context', self.routes._context_payload(context))
+
+            assistant_response = self.routes._compose_response(context)
+            await emit('answer', {'text': assistant_response})
+
+            assistant_message = await self._store_message(session_id, assistant_response, 'assistant')
+            await emit('done', {'assistant_message': assistant_message})
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}")
+            await emit('error', {'error': str(e)})
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+# PUBLIC_INTERFACE
+def create_asgi_app(flask_app=None) -> AsyncChatApp:
+    """Create the ASGI application.
+
+    Args:
+        flask_app (Flask, optional): Application to serve; created with create_app() if omitted
+
+    Returns:
+        AsyncChatApp: ASGI callable for uvicorn or another ASGI server
+    """
+    if flask_app is None:
+        from . import create_app
+        flask_app = create_app()
+    return AsyncChatApp(flask_app)
@@ -1,9 +1,11 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
+from . import db
 
-Base = declarative_base()
+# Bind the models to the application's SQLAlchemy instance so that
+# db.create_all(), db.session and Model.query all see them
+Base = db.Model
 
 # PUBLIC_INTERFACE
 class User(Base):
@@ -26,7 +28,10 @@ class PDFDocument(Base):
     filename = Column(String(255), nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
     status = Column(String(50), nullable=False, default='pending')  # pending, processing, completed, error
-    metadata = Column(JSON)
+    file_path = Column(String(1024))
+    error_message = Column(String)
+    # 'metadata' is reserved on declarative models; keep the column name, rename the attribute
+    doc_metadata = Column('metadata', JSON)
 
     # Relationships
     chunks = relationship("DocumentChunk", back_populates="document")
@@ -37,18 +42,26 @@ class ChatSession(Base):
     __tablename__ = 'chat_sessions'
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    # Optional: limits the session's retrieval to one document
+    document_id = Column(Integer, ForeignKey('pdf_documents.id'), index=True)
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime)
 
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
+    document = relationship("PDFDocument")
     messages = relationship("ChatMessage", back_populates="session")
 
 # PUBLIC_INTERFACE
 class ChatMessage(Base):
     """Model for storing chat messages."""
     __tablename__ = 'chat_messages'
+    # Serves history pages: equality on session_id, then keyset order on (timestamp, id).
+    # Its leading column also covers lookups by session_id alone.
+    __table_args__ = (
+        Index('ix_chat_messages_session_timestamp_id', 'session_id', 'timestamp', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     session_id = Column(Integer, ForeignKey('chat_sessions.id'), nullable=False)
@@ -65,9 +78,11 @@ class DocumentChunk(Base):
     __tablename__ = 'document_chunks'
 
     id = Column(Integer, primary_key=True)
-    document_id = Column(Integer, ForeignKey('pdf_documents.id'), nullable=False)
+    document_id = Column(Integer, ForeignKey('pdf_documents.id'), nullable=False, index=True)
     content = Column(String, nullable=False)
-    embedding = Column(JSON)  # Store vector embeddings as JSON
+    # Raw little-endian vector bytes; see services.chunk_persistence for the helpers
+    embedding = Column(LargeBinary)
+    embedding_dtype = Column(String(10), nullable=False, default='float32')  # float32, float16, int8
 
     # Relationships
     document = relationship("PDFDocument", back_populates="chunks")
\ No newline at end of file
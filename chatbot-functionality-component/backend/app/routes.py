@@ -1,35 +1,195 @@
 """Routes for chat functionality."""
 
+import os
+import json
+import uuid
+import base64
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-from .models import ChatSession, ChatMessage, User
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from sqlalchemy import and_, or_, select
+from werkzeug.utils import secure_filename
+from .models import ChatSession, ChatMessage, User, PDFDocument
 from .services.rag_service import RAGService
+from .services.query_batcher import QueryBatcher
+from .services.ingestion_queue import IngestionQueue
+from .services.message_buffer import MessageWriteBuffer
+from .services.cache import LRUCache
 from . import db
 
 chat_bp = Blueprint('chat', __name__)
 rag_service = RAGService()
 
+# Micro-batch concurrent searches when a batching window is configured
+_batch_window_ms = float(os.getenv('RAG_BATCH_WINDOW_MS', '0'))
+query_batcher = QueryBatcher(
+    rag_service,
+    max_batch_size=int(os.getenv('RAG_BATCH_MAX_SIZE', '32')),
+    max_wait_ms=_batch_window_ms
+) if _batch_window_ms > 0 else None
+
+ingestion_queue = IngestionQueue(rag_service)
+
+# Group message inserts from concurrent requests into bulk commits when enabled
+message_buffer = MessageWriteBuffer() if os.getenv('MESSAGE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes') \
+    else None
+UPLOAD_FOLDER = os.getenv('PDF_STORAGE_PATH', os.path.join('storage', 'pdfs'))
+MESSAGE_PAGE_SIZE = int(os.getenv('MESSAGE_PAGE_SIZE', '100'))
+MAX_MESSAGE_PAGE_SIZE = int(os.getenv('MAX_MESSAGE_PAGE_SIZE', '1000'))
+MISSING_CONTENT = 'Message content is required'
+
+# A session's document binding never changes, so it is looked up once per session
+_session_documents = LRUCache(int(os.getenv('SESSION_SCOPE_CACHE_SIZE', '4096')))
+
+
+def _session_scope(session_id):
+    """Return the document IDs a session's retrieval is limited to, or None for all documents.
+    
+    Uses its own short-lived connection rather than db.session, so it neither
+    flushes the request's pending messages nor holds a pooled connection
+    while the request waits for retrieval.
+    """
+    cached = _session_documents.get(session_id)
+    if cached is None:
+        with db.engine.connect() as connection:
+            row = connection.execute(
+                select(ChatSession.document_id).where(ChatSession.id == session_id)
+            ).first()
+        if row is None:
+            return None
+        cached = (row.document_id,)
+        _session_documents.put(session_id, cached)
+    return None if cached[0] is None else [str(cached[0])]
+
+
+def _search_context(query, k=5, document_ids=None):
+    """Retrieve context for a query, through the batcher when it is enabled."""
+    if query_batcher is not None:
+        return query_batcher.search(query, k, document_ids=document_ids)
+    return rag_service.search(query, k, document_ids)
+
+def _encode_cursor(message):
+    """Encode the keyset position after a message as an opaque cursor."""
+    position = json.dumps([message.timestamp.isoformat(), message.id])
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor into the (timestamp, id) position it points after."""
+    timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return datetime.fromisoformat(timestamp), int(message_id)
+
+
+def _compose_response(context):
+    """Compose the assistant's answer from the retrieved context."""
+    # For now, we'll just return the most relevant context
+    response = "Based on the available information: "
+    if context:
+        response += context[0]['text']
+    else:
+        response += "I don't have enough context to provide a specific answer."
+    return response
+
+
+def _sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _serialize_message(message):
+    """Convert a chat message to its JSON representation."""
+    return {
+        'id': message.id,
+        'content': message.content,
+        'type': message.type,
+        'timestamp': message.timestamp.isoformat()
+    }
+
+
+# The helpers below hold the request logic shared by these routes and the
+# asynchronous serving path in app/asgi.py; they expect an application context
+
+def _context_payload(context):
+    """Convert retrieved chunks to the payload of a 'context' event."""
+    return [{
+        'text': result['text'],
+        'score': result['score'],
+        'document_info': result.get('document_info', {})
+    } for result in context]
+
+
+def _save_messages(session_id, messages):
+    """Insert chat messages, given as (content, type) pairs, in one transaction.
+    
+    Returns:
+        list: The stored messages, serialized
+    """
+    rows = [ChatMessage(session_id=session_id, content=content, type=message_type)
+            for content, message_type in messages]
+    db.session.add_all(rows)
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return [_serialize_message(row) for row in rows]
+
+
+def _buffer_message(session_id, content, message_type):
+    """Queue a chat message on the write-behind buffer.
+    
+    Returns:
+        tuple: Future resolving to the message ID, and the serialized message
+        whose 'id' is filled in from that future
+    """
+    timestamp = datetime.utcnow()
+    future = message_buffer.add(session_id, content, message_type, timestamp)
+    return future, {'id': None, 'content': content, 'type': message_type, 'timestamp': timestamp.isoformat()}
+
+
+def _store_message(session_id, content, message_type):
+    """Persist one chat message, through the write-behind buffer when it is enabled."""
+    if message_buffer is None:
+        return _save_messages(session_id, [(content, message_type)])[0]
+    future, message = _buffer_message(session_id, content, message_type)
+    message['id'] = future.result()
+    return message
+
+
+def _message_reply(user_message, assistant_message):
+    """Build the send_message response body from the two serialized messages."""
+    return {
+        name: {key: message[key] for key in ('id', 'content', 'timestamp')}
+        for name, message in (('user_message', user_message), ('assistant_message', assistant_message))
+    }
+
 # PUBLIC_INTERFACE
 @chat_bp.route('/sessions', methods=['POST'])
 def create_session():
     """Create a new chat session.
     
+    An optional document_id binds the session to one document: its messages
+    are answered from that document's chunks only.
+    
     Returns:
         JSON response with session details
     """
     try:
         data = request.get_json()
         user_id = data.get('user_id')
+        document_id = data.get('document_id')
         
         if not user_id:
             return jsonify({'error': 'User ID is required'}), 400
+        if document_id is not None and db.session.get(PDFDocument, document_id) is None:
+            return jsonify({'error': 'Document not found'}), 404
             
-        session = ChatSession(user_id=user_id)
+        session = ChatSession(user_id=user_id, document_id=document_id)
         db.session.add(session)
         db.session.commit()
         
         return jsonify({
             'session_id': session.id,
+            'document_id': session.document_id,
             'start_time': session.start_time.isoformat()
         }), 201
         
@@ -53,74 +213,131 @@ def send_message(session_id):
         content = data.get('content')
         
         if not content:
-            return jsonify({'error': 'Message content is required'}), 400
-            
-        # Save user message
-        user_message = ChatMessage(
-            session_id=session_id,
-            content=content,
-            type='user'
-        )
-        db.session.add(user_message)
-        
-        # Get relevant context using RAG
-        context = rag_service.search(content)
-        
-        # Generate assistant response based on context
-        # For now, we'll just return the most relevant context
-        assistant_response = "Based on the available information: "
-        if context:
-            assistant_response += context[0]['text']
+            return jsonify({'error': MISSING_CONTENT}), 400
+        
+        scope = _session_scope(session_id)
+        if message_buffer is None:
+            # Both messages are committed together, once retrieval has succeeded
+            context = _search_context(content, document_ids=scope)
+            user_message, assistant_message = _save_messages(
+                session_id, [(content, 'user'), (_compose_response(context), 'assistant')])
         else:
-            assistant_response += "I don't have enough context to provide a specific answer."
-        
-        # Save assistant message
-        assistant_message = ChatMessage(
-            session_id=session_id,
-            content=assistant_response,
-            type='assistant'
-        )
-        db.session.add(assistant_message)
-        db.session.commit()
+            # The user message is queued before retrieval, so its write overlaps the
+            # search; the response waits only for the shared bulk commit
+            user_id, user_message = _buffer_message(session_id, content, 'user')
+            context = _search_context(content, document_ids=scope)
+            assistant_id, assistant_message = _buffer_message(session_id, _compose_response(context), 'assistant')
+            user_message['id'] = user_id.result()
+            assistant_message['id'] = assistant_id.result()
         
-        return jsonify({
-            'user_message': {
-                'id': user_message.id,
-                'content': user_message.content,
-                'timestamp': user_message.timestamp.isoformat()
-            },
-            'assistant_message': {
-                'id': assistant_message.id,
-                'content': assistant_message.content,
-                'timestamp': assistant_message.timestamp.isoformat()
-            }
-        }), 200
+        return jsonify(_message_reply(user_message, assistant_message)), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# PUBLIC_INTERFACE
+@chat_bp.route('/sessions/<int:session_id>/messages/stream', methods=['POST'])
+def stream_message(session_id):
+    """Send a message and stream the assistant's response as Server-Sent Events.
+    
+    Events are emitted as soon as each step completes: 'user_message' once the
+    message is stored, 'context' with the retrieved chunks, 'answer' with the
+    assistant's response, and 'done' with the stored assistant message. The
+    response is composed from the retrieved context in one step, so it is sent
+    as a single 'answer' event rather than split into tokens. A failure after
+    the stream has started is reported as an 'error' event.
+    
+    Args:
+        session_id: ID of the chat session
+        
+    Returns:
+        text/event-stream response
+    """
+    data = request.get_json(silent=True) or {}
+    content = data.get('content')
+    
+    if not content:
+        return jsonify({'error': MISSING_CONTENT}), 400
+    
+    def generate():
+        try:
+            yield _sse_event('user_message', _store_message(session_id, content, 'user'))
+            
+            context = _search_context(content, document_ids=_session_scope(session_id))
+            yield _sse_event('context', _context_payload(context))
+            
+            assistant_response = _compose_response(context)
+            yield _sse_event('answer', {'text': assistant_response})
+            
+            assistant_message = _store_message(session_id, assistant_response, 'assistant')
+            yield _sse_event('done', {'assistant_message': assistant_message})
+            
+        except Exception as e:
+            db.session.rollback()
+            yield _sse_event('error', {'error': str(e)})
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep reverse proxies from buffering the stream
+    })
+
 # PUBLIC_INTERFACE
 @chat_bp.route('/sessions/<int:session_id>/messages', methods=['GET'])
 def get_messages(session_id):
-    """Get all messages in a chat session.
+    """Get the messages of a chat session, oldest first, one page at a time.
+    
+    Pages are addressed by keyset on (timestamp, id), so fetching any page costs
+    the same regardless of how long the session is. Query parameters:
+    limit (page size, default MESSAGE_PAGE_SIZE), cursor (the next_cursor of the
+    previous page) and stream (true to stream the rest of the history as one
+    JSON document instead of paging).
     
     Args:
         session_id: ID of the chat session
         
     Returns:
-        JSON response with list of messages
+        JSON response with list of messages and the cursor of the next page
     """
     try:
-        messages = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.timestamp).all()
+        # Read your own writes: messages still waiting in the write-behind buffer go first
+        if message_buffer is not None:
+            message_buffer.flush()
+        
+        limit = request.args.get('limit', MESSAGE_PAGE_SIZE, type=int)
+        if limit is None or not 0 < limit <= MAX_MESSAGE_PAGE_SIZE:
+            return jsonify({'error': f'limit must be between 1 and {MAX_MESSAGE_PAGE_SIZE}'}), 400
+        
+        query = ChatMessage.query.filter_by(session_id=session_id)
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                after_timestamp, after_id = _decode_cursor(cursor)
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(or_(
+                ChatMessage.timestamp > after_timestamp,
+                and_(ChatMessage.timestamp == after_timestamp, ChatMessage.id > after_id)
+            ))
+        query = query.order_by(ChatMessage.timestamp, ChatMessage.id)
+        
+        if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+            def generate():
+                yield '{"messages": ['
+                for position, message in enumerate(query.yield_per(MESSAGE_PAGE_SIZE)):
+                    yield (',' if position else '') + json.dumps(_serialize_message(message))
+                yield ']}'
+            
+            return Response(stream_with_context(generate()), mimetype='application/json'), 200
+        
+        # One extra row tells whether another page follows
+        messages = query.limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
         
         return jsonify({
-            'messages': [{
-                'id': msg.id,
-                'content': msg.content,
-                'type': msg.type,
-                'timestamp': msg.timestamp.isoformat()
-            } for msg in messages]
+            'messages': [_serialize_message(msg) for msg in messages],
+            'next_cursor': _encode_cursor(messages[-1]) if has_more else None
         }), 200
         
     except Exception as e:
@@ -154,3 +371,87 @@ def end_session(session_id):
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+# PUBLIC_INTERFACE
+@chat_bp.route('/rag/stats', methods=['GET'])
+def get_rag_stats():
+    """Get RAG query cache statistics for monitoring.
+    
+    Returns:
+        JSON response with embedding and result cache counters
+    """
+    try:
+        return jsonify(rag_service.get_cache_stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# PUBLIC_INTERFACE
+@chat_bp.route('/documents', methods=['POST'])
+def upload_document():
+    """Upload a PDF and queue it for background ingestion.
+    
+    Returns:
+        JSON response with the document ID and its initial status
+    """
+    try:
+        file = request.files.get('file')
+        if file is None or not file.filename:
+            return jsonify({'error': 'PDF file is required'}), 400
+        
+        filename = secure_filename(file.filename)
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        file_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}"))
+        file.save(file_path)
+        
+        document = PDFDocument(filename=filename, file_path=file_path, status='pending')
+        db.session.add(document)
+        db.session.commit()
+        
+        ingestion_queue.submit(current_app._get_current_object(), document.id, file_path, filename)
+        
+        return jsonify({
+            'document_id': document.id,
+            'filename': document.filename,
+            'status': document.status
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# PUBLIC_INTERFACE
+@chat_bp.route('/documents/<int:document_id>', methods=['GET'])
+def get_document_status(document_id):
+    """Get the ingestion status and progress of an uploaded document.
+    
+    Args:
+        document_id: ID of the document
+        
+    Returns:
+        JSON response with status, progress counters and metadata
+    """
+    try:
+        document = db.session.get(PDFDocument, document_id)
+        if not document:
+            return jsonify({'error': 'Document not found'}), 404
+        
+        response = {
+            'document_id': document.id,
+            'filename': document.filename,
+            'status': document.status,
+            'upload_date': document.upload_date.isoformat(),
+            'error': document.error_message,
+            'metadata': document.doc_metadata
+        }
+        progress = ingestion_queue.get_progress(document.id)
+        if progress:
+            response['progress'] = {
+                'pages': progress.get('pages', 0),
+                'total_pages': progress.get('total_pages'),
+                'chunks': progress.get('chunks', 0)
+            }
+        
+        return jsonify(response), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
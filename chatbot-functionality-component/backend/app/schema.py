@@ -0,0 +1,142 @@
+"""Schema upgrades for databases created by earlier versions of the models.
+
+db.create_all() creates missing tables but never changes existing ones. Each
+upgrade step below inspects the live schema and issues only the DDL that is
+still missing, so upgrade_schema() is safe to run on every start-up. It can
+also be run by hand before deploying:
+
+    python -m app.schema
+"""
+
+import json
+import logging
+from typing import Dict, Iterable
+import numpy as np
+from sqlalchemy import LargeBinary, Table, inspect, text
+from sqlalchemy.engine import Connection
+from .models import PDFDocument, ChatSession, ChatMessage, DocumentChunk
+
+# Rows converted per round trip when rewriting a column
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def _add_columns(conn: Connection, table: Table, columns: Dict[str, str]) -> None:
+    """Add the model columns missing from an existing table.
+
+    Args:
+        conn (Connection): Connection inside the upgrade transaction
+        table (Table): Model table declaring the columns
+        columns (Dict[str, str]): Column names mapped to extra DDL, e.g. a DEFAULT clause
+    """
+    present = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    preparer = conn.dialect.identifier_preparer
+    for name, extra in columns.items():
+        if name in present:
+            continue
+        column = table.c[name]
+        ddl = (f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+               f"{column.type.compile(dialect=conn.dialect)} {extra}")
+        conn.execute(text(ddl.strip()))
+        logger.info(f"Added column {table.name}.{name}")
+
+
+def _create_indexes(conn: Connection, table: Table, names: Iterable[str]) -> None:
+    """Create model indexes missing from an existing table.
+
+    Args:
+        conn (Connection): Connection inside the upgrade transaction
+        table (Table): Model table declaring the indexes
+        names (Iterable[str]): Names of the indexes to ensure
+    """
+    indexes = {index.name: index for index in table.indexes}
+    present = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    for name in names:
+        if name not in present:
+            indexes[name].create(conn)
+            logger.info(f"Created index {name}")
+
+
+def _upgrade_pdf_documents(conn: Connection) -> None:
+    """Add the columns that back the ingestion queue."""
+    _add_columns(conn, PDFDocument.__table__, {'file_path': '', 'error_message': ''})
+
+
+def _upgrade_document_chunks(conn: Connection) -> None:
+    """Convert JSON embeddings to little-endian float32 blobs and record their storage dtype."""
+    from .services.chunk_persistence import pack_embeddings
+
+    table = DocumentChunk.__table__
+    _add_columns(conn, table, {'embedding_dtype': "NOT NULL DEFAULT 'float32'"})
+    embedding = next(column for column in inspect(conn).get_columns(table.name) if column['name'] == 'embedding')
+    if isinstance(embedding['type'], LargeBinary):
+        return
+
+    # Changing a column's type in place is not portable; fill a new column and swap it in
+    conn.execute(text(f"ALTER TABLE document_chunks ADD COLUMN embedding_packed "
+                      f"{LargeBinary().compile(dialect=conn.dialect)}"))
+    last_id = -1
+    while True:
+        rows = conn.execute(text("SELECT id, embedding FROM document_chunks WHERE id > :last_id "
+                                 "AND embedding IS NOT NULL ORDER BY id LIMIT :limit"),
+                            {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        # PostgreSQL returns JSON already decoded, SQLite returns its text
+        vectors = [json.loads(value) if isinstance(value, (str, bytes)) else value for _, value in rows]
+        conn.execute(text("UPDATE document_chunks SET embedding_packed = :blob WHERE id = :id"),
+                     [{'id': row_id, 'blob': blob} for (row_id, _), blob in
+                      zip(rows, pack_embeddings(np.array(vectors, dtype=np.float32), 'float32'))])
+        last_id = rows[-1][0]
+    conn.execute(text("ALTER TABLE document_chunks DROP COLUMN embedding"))
+    conn.execute(text("ALTER TABLE document_chunks RENAME COLUMN embedding_packed TO embedding"))
+    logger.info("Converted document_chunks.embedding from JSON to binary vectors")
+
+
+def _upgrade_chat_messages(conn: Connection) -> None:
+    """Add the index that serves keyset-paged message history."""
+    _create_indexes(conn, ChatMessage.__table__, ['ix_chat_messages_session_timestamp_id'])
+
+
+def _index_foreign_keys(conn: Connection) -> None:
+    """Index the foreign keys that sessions and chunks are looked up by."""
+    _create_indexes(conn, ChatSession.__table__, ['ix_chat_sessions_user_id'])
+    _create_indexes(conn, DocumentChunk.__table__, ['ix_document_chunks_document_id'])
+
+
+def _upgrade_chat_sessions(conn: Connection) -> None:
+    """Add the optional document a session's retrieval is scoped to."""
+    _add_columns(conn, ChatSession.__table__, {'document_id': "REFERENCES pdf_documents (id)"})
+    _create_indexes(conn, ChatSession.__table__, ['ix_chat_sessions_document_id'])
+
+
+UPGRADES = [
+    _upgrade_pdf_documents,
+    _upgrade_document_chunks,
+    _upgrade_chat_messages,
+    _index_foreign_keys,
+    _upgrade_chat_sessions,
+]
+
+
+# PUBLIC_INTERFACE
+def upgrade_schema(engine, steps: Iterable = UPGRADES) -> None:
+    """Bring tables created by earlier versions of the models up to date.
+
+    Args:
+        engine (Engine): Engine of the application database, e.g. db.engine
+        steps (Iterable): Upgrade steps to run in order; defaults to all of them
+    """
+    for step in steps:
+        # One transaction per step, so a failed step leaves the earlier ones applied
+        with engine.begin() as conn:
+            step(conn)
+
+
+if __name__ == '__main__':
+    from . import create_app, db
+    logging.basicConfig(level=logging.INFO)
+    # create_app() already upgrades the schema on start-up
+    with create_app().app_context():
+        logger.info(f"Schema of {db.engine.url.render_as_string(hide_password=True)} is up to date")
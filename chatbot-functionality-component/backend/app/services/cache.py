@@ -0,0 +1,111 @@
+"""Cache utilities for bounding and expiring in-memory lookups."""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with an optional time-to-live.
+
+    Entries beyond ``max_size`` are evicted oldest-first and entries older than
+    ``ttl`` seconds are treated as misses. With ``sizeof``, ``max_size`` bounds
+    the summed sizes of the entries instead of their number. Hit, miss, eviction and expiration
+    counters are kept for monitoring.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """Initialize the cache.
+
+        Args:
+            max_size (int): Maximum number of entries, or total size with sizeof; 0 disables the cache
+            ttl (float, optional): Seconds an entry stays valid; None means no expiry
+            sizeof (Callable, optional): Size of a value, e.g. in bytes; every entry counts 1 if omitted
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sizeof = sizeof or (lambda value: 1)
+        self.weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default on a miss.
+
+        Args:
+            key (Hashable): Cache key
+            default (Any): Value returned when the key is missing or expired
+
+        Returns:
+            Any: Cached value or default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, stored_at, size = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.weight -= size
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to store
+        """
+        if self.max_size <= 0:
+            return
+        size = self.sizeof(value)
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[2]
+            self._data[key] = (value, time.monotonic(), size)
+            self.weight += size
+            # An entry larger than the whole cache evicts everything, itself included
+            while self.weight > self.max_size:
+                self.weight -= self._data.popitem(last=False)[1][2]
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries without resetting the counters."""
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cache counters.
+
+        Returns:
+            Dict[str, Any]: size, weight, max_size, hits, misses, evictions, expirations and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'weight': self.weight,
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
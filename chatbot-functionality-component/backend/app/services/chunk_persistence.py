@@ -0,0 +1,180 @@
+"""Chunk Persistence for storing document chunks and their embeddings in the database."""
+
+import os
+import io
+import csv
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import insert, select
+from ..models import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+    'int8': np.int8,  # Symmetric per-vector scale, stored as a float32 prefix of each blob
+}
+
+# Bytes of the per-vector scale written before int8 codes
+_INT8_SCALE = np.dtype('<f4')
+
+DEFAULT_EMBEDDING_DTYPE = os.getenv('EMBEDDING_STORAGE_DTYPE', 'float32')
+
+# Rows per executemany round trip; bounds the parameter list held in memory
+INSERT_BATCH_SIZE = int(os.getenv('CHUNK_INSERT_BATCH_SIZE', '1000'))
+
+
+def _numpy_dtype(dtype: str) -> np.dtype:
+    """Map a storage dtype name to its numpy dtype."""
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return np.dtype(EMBEDDING_DTYPES[dtype])
+
+
+# PUBLIC_INTERFACE
+def pack_embeddings(embeddings: np.ndarray, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> List[bytes]:
+    """Convert an embedding matrix into one little-endian binary blob per row.
+
+    Args:
+        embeddings (np.ndarray): Matrix with one embedding per row
+        dtype (str): Storage precision, 'float32', 'float16' or 'int8'
+
+    Returns:
+        List[bytes]: Raw vector bytes, one entry per row
+    """
+    if dtype == 'int8':
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.size else np.empty(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return [scale.tobytes() + row.tobytes() for scale, row in zip(scales.astype(_INT8_SCALE), codes)]
+    matrix = np.ascontiguousarray(embeddings, dtype=_numpy_dtype(dtype).newbyteorder('<'))
+    return [row.tobytes() for row in matrix]
+
+
+# PUBLIC_INTERFACE
+def unpack_embeddings(blobs: Sequence[bytes], dtype: str = DEFAULT_EMBEDDING_DTYPE) -> np.ndarray:
+    """Convert binary embedding blobs back into a float32 matrix.
+
+    The blobs are joined once and viewed with np.frombuffer, so float32 rows
+    are not copied again; float16 and int8 rows are widened to float32 for FAISS.
+
+    Args:
+        blobs (Sequence[bytes]): Raw vector bytes as written by pack_embeddings
+        dtype (str): Storage precision the blobs were written with
+
+    Returns:
+        np.ndarray: float32 matrix with one row per blob
+    """
+    storage = _numpy_dtype(dtype).newbyteorder('<')
+    if not blobs:
+        return np.empty((0, 0), dtype=np.float32)
+    if dtype == 'int8':
+        rows = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), -1)
+        scales = rows[:, :_INT8_SCALE.itemsize].copy().view(_INT8_SCALE)
+        return rows[:, _INT8_SCALE.itemsize:].view(np.int8).astype(np.float32) * scales
+    dimension = len(blobs[0]) // storage.itemsize
+    matrix = np.frombuffer(b''.join(blobs), dtype=storage).reshape(len(blobs), dimension)
+    return matrix if matrix.dtype == np.float32 else matrix.astype(np.float32)
+
+
+def _copy_rows(connection, document_id: int, chunks: List[str], blobs: List[bytes], dtype: str) -> None:
+    """Stream rows into document_chunks with PostgreSQL COPY on the session's connection."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for chunk, blob in zip(chunks, blobs):
+        writer.writerow((document_id, chunk, '\\x' + blob.hex(), dtype))
+    buffer.seek(0)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {DocumentChunk.__tablename__} (document_id, content, embedding, embedding_dtype) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+# PUBLIC_INTERFACE
+def save_document_chunks(session, document_id: int, chunks: List[str], embeddings: np.ndarray,
+                         dtype: str = DEFAULT_EMBEDDING_DTYPE, batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """Insert a document's chunks and embeddings in bulk.
+
+    PostgreSQL (psycopg2) connections use COPY; other databases use batched
+    executemany inserts. Nothing is committed: the caller owns the transaction,
+    so a document's chunks are stored all together or not at all.
+
+    Args:
+        session: SQLAlchemy session, e.g. db.session
+        document_id (int): ID of the PDFDocument the chunks belong to
+        chunks (List[str]): Chunk texts, in document order
+        embeddings (np.ndarray): Embedding matrix with one row per chunk
+        dtype (str): Storage precision, 'float32', 'float16' or 'int8'
+        batch_size (int): Rows per executemany statement
+
+    Returns:
+        int: Number of chunks inserted
+    """
+    if len(chunks) != len(embeddings):
+        raise ValueError("Each chunk needs exactly one embedding")
+    if not chunks:
+        return 0
+    blobs = pack_embeddings(embeddings, dtype)
+
+    connection = session.connection()
+    if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+        _copy_rows(connection, document_id, chunks, blobs, dtype)
+        return len(chunks)
+
+    statement = insert(DocumentChunk)
+    for start in range(0, len(chunks), max(1, batch_size)):
+        session.execute(statement, [
+            {'document_id': document_id, 'content': chunk, 'embedding': blob, 'embedding_dtype': dtype}
+            for chunk, blob in zip(chunks[start:start + batch_size], blobs[start:start + batch_size])
+        ])
+    return len(chunks)
+
+
+# PUBLIC_INTERFACE
+def load_document_chunks(session, document_ids: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """Load stored chunks and their embeddings, ordered by document and chunk.
+
+    Args:
+        session: SQLAlchemy session, e.g. db.session
+        document_ids (Sequence[int], optional): Restrict loading to these documents
+
+    Returns:
+        Dict[str, Any]: 'document_ids' (np.ndarray), 'texts' (List[str]) and
+        'embeddings' (float32 np.ndarray with one row per chunk)
+    """
+    query = select(DocumentChunk.document_id, DocumentChunk.content,
+                   DocumentChunk.embedding, DocumentChunk.embedding_dtype) \
+        .where(DocumentChunk.embedding.is_not(None)) \
+        .order_by(DocumentChunk.document_id, DocumentChunk.id)
+    if document_ids is not None:
+        query = query.where(DocumentChunk.document_id.in_(list(document_ids)))
+    rows = session.execute(query).all()
+
+    texts = [row.content for row in rows]
+    owners = np.fromiter((row.document_id for row in rows), dtype=np.int64, count=len(rows))
+    dtypes = {row.embedding_dtype or 'float32' for row in rows}
+    if len(dtypes) <= 1:
+        embeddings = unpack_embeddings([row.embedding for row in rows], dtypes.pop() if dtypes else 'float32')
+    else:
+        # Mixed precisions, e.g. while switching EMBEDDING_STORAGE_DTYPE; decode each group
+        dimension = None
+        groups = {}
+        for position, row in enumerate(rows):
+            groups.setdefault(row.embedding_dtype or 'float32', []).append(position)
+        for dtype, positions in groups.items():
+            decoded = unpack_embeddings([rows[p].embedding for p in positions], dtype)
+            if dimension is None:
+                dimension = decoded.shape[1]
+                embeddings = np.empty((len(rows), dimension), dtype=np.float32)
+            embeddings[positions] = decoded
+
+    logger.info(f"Loaded {len(rows)} stored chunks")
+    return {'document_ids': owners, 'texts': texts, 'embeddings': embeddings}
@@ -0,0 +1,381 @@
+"""Chunk Store for keeping chunk texts and document information in compact columnar arrays."""
+
+import logging
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One fixed-width row per chunk; document is a code into ChunkStore.documents, -1 once removed
+CHUNK_DTYPE = np.dtype([
+    ('chunk_id', np.int64),
+    ('offset', np.int64),
+    ('length', np.int64),
+    ('document', np.int32),
+    ('chunk_index', np.int32),
+    ('total_chunks', np.int32),
+])
+
+_REMOVED = -1
+
+
+class ChunkStore:
+    """Array-backed store of chunk texts and their document information.
+
+    Chunk metadata lives in a single structured numpy array and all chunk texts
+    in one UTF-8 buffer addressed by offset and length, so millions of chunks
+    cost a few dozen bytes each instead of a Python dict and str per chunk, and
+    the garbage collector has almost nothing to traverse. Chunk IDs must be
+    added in increasing order, which lets lookups binary-search the ID column.
+    Removed rows are tombstoned and reclaimed by compact().
+
+    The texts, infos and by_document attributes are read-only mapping views
+    with the shape of the dicts the store replaces.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """Initialize an empty chunk store.
+
+        Args:
+            capacity (int): Number of rows to allocate up front
+        """
+        self._rows = np.zeros(max(capacity, 1), dtype=CHUNK_DTYPE)
+        self._size = 0
+        self._live = 0
+        self._text = bytearray()
+        self.documents: List[Optional[str]] = []  # document code -> document ID
+        self._document_codes: Dict[str, int] = {}
+        self._document_ids: Dict[int, List[np.ndarray]] = {}  # document code -> chunk ID arrays
+        self.texts = _TextView(self)
+        self.infos = _InfoView(self)
+        self.by_document = _DocumentView(self)
+
+    # PUBLIC_INTERFACE
+    @classmethod
+    def from_arrays(cls, rows: np.ndarray, text: Union[bytes, bytearray, memoryview],
+                    documents: Sequence[Optional[str]]) -> 'ChunkStore':
+        """Build a store around existing arrays, e.g. a memory-mapped snapshot.
+
+        The arrays are used as given; read-only ones are copied on the first write.
+
+        Args:
+            rows (np.ndarray): Chunk rows of CHUNK_DTYPE, sorted by chunk ID
+            text (Union[bytes, bytearray, memoryview]): UTF-8 buffer the rows point into
+            documents (Sequence[Optional[str]]): Document IDs indexed by document code
+
+        Returns:
+            ChunkStore: Store over the given data
+        """
+        store = cls(capacity=1)
+        store._rows = rows
+        store._size = len(rows)
+        store._text = text
+        store.documents = list(documents)
+        store._document_codes = {document_id: code for code, document_id in enumerate(store.documents)
+                                 if document_id is not None}
+        live = rows['document'] != _REMOVED
+        store._live = int(np.count_nonzero(live))
+        if store._live:
+            codes = rows['document'][live]
+            ids = rows['chunk_id'][live]
+            order = np.argsort(codes, kind='stable')
+            boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+            for group_ids, group_codes in zip(np.split(ids[order], boundaries),
+                                              np.split(codes[order], boundaries)):
+                store._document_ids[int(group_codes[0])] = [group_ids.copy()]
+        return store
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __contains__(self, chunk_id: Any) -> bool:
+        return self._row_of(chunk_id) is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the row table and text buffer."""
+        return self._rows.nbytes + len(self._text)
+
+    def _row_of(self, chunk_id: Any) -> Optional[int]:
+        """Return the row holding a live chunk, or None."""
+        try:
+            chunk_id = int(chunk_id)
+        except (TypeError, ValueError):
+            return None
+        row = int(np.searchsorted(self._rows['chunk_id'][:self._size], chunk_id))
+        if row < self._size and self._rows['chunk_id'][row] == chunk_id \
+                and self._rows['document'][row] != _REMOVED:
+            return row
+        return None
+
+    def _make_writable(self) -> None:
+        """Copy arrays that came from a read-only snapshot before they are modified."""
+        if not self._rows.flags.writeable:
+            self._rows = np.array(self._rows[:self._size])
+        if not isinstance(self._text, bytearray):
+            self._text = bytearray(self._text)
+
+    def _reserve(self, count: int) -> None:
+        """Grow the row table geometrically so appends are amortized O(1)."""
+        needed = self._size + count
+        if needed > len(self._rows):
+            rows = np.zeros(max(needed, 2 * len(self._rows)), dtype=CHUNK_DTYPE)
+            rows[:self._size] = self._rows[:self._size]
+            self._rows = rows
+
+    # PUBLIC_INTERFACE
+    def add(self, document_id: str, first_chunk_id: int, first_chunk_index: int,
+            texts: List[str], total_chunks: int) -> np.ndarray:
+        """Append consecutive chunks of one document.
+
+        Args:
+            document_id (str): ID of the document the chunks belong to
+            first_chunk_id (int): Chunk ID of the first chunk; IDs must be increasing
+            first_chunk_index (int): Position of the first chunk within the document
+            texts (List[str]): Chunk texts
+            total_chunks (int): Number of chunks in the whole document
+
+        Returns:
+            np.ndarray: Chunk IDs assigned to the texts
+        """
+        if self._size and first_chunk_id <= self._rows['chunk_id'][self._size - 1]:
+            raise ValueError("Chunk IDs must be added in increasing order")
+        self._make_writable()
+        self._reserve(len(texts))
+
+        code = self._document_codes.get(document_id)
+        if code is None:
+            code = len(self.documents)
+            self.documents.append(document_id)
+            self._document_codes[document_id] = code
+
+        encoded = [text.encode('utf-8') for text in texts]
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        rows = self._rows[self._size:self._size + len(texts)]
+        ids = np.arange(first_chunk_id, first_chunk_id + len(texts), dtype=np.int64)
+        rows['chunk_id'] = ids
+        rows['offset'] = len(self._text) + np.cumsum(lengths) - lengths
+        rows['length'] = lengths
+        rows['document'] = code
+        rows['chunk_index'] = np.arange(first_chunk_index, first_chunk_index + len(texts))
+        rows['total_chunks'] = total_chunks
+        self._text += b''.join(encoded)
+
+        self._size += len(texts)
+        self._live += len(texts)
+        self._document_ids.setdefault(code, []).append(ids)
+        return ids
+
+    # PUBLIC_INTERFACE
+    def remove(self, chunk_ids: Sequence[int]) -> np.ndarray:
+        """Remove chunks by ID.
+
+        Args:
+            chunk_ids (Sequence[int]): IDs of the chunks to remove; unknown IDs are ignored
+
+        Returns:
+            np.ndarray: IDs that were actually removed
+        """
+        if not self._size:
+            return np.empty(0, dtype=np.int64)
+        ids = np.unique(np.asarray(chunk_ids, dtype=np.int64))
+        column = self._rows['chunk_id'][:self._size]
+        rows = np.searchsorted(column, ids)
+        found = rows < self._size
+        rows, ids = rows[found], ids[found]
+        rows = rows[(column[rows] == ids) & (self._rows['document'][rows] != _REMOVED)]
+        if not len(rows):
+            return np.empty(0, dtype=np.int64)
+
+        self._make_writable()
+        removed = self._rows['chunk_id'][rows].copy()
+        for code in np.unique(self._rows['document'][rows]).tolist():
+            remaining = [kept for kept in (group[~np.isin(group, removed)]
+                                           for group in self._document_ids.get(code, []))
+                         if len(kept)]
+            if remaining:
+                self._document_ids[code] = remaining
+            else:
+                self._document_ids.pop(code, None)
+                self._document_codes.pop(self.documents[code], None)
+                self.documents[code] = None
+
+        self._rows['document'][rows] = _REMOVED
+        self._live -= len(rows)
+        if self._size - self._live > self._live:
+            self.compact()
+        return removed
+
+    # PUBLIC_INTERFACE
+    def set_total_chunks(self, chunk_ids: Sequence[int], total_chunks: int) -> None:
+        """Update the document chunk count recorded on existing chunks.
+
+        Args:
+            chunk_ids (Sequence[int]): IDs of the chunks to update
+            total_chunks (int): Number of chunks in the document
+        """
+        self._make_writable()
+        rows = np.searchsorted(self._rows['chunk_id'][:self._size], np.asarray(chunk_ids, dtype=np.int64))
+        self._rows['total_chunks'][rows] = total_chunks
+
+    def _compacted(self) -> Dict[str, Any]:
+        """Build compacted copies of the row table, text buffer and document list.
+
+        The store itself is not modified, so this is safe while other threads read it.
+        """
+        rows = self._rows[:self._size]
+        live = rows[rows['document'] != _REMOVED]
+        view = memoryview(self._text)
+        try:
+            text = bytearray(b''.join(view[start:start + length] for start, length
+                                      in zip(live['offset'].tolist(), live['length'].tolist())))
+        finally:
+            view.release()
+        live['offset'] = np.cumsum(live['length']) - live['length']
+
+        # Renumber document codes so retired documents do not accumulate
+        used = np.unique(live['document'])
+        remap = np.full(len(self.documents), _REMOVED, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        live['document'] = remap[live['document']]
+        return {'rows': live, 'text': text, 'documents': [self.documents[code] for code in used.tolist()],
+                'remap': remap}
+
+    # PUBLIC_INTERFACE
+    def compact(self) -> None:
+        """Drop removed rows and their text, and release unused capacity."""
+        compacted = self._compacted()
+        remap = compacted['remap']
+        self.documents = compacted['documents']
+        self._document_codes = {document_id: code for code, document_id in enumerate(self.documents)}
+        self._document_ids = {int(remap[code]): groups for code, groups in self._document_ids.items()}
+
+        self._rows = compacted['rows']
+        self._size = self._live = len(self._rows)
+        self._text = compacted['text']
+
+    # PUBLIC_INTERFACE
+    def ids(self) -> np.ndarray:
+        """Return the IDs of all live chunks in increasing order.
+
+        Returns:
+            np.ndarray: int64 chunk IDs
+        """
+        rows = self._rows[:self._size]
+        return rows['chunk_id'][rows['document'] != _REMOVED]
+
+    # PUBLIC_INTERFACE
+    def document_chunk_ids(self, document_id: str) -> np.ndarray:
+        """Return the chunk IDs of one document in chunk order.
+
+        Args:
+            document_id (str): ID of the document
+
+        Returns:
+            np.ndarray: int64 chunk IDs, empty if the document is unknown
+        """
+        groups = self._document_ids.get(self._document_codes.get(document_id, _REMOVED))
+        if not groups:
+            return np.empty(0, dtype=np.int64)
+        return groups[0] if len(groups) == 1 else np.concatenate(groups)
+
+    # PUBLIC_INTERFACE
+    def get_text(self, chunk_id: int) -> Optional[str]:
+        """Return the text of a chunk.
+
+        Args:
+            chunk_id (int): ID of the chunk
+
+        Returns:
+            Optional[str]: Chunk text, or None if the chunk does not exist
+        """
+        row = self._row_of(chunk_id)
+        if row is None:
+            return None
+        start = int(self._rows['offset'][row])
+        return bytes(self._text[start:start + int(self._rows['length'][row])]).decode('utf-8')
+
+    # PUBLIC_INTERFACE
+    def get_info(self, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """Return the document information of a chunk.
+
+        Args:
+            chunk_id (int): ID of the chunk
+
+        Returns:
+            Optional[Dict[str, Any]]: document_id, chunk_index and total_chunks, or None
+        """
+        row = self._row_of(chunk_id)
+        if row is None:
+            return None
+        record = self._rows[row]
+        return {
+            'document_id': self.documents[int(record['document'])],
+            'chunk_index': int(record['chunk_index']),
+            'total_chunks': int(record['total_chunks'])
+        }
+
+    # PUBLIC_INTERFACE
+    def arrays(self) -> Dict[str, Any]:
+        """Return compacted copies of the row table, text buffer and document list for persistence.
+
+        The store is only read, so snapshots can be taken while searches run.
+
+        Returns:
+            Dict[str, Any]: 'rows', 'text' and 'documents'
+        """
+        compacted = self._compacted()
+        del compacted['remap']
+        return compacted
+
+
+class _TextView(Mapping):
+    """Read-only mapping of chunk ID to chunk text."""
+
+    def __init__(self, store: ChunkStore):
+        self._store = store
+
+    def __getitem__(self, chunk_id: int) -> str:
+        text = self._store.get_text(chunk_id)
+        if text is None:
+            raise KeyError(chunk_id)
+        return text
+
+    def __contains__(self, chunk_id: Any) -> bool:
+        return chunk_id in self._store
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._store.ids().tolist())
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+
+class _InfoView(_TextView):
+    """Read-only mapping of chunk ID to document information."""
+
+    def __getitem__(self, chunk_id: int) -> Dict[str, Any]:
+        info = self._store.get_info(chunk_id)
+        if info is None:
+            raise KeyError(chunk_id)
+        return info
+
+
+class _DocumentView(Mapping):
+    """Read-only mapping of document ID to its chunk IDs."""
+
+    def __init__(self, store: ChunkStore):
+        self._store = store
+
+    def __getitem__(self, document_id: str) -> List[int]:
+        ids = self._store.document_chunk_ids(document_id)
+        if not len(ids):
+            raise KeyError(document_id)
+        return ids.tolist()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([document_id for document_id in self._store.documents if document_id is not None])
+
+    def __len__(self) -> int:
+        return len(self._store._document_ids)
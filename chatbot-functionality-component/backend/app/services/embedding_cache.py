@@ -0,0 +1,141 @@
+"""Embedding Cache for reusing chunk embeddings across uploads via content hashes."""
+
+import os
+import json
+import hashlib
+import sqlite3
+import logging
+from contextlib import closing, contextmanager
+from typing import Callable, Iterator, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """Persistent cache mapping chunk-text hashes to embedding vectors.
+
+    Embeddings are keyed by SHA-256 of the model name and the chunk text, so
+    identical chunks from re-uploaded or revised PDFs are never encoded twice.
+    Whole files are additionally keyed by the hash of their bytes and the chunk
+    size, which lets an exact re-upload skip text extraction as well.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        """Initialize the embedding cache.
+
+        Args:
+            path (str): Path of the SQLite database file
+            model_name (str): Name of the model whose embeddings are cached
+        """
+        self.path = path
+        self.model_name = model_name
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, chunks TEXT NOT NULL)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection for one transaction; one per call keeps the cache safe to share between threads.
+
+        The connection's own context manager only commits, so it is also closed explicitly.
+        """
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn, conn:
+            yield conn
+
+    def _chunk_hash(self, text: str) -> str:
+        """Return the cache key for a chunk of text."""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    # PUBLIC_INTERFACE
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """Compute the SHA-256 of a file's contents.
+
+        Args:
+            file_path (str): Path to the file
+
+        Returns:
+            str: Hex digest of the file contents
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    # PUBLIC_INTERFACE
+    def get_file_chunks(self, file_hash: str, chunk_size: int) -> Optional[List[str]]:
+        """Get the chunks previously produced for a file.
+
+        Args:
+            file_hash (str): Hash of the file contents
+            chunk_size (int): Chunk size the chunks were produced with
+
+        Returns:
+            Optional[List[str]]: Cached chunks, or None if the file has not been seen
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT chunks FROM files WHERE key = ?",
+                               (f"{file_hash}:{chunk_size}",)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # PUBLIC_INTERFACE
+    def put_file_chunks(self, file_hash: str, chunk_size: int, chunks: List[str]) -> None:
+        """Remember the chunks produced for a file.
+
+        Args:
+            file_hash (str): Hash of the file contents
+            chunk_size (int): Chunk size the chunks were produced with
+            chunks (List[str]): Chunks of the file
+        """
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO files (key, chunks) VALUES (?, ?)",
+                         (f"{file_hash}:{chunk_size}", json.dumps(chunks)))
+
+    # PUBLIC_INTERFACE
+    def encode(self, chunks: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for chunks, calling the encoder only for unseen chunks.
+
+        Args:
+            chunks (List[str]): Chunks to embed
+            encoder (Callable[[List[str]], np.ndarray]): Function computing embeddings, e.g. model.encode
+
+        Returns:
+            np.ndarray: float32 matrix with one row per chunk
+        """
+        hashes = [self._chunk_hash(chunk) for chunk in chunks]
+        found = {}
+        with self._connect() as conn:
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE hash IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for chunk_hash, vector in rows:
+                    found[chunk_hash] = np.frombuffer(vector, dtype=np.float32)
+
+        missing = {}
+        for chunk_hash, chunk in zip(hashes, chunks):
+            if chunk_hash not in found and chunk_hash not in missing:
+                missing[chunk_hash] = chunk
+        if missing:
+            encoded = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                    [(chunk_hash, vector.tobytes()) for chunk_hash, vector in zip(missing, encoded)]
+                )
+            found.update(zip(missing, encoded))
+
+        logger.info(f"Embedding cache: {len(chunks) - len(missing)} of {len(chunks)} chunks reused")
+        return np.vstack([found[chunk_hash] for chunk_hash in hashes])
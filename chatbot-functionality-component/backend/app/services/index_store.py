@@ -0,0 +1,185 @@
+"""Index Store for persisting RAG index snapshots to disk and reopening them memory-mapped."""
+
+import os
+import json
+import fcntl
+import shutil
+import uuid
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional
+import numpy as np
+import faiss
+from .chunk_store import ChunkStore
+from .vector_index import ShardedIndex
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+class IndexStore:
+    """Service class for saving and loading RAG index snapshots.
+
+    A snapshot is a directory holding the FAISS index, a fixed-width chunk
+    table, a single UTF-8 text buffer and a small JSON manifest. The active
+    snapshot is named by a CURRENT file that is swapped atomically, so readers
+    never see a half-written snapshot. Processes sharing the directory hold
+    locked() around load() and save(), so no snapshot is deleted while it is
+    being opened and concurrent saves cannot interleave.
+    """
+
+    def __init__(self, directory: str):
+        """Initialize the index store.
+
+        Args:
+            directory (str): Directory in which snapshots are kept
+        """
+        self.directory = directory
+
+    def _current_path(self) -> Optional[str]:
+        """Return the path of the active snapshot directory, if any."""
+        pointer = os.path.join(self.directory, 'CURRENT')
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer) as f:
+            name = f.read().strip()
+        path = os.path.join(self.directory, name)
+        return path if os.path.isdir(path) else None
+
+    # PUBLIC_INTERFACE
+    def current_name(self) -> Optional[str]:
+        """Return the name of the active snapshot, which changes whenever any process saves.
+
+        Returns:
+            Optional[str]: Snapshot directory name, or None if no snapshot exists
+        """
+        path = self._current_path()
+        return os.path.basename(path) if path else None
+
+    # PUBLIC_INTERFACE
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold an exclusive lock on the snapshot directory, shared by all processes on the host.
+
+        The lock is not re-entrant: a thread holding it must not take it again.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'LOCK'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # PUBLIC_INTERFACE
+    def exists(self) -> bool:
+        """Check whether a snapshot is available.
+
+        Returns:
+            bool: True if a snapshot can be loaded
+        """
+        return self._current_path() is not None
+
+    # PUBLIC_INTERFACE
+    def save(self, index, chunks: ChunkStore, next_chunk_id: int) -> str:
+        """Write a new snapshot and make it the active one.
+
+        Args:
+            index: FAISS index holding the chunk embeddings, or None
+            chunks (ChunkStore): Chunk texts and document information
+            next_chunk_id (int): Next chunk ID to hand out
+
+        Returns:
+            str: Path of the written snapshot directory
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self._current_path()
+        name = f"snapshot-{uuid.uuid4().hex}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+
+        # The chunk store is already columnar, so its arrays are written as they are
+        arrays = chunks.arrays()
+        np.save(os.path.join(path, 'chunks.npy'), arrays['rows'])
+        with open(os.path.join(path, 'texts.bin'), 'wb') as texts:
+            texts.write(arrays['text'])
+        documents = arrays['documents']
+        shards = 0
+        if isinstance(index, ShardedIndex):
+            # One file per shard, so each can be memory-mapped on its own
+            shards = len(index.shards)
+            for number, shard in enumerate(index.shards):
+                faiss.write_index(shard, os.path.join(path, f'index-{number}.faiss'))
+        elif index is not None:
+            faiss.write_index(index, os.path.join(path, 'index.faiss'))
+
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'next_chunk_id': next_chunk_id,
+                'documents': documents,
+                'shards': shards,
+            }, f)
+
+        pointer = os.path.join(self.directory, 'CURRENT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(name)
+        os.replace(pointer + '.tmp', pointer)
+
+        # Processes that still map the old files keep them alive until they close them
+        if previous and previous != path:
+            shutil.rmtree(previous, ignore_errors=True)
+
+        return path
+
+    # PUBLIC_INTERFACE
+    def load(self, mmap: bool = True) -> Optional[Dict[str, Any]]:
+        """Load the active snapshot.
+
+        Args:
+            mmap (bool): Map the index codes, chunk table and texts from disk instead of
+                reading them, so processes loading the same snapshot share one page-cached copy
+
+        Returns:
+            Optional[Dict[str, Any]]: Snapshot contents with 'index', 'chunks' (a ChunkStore),
+            'next_chunk_id', 'mmapped' and 'name' keys, or None if no snapshot exists
+        """
+        path = self._current_path()
+        if path is None:
+            return None
+
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+
+        index = None
+        index_path = os.path.join(path, 'index.faiss')
+        # IO_FLAG_MMAP_IFC maps the stored codes of every index type (flat, SQ, PQ, HNSW storage
+        # and IVF lists) instead of reading them; IO_FLAG_MMAP alone only covers IVF lists
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        if manifest.get('shards'):
+            index = ShardedIndex([faiss.read_index(os.path.join(path, f'index-{number}.faiss'), flags)
+                                  for number in range(manifest['shards'])])
+        elif os.path.exists(index_path):
+            index = faiss.read_index(index_path, flags)
+
+        # Both files are used in place; the chunk store copies them on its first write
+        table = np.load(os.path.join(path, 'chunks.npy'), mmap_mode='r' if mmap else None)
+        texts_path = os.path.join(path, 'texts.bin')
+        if mmap and os.path.getsize(texts_path):
+            buffer = np.memmap(texts_path, dtype=np.uint8, mode='r').data
+        else:
+            with open(texts_path, 'rb') as f:
+                buffer = f.read()
+        chunks = ChunkStore.from_arrays(table, buffer, manifest['documents'])
+
+        logger.info(f"Loaded RAG snapshot from {path} with {len(chunks)} chunks")
+        return {
+            'index': index,
+            'chunks': chunks,
+            'next_chunk_id': manifest['next_chunk_id'],
+            'mmapped': mmap and index is not None,
+            'name': os.path.basename(path)
+        }
@@ -0,0 +1,213 @@
+"""Ingestion Queue for processing uploaded PDFs in background worker threads."""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional
+from .pdf_service import ParsedPDF
+from .chunk_persistence import save_document_chunks
+from .. import db
+from ..models import PDFDocument
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """Background job queue for document ingestion.
+
+    Uploads are recorded as PDFDocument rows in the 'pending' state and handed
+    to a pool of local worker threads, which move them through 'processing' to
+    'completed' or 'error'. Progress of running jobs is kept in memory; the
+    status column is the durable record. No external broker is needed, and the
+    number of workers is tuned independently of the HTTP server.
+    """
+
+    def __init__(self, rag_service, max_workers: int = int(os.getenv('INGESTION_WORKERS', '2')),
+                 streaming: bool = True,
+                 persist_chunks: bool = os.getenv('PERSIST_CHUNKS', 'true').lower() in ('1', 'true', 'yes')):
+        """Initialize the ingestion queue.
+
+        Args:
+            rag_service (RAGService): Service the documents are indexed into
+            max_workers (int): Number of worker threads. Defaults to INGESTION_WORKERS env var.
+            streaming (bool): Use streaming ingestion so progress is reported while a document is processed
+            persist_chunks (bool): Store chunks and embeddings as DocumentChunk rows. Defaults to
+                PERSIST_CHUNKS env var.
+        """
+        self.rag_service = rag_service
+        self.max_workers = max_workers
+        self.streaming = streaming
+        self.persist_chunks = persist_chunks
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the worker pool on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='ingestion')
+            return self._executor
+
+    def _update(self, document_id: int, **fields) -> None:
+        """Update the in-memory progress record of a job."""
+        with self._lock:
+            self._jobs.setdefault(document_id, {}).update(fields)
+
+    def _set_status(self, document_id: int, status: str, **columns) -> None:
+        """Persist a job's status on its PDFDocument row."""
+        document = db.session.get(PDFDocument, document_id)
+        if document is None:
+            return
+        document.status = status
+        for name, value in columns.items():
+            setattr(document, name, value)
+        db.session.commit()
+
+    def _run(self, app, document_id: int, file_path: str, object_name: Optional[str]) -> None:
+        """Process one document inside an application context."""
+        with app.app_context():
+            indexed = False
+            try:
+                self._update(document_id, status='processing')
+                self._set_status(document_id, 'processing')
+
+                # One parse serves validation, metadata, S3 upload and text extraction
+                pdf = ParsedPDF(file_path)
+                pdf_service = self.rag_service.pdf_service
+                if pdf_service.s3_bucket:
+                    success, message, metadata = pdf_service.process_pdf_upload(pdf, object_name)
+                    if not success:
+                        raise ValueError(message)
+                else:
+                    metadata = pdf_service.extract_metadata(pdf)
+                self._update(document_id, total_pages=metadata.get('num_pages'))
+
+                # Chunk rows join the transaction that marks the document completed,
+                # so a failed job leaves no partial chunks behind
+                chunk_sink = None
+                if self.persist_chunks:
+                    chunk_sink = lambda chunks, embeddings: save_document_chunks(
+                        db.session, document_id, chunks, embeddings)
+
+                success, message = self.rag_service.process_document(
+                    pdf, str(document_id), streaming=self.streaming,
+                    progress_callback=lambda progress: self._update(document_id, **progress),
+                    chunk_sink=chunk_sink
+                )
+                if not success:
+                    raise ValueError(message)
+                indexed = True
+
+                self._update(document_id, status='completed', message=message)
+                self._set_status(document_id, 'completed', doc_metadata=_json_safe(metadata),
+                                 error_message=None)
+            except Exception as e:
+                logger.error(f"Error ingesting document {document_id}: {str(e)}")
+                db.session.rollback()
+                if indexed:
+                    # The rolled-back document must not stay searchable
+                    self.rag_service.clear_document(str(document_id))
+                self._update(document_id, status='error', message=str(e))
+                self._set_status(document_id, 'error', error_message=str(e))
+            finally:
+                db.session.remove()
+
+    # PUBLIC_INTERFACE
+    def submit(self, app, document_id: int, file_path: str, object_name: Optional[str] = None) -> Future:
+        """Queue a stored PDF for background ingestion.
+
+        Args:
+            app (Flask): Application whose context the worker runs in
+            document_id (int): ID of the PDFDocument row, already in the 'pending' state
+            file_path (str): Path of the stored PDF file
+            object_name (str, optional): S3 object name used when an S3 bucket is configured
+
+        Returns:
+            Future: Completes when the job has finished, successfully or not
+        """
+        self._update(document_id, status='pending', pages=0, chunks=0)
+        return self._get_executor().submit(self._run, app, document_id, file_path, object_name)
+
+    # PUBLIC_INTERFACE
+    def recover(self, app) -> int:
+        """Re-queue jobs left unfinished when the previous process stopped.
+
+        Jobs only live in this process, so at start-up every 'pending' row and
+        every 'processing' row was orphaned by a restart. Rows whose stored PDF
+        still exists are queued again; a 'processing' row first has any chunks
+        it had already indexed removed. Rows without a stored PDF are marked
+        'error'.
+
+        Args:
+            app (Flask): Application whose context the workers run in
+
+        Returns:
+            int: Number of jobs queued again
+        """
+        with app.app_context():
+            try:
+                documents = PDFDocument.query.filter(
+                    PDFDocument.status.in_(['pending', 'processing'])).order_by(PDFDocument.id).all()
+                jobs = []
+                for document in documents:
+                    if not document.file_path or not os.path.exists(document.file_path):
+                        document.status = 'error'
+                        document.error_message = 'Stored PDF is missing; upload the document again'
+                        continue
+                    if document.status == 'processing':
+                        self.rag_service.clear_document(str(document.id))
+                        document.status = 'pending'
+                    jobs.append((document.id, document.file_path, document.filename))
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error recovering ingestion jobs: {str(e)}")
+                db.session.rollback()
+                return 0
+            finally:
+                db.session.remove()
+
+        for document_id, file_path, object_name in jobs:
+            self.submit(app, document_id, file_path, object_name)
+        if jobs:
+            logger.info(f"Re-queued {len(jobs)} unfinished ingestion jobs")
+        return len(jobs)
+
+    # PUBLIC_INTERFACE
+    def get_progress(self, document_id: int) -> Optional[Dict[str, Any]]:
+        """Get the in-memory progress of a job submitted to this process.
+
+        Args:
+            document_id (int): ID of the PDFDocument row
+
+        Returns:
+            Optional[Dict[str, Any]]: status, pages, chunks, total_pages and message, or None
+        """
+        with self._lock:
+            job = self._jobs.get(document_id)
+            return dict(job) if job is not None else None
+
+    # PUBLIC_INTERFACE
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and optionally wait for running ones.
+
+        Args:
+            wait (bool): Block until queued jobs have finished
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _json_safe(value: Any) -> Any:
+    """Convert PDF metadata (which may hold PyPDF2 objects) into JSON-serializable values."""
+    if isinstance(value, dict):
+        return {str(k): _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
@@ -0,0 +1,184 @@
+"""Message Buffer for grouping chat message inserts from concurrent requests into bulk commits."""
+
+import os
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from .. import db
+from ..models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """Write-behind buffer for ChatMessage rows.
+
+    Requests hand their messages to add() and receive a Future for the row ID.
+    A background thread writes everything that arrived within the flush
+    interval with one INSERT ... RETURNING and one commit, so concurrent chat
+    requests share a transaction instead of each paying its own. Pending
+    messages are flushed when the process exits and before history is read,
+    and a failing batch is retried row by row so one bad message cannot fail
+    its neighbours.
+    """
+
+    def __init__(self, flush_interval_ms: float = float(os.getenv('MESSAGE_FLUSH_INTERVAL_MS', '20')),
+                 max_batch_size: int = int(os.getenv('MESSAGE_FLUSH_BATCH_SIZE', '500'))):
+        """Initialize the message buffer.
+
+        Args:
+            flush_interval_ms (float): Longest time a message waits before being written.
+                Defaults to MESSAGE_FLUSH_INTERVAL_MS env var.
+            max_batch_size (int): Pending messages that trigger an immediate flush.
+                Defaults to MESSAGE_FLUSH_BATCH_SIZE env var.
+        """
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.app = None
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+        self.flushes = 0
+        self.messages_written = 0
+        atexit.register(self.close)
+
+    def _start_worker(self) -> None:
+        """Start the background flush thread on first use; called with the lock held."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='message-buffer', daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        """Flush pending messages every interval, or sooner when a batch fills up."""
+        while True:
+            with self._wakeup:
+                if not self._pending and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                if len(self._pending) < self.max_batch_size:
+                    self._wakeup.wait(self.flush_interval)
+            self.flush()
+
+    def _write(self, rows: List[Dict[str, Any]]) -> List[int]:
+        """Insert rows in one statement and commit; return their IDs in order."""
+        statement = insert(ChatMessage).returning(ChatMessage.id, sort_by_parameter_order=True)
+        try:
+            ids = db.session.execute(statement, rows).scalars().all()
+            db.session.commit()
+            return ids
+        except Exception:
+            db.session.rollback()
+            raise
+
+    # PUBLIC_INTERFACE
+    def add(self, session_id: int, content: str, message_type: str,
+            timestamp: Optional[datetime] = None) -> Future:
+        """Queue a chat message for the next bulk write.
+
+        Must be called inside an application context; the buffer writes
+        through that application's database.
+
+        Args:
+            session_id (int): ID of the chat session
+            content (str): Message text
+            message_type (str): 'user' or 'assistant'
+            timestamp (datetime, optional): Message time; defaults to now, so that
+                messages keep the order in which they were added
+
+        Returns:
+            Future: Resolves to the message ID once the message is committed
+        """
+        from flask import current_app
+
+        future = Future()
+        row = {
+            'session_id': session_id,
+            'content': content,
+            'type': message_type,
+            'timestamp': timestamp or datetime.utcnow()
+        }
+        with self._wakeup:
+            if self._closed:
+                raise RuntimeError("Message buffer is closed")
+            if self.app is None:
+                self.app = current_app._get_current_object()
+            self._pending.append((row, future))
+            self._start_worker()
+            # Wake the worker to open a batch or to write a full one; not on every message
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._wakeup.notify()
+        return future
+
+    # PUBLIC_INTERFACE
+    def flush(self) -> int:
+        """Write all pending messages now.
+
+        Returns:
+            int: Number of messages written
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            with self.app.app_context():
+                rows = [row for row, _ in batch]
+                try:
+                    results = [(future, message_id, None)
+                               for (_, future), message_id in zip(batch, self._write(rows))]
+                except Exception as e:
+                    logger.error(f"Error writing message batch, retrying individually: {str(e)}")
+                    results = []
+                    for row, future in batch:
+                        try:
+                            results.append((future, self._write([row])[0], None))
+                        except Exception as row_error:
+                            logger.error(f"Error writing chat message: {str(row_error)}")
+                            results.append((future, None, row_error))
+
+            written = sum(1 for _, _, error in results if error is None)
+            with self._lock:
+                self.flushes += 1
+                self.messages_written += written
+            for future, message_id, error in results:
+                if error is None:
+                    future.set_result(message_id)
+                else:
+                    future.set_exception(error)
+            return written
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Stop the background thread and write any messages still pending."""
+        with self._wakeup:
+            self._closed = True
+            self._wakeup.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+        if self.app is not None:
+            self.flush()
+
+    # PUBLIC_INTERFACE
+    def stats(self) -> Dict[str, Any]:
+        """Return write counters for monitoring.
+
+        Returns:
+            Dict[str, Any]: pending, flushes, messages_written and messages_per_flush
+        """
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'flushes': self.flushes,
+                'messages_written': self.messages_written,
+                'messages_per_flush': self.messages_written / self.flushes if self.flushes else 0.0
+            }
@@ -0,0 +1,191 @@
+"""Model Server for sharing one embedding model between worker processes on a host.
+
+Connections exchange pickled messages, so a peer that passes the handshake
+can run code in the other process. The server and its clients therefore
+share a secret that has no default (RAG_MODEL_SERVER_AUTHKEY), and the
+socket is only accessible to its owner.
+"""
+
+import os
+import stat
+import argparse
+import logging
+import tempfile
+import threading
+from multiprocessing.connection import Listener, Client
+from typing import Any, List, Optional, Union
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_authkey(authkey: Optional[bytes]) -> bytes:
+    """Return the given shared secret, or the one from RAG_MODEL_SERVER_AUTHKEY."""
+    if authkey is None:
+        authkey = os.getenv('RAG_MODEL_SERVER_AUTHKEY', '').encode('utf-8')
+    if not authkey:
+        raise ValueError("RAG_MODEL_SERVER_AUTHKEY must be set to a shared secret for the model server")
+    return authkey
+
+
+# PUBLIC_INTERFACE
+def default_address() -> str:
+    """Return the default socket path, inside a runtime directory only this user can enter.
+
+    Returns:
+        str: Path of the model server's Unix socket
+    """
+    directory = os.getenv('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f"rag-model-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    # A directory left by another user, or opened up to others, would expose the socket
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Runtime directory {directory} must be a directory private to its owner")
+    return os.path.join(directory, 'rag-model.sock')
+
+
+class EmbeddingServer:
+    """Serves SentenceTransformer.encode over a local socket.
+
+    Run one server per host and point every Flask/gunicorn worker at it with
+    RAG_MODEL_SERVER; the model weights are then loaded once instead of once
+    per worker, and worker start-up does not pay the model load at all.
+    """
+
+    def __init__(self, model_name: str, address: str, authkey: Optional[bytes] = None):
+        """Initialize the embedding server.
+
+        Args:
+            model_name (str): Name of the sentence-transformer model to serve
+            address (str): Unix socket path to listen on
+            authkey (bytes, optional): Shared secret clients must present. Defaults to
+                RAG_MODEL_SERVER_AUTHKEY env var; there is no fallback.
+
+        Raises:
+            ValueError: If no shared secret is configured
+        """
+        self.model_name = model_name
+        self.address = address
+        self.authkey = _resolve_authkey(authkey)
+        self.model = None
+        self._encode_lock = threading.Lock()
+
+    def _handle(self, conn) -> None:
+        """Answer encode requests on one client connection until it closes."""
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+                try:
+                    texts, kwargs = request
+                    # One forward pass at a time; torch already parallelizes within a batch
+                    with self._encode_lock:
+                        result = np.asarray(self.model.encode(texts, **kwargs), dtype=np.float32)
+                    conn.send(('ok', result))
+                except Exception as e:
+                    logger.error(f"Error encoding request: {str(e)}")
+                    conn.send(('error', str(e)))
+        finally:
+            conn.close()
+
+    # PUBLIC_INTERFACE
+    def serve_forever(self) -> None:
+        """Load the model and accept client connections until the process is stopped."""
+        if self.model is None:
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        if os.path.lexists(self.address):
+            # Only replace a stale socket, never a file that merely sits at the configured path
+            if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                raise FileExistsError(f"{self.address} exists and is not a socket")
+            os.unlink(self.address)
+        # The umask closes the window between bind and chmod
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        os.chmod(self.address, 0o600)
+        with listener:
+            logger.info(f"Serving {self.model_name} embeddings on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.error(f"Error accepting connection: {str(e)}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class RemoteEncoder:
+    """Client with the encode() interface of SentenceTransformer, backed by an EmbeddingServer."""
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None):
+        """Initialize the remote encoder.
+
+        Args:
+            address (str): Unix socket path of the embedding server
+            authkey (bytes, optional): Shared secret of the embedding server. Defaults to
+                RAG_MODEL_SERVER_AUTHKEY env var; there is no fallback.
+
+        Raises:
+            ValueError: If no shared secret is configured
+        """
+        self.address = address
+        self.authkey = _resolve_authkey(authkey)
+        self._local = threading.local()
+
+    def _connection(self):
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, texts: List[str], kwargs: dict) -> np.ndarray:
+        """Send one encode request and wait for the reply."""
+        conn = self._connection()
+        conn.send((texts, kwargs))
+        status, payload = conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    # PUBLIC_INTERFACE
+    def encode(self, sentences: Union[str, List[str]], **kwargs: Any) -> np.ndarray:
+        """Embed sentences on the model server.
+
+        Args:
+            sentences (Union[str, List[str]]): Text or texts to embed
+            **kwargs: Passed through to SentenceTransformer.encode (e.g. batch_size)
+
+        Returns:
+            np.ndarray: Embeddings, one row per sentence (a vector for a single string)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        try:
+            result = self._request(texts, kwargs)
+        except (EOFError, OSError):
+            # The server restarted; reconnect once
+            self._local.conn = None
+            result = self._request(texts, kwargs)
+        return result[0] if single else result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run an embedding server from the command line."""
+    parser = argparse.ArgumentParser(description="Serve sentence-transformer embeddings over a Unix socket")
+    parser.add_argument('--model', default=os.getenv('RAG_MODEL_NAME', 'all-MiniLM-L6-v2'))
+    parser.add_argument('--address', default=os.getenv('RAG_MODEL_SERVER'),
+                        help="Socket path; defaults to a private runtime directory")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    EmbeddingServer(args.model, args.address or default_address()).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
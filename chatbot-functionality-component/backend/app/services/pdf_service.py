@@ -3,13 +3,65 @@
 import os
 import magic
 import boto3
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Union
 import logging
 from PyPDF2 import PdfReader
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# PUBLIC_INTERFACE
+class ParsedPDF:
+    """A PDF file that is parsed at most once.
+
+    Validation, metadata extraction and text extraction all accept a ParsedPDF
+    in place of a file path and share its PdfReader, so one upload is parsed a
+    single time however many stages look at it.
+    """
+
+    def __init__(self, file_path: str):
+        """Initialize the parsed PDF.
+        
+        Args:
+            file_path (str): Path to the PDF file. Parsing is deferred until first use.
+        """
+        self.file_path = file_path
+        self._reader = None
+
+    @classmethod
+    def of(cls, pdf: Union[str, 'ParsedPDF']) -> 'ParsedPDF':
+        """Return pdf unchanged if it is already a ParsedPDF, otherwise wrap the path."""
+        return pdf if isinstance(pdf, cls) else cls(pdf)
+
+    @property
+    def reader(self) -> PdfReader:
+        """PdfReader: The parsed document, created on first access."""
+        if self._reader is None:
+            self._reader = PdfReader(self.file_path)
+        return self._reader
+
+    @property
+    def pages(self):
+        """The document's pages."""
+        return self.reader.pages
+
+# PUBLIC_INTERFACE
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) from a PDF file.
+    
+    Runs in process-pool workers, so it opens its own reader from the path.
+    
+    Args:
+        file_path (str): Path to the PDF file
+        start (int): First page index
+        stop (int): Page index to stop before
+        
+    Returns:
+        List[str]: Text of each page in order
+    """
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
 class PDFService:
     """Service class for handling PDF file operations."""
     
@@ -19,21 +71,34 @@ class PDFService:
         Args:
             s3_bucket (str): The name of the S3 bucket for storage. Defaults to AWS_S3_BUCKET env var.
         """
-        self.s3_client = boto3.client('s3')
+        self._s3_client = None  # Created on first use, see the s3_client property
         self.s3_bucket = s3_bucket
         self.mime = magic.Magic(mime=True)
         self.max_file_size = 50 * 1024 * 1024  # 50MB max file size
 
+    @property
+    def s3_client(self):
+        """The boto3 S3 client, created on first use."""
+        if self._s3_client is None:
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    @s3_client.setter
+    def s3_client(self, client):
+        self._s3_client = client
+
     # PUBLIC_INTERFACE
-    def validate_pdf(self, file_path: str) -> Tuple[bool, str]:
+    def validate_pdf(self, file_path: Union[str, ParsedPDF]) -> Tuple[bool, str]:
         """Validate a PDF file.
         
         Args:
-            file_path (str): Path to the PDF file.
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or an already opened ParsedPDF.
             
         Returns:
             Tuple[bool, str]: (is_valid, error_message)
         """
+        pdf = ParsedPDF.of(file_path)
+        file_path = pdf.file_path
         try:
             # Check if file exists
             if not os.path.exists(file_path):
@@ -51,7 +116,7 @@ class PDFService:
             
             # Verify PDF structure
             try:
-                PdfReader(file_path)
+                pdf.reader
             except Exception as e:
                 return False, f"Invalid PDF structure: {str(e)}"
             
@@ -83,22 +148,23 @@ class PDFService:
             return False, f"Upload failed: {str(e)}"
 
     # PUBLIC_INTERFACE
-    def extract_metadata(self, file_path: str) -> Dict[str, Any]:
+    def extract_metadata(self, file_path: Union[str, ParsedPDF]) -> Dict[str, Any]:
         """Extract metadata from a PDF file.
         
         Args:
-            file_path (str): Path to the PDF file.
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or an already opened ParsedPDF.
             
         Returns:
             Dict[str, Any]: Dictionary containing metadata
         """
         try:
-            pdf = PdfReader(file_path)
+            parsed = ParsedPDF.of(file_path)
+            pdf = parsed.reader
             metadata = {
                 'num_pages': len(pdf.pages),
                 'encrypted': pdf.is_encrypted,
                 'info': pdf.metadata if pdf.metadata else {},
-                'size': os.path.getsize(file_path)
+                'size': os.path.getsize(parsed.file_path)
             }
             return metadata
         except Exception as e:
@@ -106,23 +172,29 @@ class PDFService:
             return {}
 
     # PUBLIC_INTERFACE
-    def process_pdf_upload(self, file_path: str, object_name: str = None) -> Tuple[bool, str, Dict[str, Any]]:
+    def process_pdf_upload(self, file_path: Union[str, ParsedPDF],
+                           object_name: str = None) -> Tuple[bool, str, Dict[str, Any]]:
         """Process a PDF upload including validation, metadata extraction, and storage.
         
+        The file is parsed once and the same reader is used for every step.
+        
         Args:
-            file_path (str): Path to the PDF file.
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or an already opened ParsedPDF.
             object_name (str, optional): S3 object name. If not specified, file_path is used.
             
         Returns:
             Tuple[bool, str, Dict[str, Any]]: (success, message, metadata)
         """
+        pdf = ParsedPDF.of(file_path)
+        file_path = pdf.file_path
+
         # Validate PDF
-        is_valid, error_msg = self.validate_pdf(file_path)
+        is_valid, error_msg = self.validate_pdf(pdf)
         if not is_valid:
             return False, error_msg, {}
 
         # Extract metadata
-        metadata = self.extract_metadata(file_path)
+        metadata = self.extract_metadata(pdf)
         if not metadata:
             return False, "Failed to extract metadata", {}
 
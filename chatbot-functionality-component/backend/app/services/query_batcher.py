@@ -0,0 +1,124 @@
+"""Query Batcher for grouping concurrent RAG searches into batched model and index calls."""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBatcher:
+    """Micro-batching scheduler in front of RAGService.search_batch.
+
+    Requests submitted from many threads are queued; a single worker thread
+    takes the first waiting query, keeps collecting for up to ``max_wait_ms``
+    or until ``max_batch_size`` queries are waiting, encodes them in one
+    call and searches them as one batch per document scope. Each caller gets
+    a Future resolved with its own results.
+    """
+
+    def __init__(self, rag_service, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """Initialize the query batcher.
+
+        Args:
+            rag_service (RAGService): Service whose search_batch is called
+            max_batch_size (int): Maximum number of queries per batch
+            max_wait_ms (float): How long to wait for more queries after the first one arrives
+        """
+        self.rag_service = rag_service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self) -> None:
+        """Start the worker thread on first use."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='rag-query-batcher', daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[tuple]:
+        """Block for the first request, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _search(self, batch: List[tuple], scope: Optional[tuple], embeddings) -> None:
+        """Run one batch of requests that share a document scope, given their query embeddings."""
+        # Requests may ask for different k; search once with the largest and trim
+        k = max(item[1] for item in batch)
+        try:
+            queries = [item[0] for item in batch]
+            results = self.rag_service.search_batch(queries, k, document_ids=scope, query_embeddings=embeddings)
+            for (_, item_k, _, future), result in zip(batch, results):
+                future.set_result(result[:item_k])
+        except Exception as e:
+            logger.error(f"Error during batched search: {str(e)}")
+            for _, _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _run(self) -> None:
+        """Worker loop executing collected batches."""
+        while True:
+            items = self._collect()
+            try:
+                # One encoding call serves every scope in the batch
+                embeddings = self.rag_service.encode_queries([item[0] for item in items])
+            except Exception as e:
+                logger.error(f"Error encoding batched queries: {str(e)}")
+                for _, _, _, future in items:
+                    future.set_exception(e)
+                continue
+            groups = {}
+            for row, item in enumerate(items):
+                groups.setdefault(item[2], []).append(row)
+            for scope, rows in groups.items():
+                self._search([items[row] for row in rows], scope, embeddings[rows])
+
+    # PUBLIC_INTERFACE
+    def submit(self, query: str, k: int = 5, document_ids: Optional[Iterable[str]] = None) -> Future:
+        """Queue a search to run in the next batch.
+
+        Args:
+            query (str): Search query
+            k (int): Number of results to return
+            document_ids (Iterable[str], optional): Only search these documents
+
+        Returns:
+            Future: Resolves to the List[Dict[str, Any]] that RAGService.search would return
+        """
+        self._ensure_worker()
+        future = Future()
+        scope = None if document_ids is None else tuple(sorted({str(d) for d in document_ids}))
+        self._queue.put((query, k, scope, future))
+        return future
+
+    # PUBLIC_INTERFACE
+    def search(self, query: str, k: int = 5, timeout: float = 30.0,
+               document_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Submit a search and wait for its batched result.
+
+        Args:
+            query (str): Search query
+            k (int): Number of results to return
+            timeout (float): Seconds to wait for the batch to complete
+            document_ids (Iterable[str], optional): Only search these documents
+
+        Returns:
+            List[Dict[str, Any]]: List of search results with text and metadata
+        """
+        return self.submit(query, k, document_ids).result(timeout=timeout)
@@ -1,52 +1,283 @@
 """RAG Service for handling text extraction, embedding generation, and vector storage."""
 
 import os
+import math
+import atexit
 import logging
-from typing import List, Dict, Any, Tuple, Optional
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Union, Iterator, Iterable, Callable
 import numpy as np
-from PyPDF2 import PdfReader
 import faiss
 from sentence_transformers import SentenceTransformer
-from .pdf_service import PDFService
+from .pdf_service import PDFService, ParsedPDF, extract_page_range
+from .index_store import IndexStore
+from .chunk_store import ChunkStore
+from .chunk_persistence import load_document_chunks
+from .vector_index import VectorIndexFactory, ShardedIndex, clone_index, recall_latency_report
+from .cache import LRUCache
+from .locks import ReadWriteLock
+from .embedding_cache import EmbeddingCache
+from .model_server import RemoteEncoder
 
 logger = logging.getLogger(__name__)
 
 class RAGService:
-    """Service class for handling RAG operations including text extraction and vector storage."""
+    """Service class for handling RAG operations including text extraction and vector storage.
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', chunk_size: int = 500):
+    One instance is shared by all request threads. The index, chunk store and
+    chunk ID counter are guarded by a reader-writer lock: searches read them
+    concurrently, while changes take the lock exclusively only for the index
+    and chunk store update itself. PDF parsing and embedding run outside the
+    lock, so a search waits at most for one index update, never for a whole
+    document to be ingested, and never sees a half-applied change.
+    
+    Changes are serialized by a separate update lock that searches never
+    take. Slow index work, training a staged index or rebuilding one that
+    cannot delete in place, runs under the update lock only; the result is
+    swapped in under the exclusive lock. The update lock is always taken
+    before the reader-writer lock.
+    """
+    
+    # Documents shorter than this are extracted in-process; pool start-up would dominate
+    PARALLEL_EXTRACTION_MIN_PAGES = 50
+    
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', chunk_size: int = 500,
+                 index_path: Optional[str] = os.getenv('RAG_INDEX_PATH'), autosave: bool = True,
+                 autosave_interval: float = float(os.getenv('RAG_AUTOSAVE_INTERVAL', '30')),
+                 index_type: str = os.getenv('RAG_INDEX_TYPE', 'flat'),
+                 index_params: Optional[Dict[str, Any]] = None,
+                 cache_size: int = int(os.getenv('RAG_CACHE_SIZE', '1024')),
+                 cache_ttl: Optional[float] = float(os.getenv('RAG_CACHE_TTL', '300')),
+                 embedding_cache_path: Optional[str] = os.getenv('RAG_EMBEDDING_CACHE_PATH'),
+                 extraction_workers: int = int(os.getenv('RAG_EXTRACTION_WORKERS', '1')),
+                 stream_batch_size: int = int(os.getenv('RAG_STREAM_BATCH_SIZE', '256')),
+                 model_server: Optional[str] = os.getenv('RAG_MODEL_SERVER'),
+                 scope_cache_bytes: int = int(os.getenv('RAG_SCOPE_CACHE_BYTES', str(256 * 1024 * 1024))),
+                 min_similarity: Optional[float] = float(os.environ['RAG_MIN_SIMILARITY'])
+                 if os.getenv('RAG_MIN_SIMILARITY') else None):
         """Initialize the RAG service.
         
         Args:
             model_name (str): Name of the sentence-transformer model to use
             chunk_size (int): Size of text chunks for processing
+            index_path (str, optional): Directory for index snapshots. Defaults to RAG_INDEX_PATH env var.
+            autosave (bool): Write document changes to a new snapshot when index_path is set
+            autosave_interval (float): Seconds between autosaves; 0 saves after every change.
+                Defaults to RAG_AUTOSAVE_INTERVAL env var. Each tick also loads snapshots
+                written by other processes sharing index_path.
+            index_type (str): 'flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq8', 'sq_fp16' or 'pq'.
+                Defaults to RAG_INDEX_TYPE env var.
+            index_params (Dict[str, Any], optional): Index build/search parameters such as
+                metric, nlist, nprobe, pq_m, hnsw_m, ef_search, train_size, refine, num_shards
+                and search_threads. metric='cosine' stores unit-normalized embeddings in
+                inner-product indexes and reports cosine similarities as scores.
+            cache_size (int): Entries in the query embedding and search result caches; 0 disables them
+            cache_ttl (float, optional): Seconds a cached entry stays valid
+            embedding_cache_path (str, optional): SQLite file for the chunk embedding cache.
+                Defaults to RAG_EMBEDDING_CACHE_PATH env var; disabled when unset.
+            extraction_workers (int): Processes used to extract text from large PDFs; 1 extracts serially.
+                Defaults to RAG_EXTRACTION_WORKERS env var.
+            stream_batch_size (int): Chunks encoded and indexed per batch when processing in streaming mode
+            model_server (str, optional): Socket path of a shared EmbeddingServer. Defaults to
+                RAG_MODEL_SERVER env var; when unset the model is loaded in this process.
+            scope_cache_bytes (int): Memory budget of the per-document sub-indexes kept for
+                scoped searches. Defaults to RAG_SCOPE_CACHE_BYTES env var.
+            min_similarity (float, optional): Default cosine similarity below which search
+                results are dropped; only applies with metric='cosine'. Defaults to
+                RAG_MIN_SIMILARITY env var.
         """
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self.model_server = model_server
+        self._model = None  # Loaded on first use, see the model property
+        self._model_lock = threading.Lock()
         self.chunk_size = chunk_size
+        self.extraction_workers = max(1, extraction_workers)
+        self.stream_batch_size = max(1, stream_batch_size)
         self.pdf_service = PDFService()
+        self._index_lock = ReadWriteLock()  # Guards index, chunk_store and _next_chunk_id
+        self._update_lock = threading.RLock()  # Serializes changes; held while training or rebuilding
         self.index = None
-        self.text_chunks = []
-        self.document_map = {}  # Maps chunk indices to document information
+        self.chunk_store = ChunkStore()  # Chunk texts and document information, keyed by chunk ID
+        self._next_chunk_id = 0
+        self._index_mmapped = False
+        self.autosave = autosave
+        self.autosave_interval = autosave_interval
+        self._snapshot_name = None  # Snapshot this process last loaded or wrote
+        self._changed_documents = set()  # Documents changed since then, merged on the next save
+        self._overwrite_snapshot = False  # Set when the whole state was replaced, e.g. from the database
+        self._autosave_worker = None
+        self._autosave_stop = threading.Event()
+        self.index_factory = VectorIndexFactory(index_type, index_params)
+        self.index_generation = 0  # Bumped on every index change to invalidate cached results
+        self.embedding_cache = LRUCache(cache_size, cache_ttl)
+        self.result_cache = LRUCache(cache_size, cache_ttl)
+        # Exact per-document sub-indexes for scoped searches, bounded by the bytes of their vectors
+        self.scope_cache = LRUCache(scope_cache_bytes, sizeof=lambda index: index.ntotal * index.d * 4)
+        self.min_similarity = min_similarity
+        self.chunk_embedding_cache = EmbeddingCache(embedding_cache_path, model_name) if embedding_cache_path else None
+        self.index_store = IndexStore(index_path) if index_path else None
+        if self.index_store and self.index_store.exists():
+            self.load_snapshot()
+        if self.index_store and self.autosave and self.autosave_interval > 0:
+            self._start_autosave()
+
+    @property
+    def text_chunks(self):
+        """Read-only mapping of chunk IDs to chunk text."""
+        return self.chunk_store.texts
+
+    @property
+    def document_map(self):
+        """Read-only mapping of chunk IDs to document information."""
+        return self.chunk_store.infos
+
+    @property
+    def document_chunks(self):
+        """Read-only mapping of document IDs to their chunk IDs, in chunk order."""
+        return self.chunk_store.by_document
+
+    @property
+    def model(self):
+        """The embedding model, loaded on first use.
+        
+        Returns a RemoteEncoder when a model server is configured, so the
+        weights live in one process per host rather than in every worker.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    if self.model_server:
+                        self._model = RemoteEncoder(self.model_server)
+                    else:
+                        self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    # PUBLIC_INTERFACE
+    def warm_up(self) -> bool:
+        """Load the embedding model and run one encode so the first request is not slow.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            self.model.encode(["warm up"])
+            return True
+        except Exception as e:
+            logger.error(f"Error warming up model: {str(e)}")
+            return False
+
+    def _ensure_writable_index(self) -> None:
+        """Replace a memory-mapped, read-only index with an in-memory copy; called with the update lock held."""
+        if self._index_mmapped and self.index is not None:
+            # Copied while searches continue; no other change can run meanwhile
+            writable = clone_index(self.index)
+            with self._index_lock.write_locked():
+                self.index = writable
+        self._index_mmapped = False
 
-    def _extract_text_from_pdf(self, file_path: str) -> str:
+    def _shards(self) -> List[Any]:
+        """Return the sub-indexes of a sharded index, or the index itself."""
+        if self.index is None:
+            return []
+        return list(self.index.shards) if isinstance(self.index, ShardedIndex) else [self.index]
+
+    def _replace_shard(self, number: int, shard) -> None:
+        """Swap in a rebuilt sub-index; called with the write lock held."""
+        self.index_factory.configure_search(shard)
+        if isinstance(self.index, ShardedIndex):
+            self.index.shards[number] = shard
+        else:
+            self.index = shard
+
+    def _promote_shards(self) -> None:
+        """Train staged sub-indexes that have collected enough vectors; called with the update lock held."""
+        for number, shard in enumerate(self._shards()):
+            if self.index_factory.should_promote(shard):
+                # Training only reads the staged shard, so searches keep using it meanwhile
+                trained = self.index_factory.promote(shard)
+                with self._index_lock.write_locked():
+                    self._replace_shard(number, trained)
+                    self.index_generation += 1
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalize query text for use as a cache key."""
+        return " ".join(query.split()).casefold()
+
+    def _autosave(self) -> None:
+        """Write a snapshot after a document change, or leave it to the autosave thread."""
+        if not (self.index_store and self.autosave):
+            return
+        if self.autosave_interval > 0:
+            self._start_autosave()
+        else:
+            self.save_snapshot()
+
+    def _start_autosave(self) -> None:
+        """Start the periodic autosave thread on first use."""
+        with self._update_lock:
+            if self._autosave_worker is None:
+                self._autosave_worker = threading.Thread(target=self._run_autosave, name='rag-autosave',
+                                                         daemon=True)
+                self._autosave_worker.start()
+                atexit.register(self.close)
+
+    def _run_autosave(self) -> None:
+        """Save pending changes, or pick up other processes' snapshots, every autosave_interval."""
+        while not self._autosave_stop.wait(self.autosave_interval):
+            self.sync_snapshot()
+
+    def _extract_text_from_pdf(self, file_path: Union[str, ParsedPDF]) -> str:
         """Extract text content from a PDF file.
         
         Args:
-            file_path (str): Path to the PDF file
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or an already opened ParsedPDF
             
         Returns:
             str: Extracted text content
         """
         try:
-            pdf = PdfReader(file_path)
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() + "\n"
-            return text
+            return "".join(page_text + "\n" for page_text in self._iter_page_texts(file_path))
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {str(e)}")
             raise
 
+    def _iter_page_texts(self, file_path: Union[str, ParsedPDF]) -> Iterator[str]:
+        """Yield the text of each page in order.
+        
+        Large documents are split into page ranges that are extracted in a
+        process pool when extraction_workers > 1; results are still yielded in
+        page order as soon as each range completes.
+        
+        Args:
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or an already opened ParsedPDF
+            
+        Yields:
+            str: Text of the next page
+        """
+        pdf = ParsedPDF.of(file_path)
+        num_pages = len(pdf.pages)
+        if self.extraction_workers <= 1 or num_pages < self.PARALLEL_EXTRACTION_MIN_PAGES:
+            for page in pdf.pages:
+                yield page.extract_text()
+            return
+
+        # Several ranges per worker keep the pool busy when some pages are slower than others
+        shard_size = math.ceil(num_pages / (self.extraction_workers * 4))
+        starts = list(range(0, num_pages, shard_size))
+        stops = [min(start + shard_size, num_pages) for start in starts]
+        # Spawned workers do not inherit the parent's threads or model state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.extraction_workers, mp_context=context) as executor:
+            for page_texts in executor.map(extract_page_range, [pdf.file_path] * len(starts), starts, stops):
+                yield from page_texts
+
     def _chunk_text(self, text: str) -> List[str]:
         """Split text into chunks of approximately equal size.
         
@@ -56,113 +287,387 @@ class RAGService:
         Returns:
             List[str]: List of text chunks
         """
-        words = text.split()
-        chunks = []
+        return list(self._iter_chunks(text.split()))
+
+    def _iter_chunks(self, words: Iterable[str]) -> Iterator[str]:
+        """Group a stream of words into chunks of approximately equal size.
+        
+        Args:
+            words (Iterable[str]): Words in document order
+            
+        Yields:
+            str: The next text chunk
+        """
         current_chunk = []
         current_size = 0
         
         for word in words:
             current_size += len(word) + 1  # +1 for space
             if current_size > self.chunk_size:
-                chunks.append(" ".join(current_chunk))
+                yield " ".join(current_chunk)
                 current_chunk = [word]
                 current_size = len(word)
             else:
                 current_chunk.append(word)
         
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            yield " ".join(current_chunk)
+
+    def _encode_chunks(self, chunks: List[str]) -> np.ndarray:
+        """Embed chunks, skipping those already in the chunk embedding cache."""
+        if self.chunk_embedding_cache:
+            return self.chunk_embedding_cache.encode(chunks, self.model.encode)
+        return np.asarray(self.model.encode(chunks), dtype=np.float32)
+
+    def _add_chunks(self, document_id: str, first_chunk_index: int, chunks: List[str],
+                    embeddings: np.ndarray, total_chunks: int) -> List[int]:
+        """Add embedded chunks to the index and chunk store under new chunk IDs.
         
-        return chunks
+        Returns:
+            List[int]: The chunk IDs assigned to the chunks
+        """
+        # Normalized here rather than at encode time so cached and stored embeddings are covered too
+        embeddings = self.index_factory.normalize(embeddings)
+        with self._update_lock:
+            self._ensure_writable_index()
+            with self._index_lock.write_locked():
+                # Initialize FAISS index if needed
+                if self.index is None:
+                    dimension = embeddings.shape[1]
+                    self.index = self.index_factory.create(dimension)
+                
+                # Add to index under stable chunk IDs; training happens below, outside the lock
+                start_idx = self._next_chunk_id
+                chunk_ids = np.arange(start_idx, start_idx + len(chunks), dtype=np.int64)
+                self.index = self.index_factory.add(self.index, embeddings, chunk_ids, document_id, promote=False)
+                self._next_chunk_id += len(chunks)
+                
+                # Store chunks and document mapping
+                self.chunk_store.add(document_id, start_idx, first_chunk_index, chunks, total_chunks)
+                self._changed_documents.add(document_id)
+                self.index_generation += 1
+            self._promote_shards()
+        return chunk_ids.tolist()
+
+    def _remove_chunks(self, chunk_ids: List[int], document_id: str) -> None:
+        """Remove chunks of one document from the index and chunk store by chunk ID."""
+        ids = np.asarray(chunk_ids, dtype=np.int64)
+        with self._update_lock:
+            self._ensure_writable_index()
+            # Sub-indexes that cannot delete in place are rebuilt while searches continue
+            rebuilt = {number: self.index_factory.remove_ids(shard, ids)
+                       for number, shard in enumerate(self._shards())
+                       if not self.index_factory.supports_removal(shard)}
+            with self._index_lock.write_locked():
+                # Drop the vectors by ID; surviving embeddings are left untouched
+                for number, shard in enumerate(self._shards()):
+                    if number in rebuilt:
+                        if rebuilt[number] is not shard:
+                            self._replace_shard(number, rebuilt[number])
+                    else:
+                        shard.remove_ids(ids)
+                
+                self.chunk_store.remove(ids)
+                self._changed_documents.add(document_id)
+                
+                if not len(self.chunk_store):
+                    self.index = None
+                self.index_generation += 1
+
+    def _iter_batches(self, items: Iterable[str], size: int) -> Iterator[List[str]]:
+        """Group a stream into lists of at most size items."""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _process_document_streaming(self, pdf: ParsedPDF, document_id: str,
+                                    progress_callback: Optional[Callable[[Dict[str, int]], None]],
+                                    chunk_sink: Optional[Callable[[List[str], np.ndarray], None]] = None,
+                                    file_hash: Optional[str] = None, cached_chunks: Optional[List[str]] = None
+                                    ) -> Tuple[bool, str]:
+        """Ingest a document page by page, encoding and indexing fixed-size chunk batches.
+        
+        Peak memory is bounded by stream_batch_size chunks rather than by the
+        document. Chunks become searchable batch by batch; if ingestion fails
+        part-way, the chunks added so far are removed again. Chunks cached for
+        an identical earlier upload are streamed without extracting any text.
+        """
+        progress = {'pages': 0, 'chunks': 0}
+        chunk_ids = []
+        # Chunk texts are kept anyway by the chunk store, so remembering them here is cheap
+        seen_chunks = [] if file_hash is not None and cached_chunks is None else None
+
+        def words():
+            for page_text in self._iter_page_texts(pdf):
+                progress['pages'] += 1
+                yield from page_text.split()
+
+        chunks = iter(cached_chunks) if cached_chunks is not None else self._iter_chunks(words())
+        try:
+            for batch in self._iter_batches(chunks, self.stream_batch_size):
+                if seen_chunks is not None:
+                    seen_chunks.extend(batch)
+                embeddings = self._encode_chunks(batch)
+                if chunk_sink:
+                    chunk_sink(batch, embeddings)
+                chunk_ids.extend(self._add_chunks(document_id, progress['chunks'], batch, embeddings, 0))
+                progress['chunks'] += len(batch)
+                if progress_callback:
+                    progress_callback(dict(progress))
+        except Exception:
+            if chunk_ids:
+                self._remove_chunks(chunk_ids, document_id)
+            raise
+
+        if not progress['chunks']:
+            return False, "No text content found in document"
+        if seen_chunks is not None:
+            self.chunk_embedding_cache.put_file_chunks(file_hash, self.chunk_size, seen_chunks)
+
+        # The chunk count is only known once the last page has been read
+        with self._update_lock, self._index_lock.write_locked():
+            self.chunk_store.set_total_chunks(chunk_ids, len(chunk_ids))
+            self.index_generation += 1
+
+        self._autosave()
+        return True, "Document processed successfully"
 
     # PUBLIC_INTERFACE
-    def process_document(self, file_path: str, document_id: str) -> Tuple[bool, str]:
+    def process_document(self, file_path: Union[str, ParsedPDF], document_id: str, streaming: bool = False,
+                         progress_callback: Optional[Callable[[Dict[str, int]], None]] = None,
+                         chunk_sink: Optional[Callable[[List[str], np.ndarray], None]] = None
+                         ) -> Tuple[bool, str]:
         """Process a document for RAG operations.
         
         Args:
-            file_path (str): Path to the PDF file
+            file_path (Union[str, ParsedPDF]): Path to the PDF file, or a ParsedPDF shared
+                with other ingestion steps so the file is parsed only once
             document_id (str): Unique identifier for the document
+            streaming (bool): Extract, chunk, encode and index in batches of stream_batch_size
+                chunks instead of materializing the whole document
+            progress_callback (Callable, optional): Called after each streamed batch with
+                the number of 'pages' read and 'chunks' indexed so far
+            chunk_sink (Callable, optional): Called with each batch of chunks and their
+                embeddings before they are indexed, e.g. to persist them to the database
             
         Returns:
             Tuple[bool, str]: (success, message)
         """
         try:
+            pdf = ParsedPDF.of(file_path)
+            file_path = pdf.file_path
+
             # Validate PDF
-            is_valid, error_msg = self.pdf_service.validate_pdf(file_path)
+            is_valid, error_msg = self.pdf_service.validate_pdf(pdf)
             if not is_valid:
                 return False, error_msg
 
-            # Extract text
-            text = self._extract_text_from_pdf(file_path)
-            if not text.strip():
-                return False, "No text content found in document"
+            # Reuse the chunks of an identical earlier upload
+            file_hash = None
+            chunks = None
+            if self.chunk_embedding_cache:
+                file_hash = EmbeddingCache.file_hash(file_path)
+                chunks = self.chunk_embedding_cache.get_file_chunks(file_hash, self.chunk_size)
 
-            # Create chunks
-            chunks = self._chunk_text(text)
-            
-            # Generate embeddings
-            embeddings = self.model.encode(chunks)
-            
-            # Initialize FAISS index if needed
-            if self.index is None:
-                dimension = embeddings.shape[1]
-                self.index = faiss.IndexFlatL2(dimension)
+            if streaming:
+                return self._process_document_streaming(pdf, document_id, progress_callback, chunk_sink,
+                                                        file_hash, chunks)
+
+            if chunks is None:
+                # Extract text
+                text = self._extract_text_from_pdf(pdf)
+                if not text.strip():
+                    return False, "No text content found in document"
+
+                # Create chunks
+                chunks = self._chunk_text(text)
+                if self.chunk_embedding_cache:
+                    self.chunk_embedding_cache.put_file_chunks(file_hash, self.chunk_size, chunks)
             
-            # Add to index
-            start_idx = len(self.text_chunks)
-            self.index.add(embeddings)
+            # Generate embeddings, skipping chunks that were embedded before
+            embeddings = self._encode_chunks(chunks)
+            if chunk_sink:
+                chunk_sink(chunks, embeddings)
             
-            # Store chunks and document mapping
-            self.text_chunks.extend(chunks)
-            for i in range(len(chunks)):
-                self.document_map[start_idx + i] = {
-                    'document_id': document_id,
-                    'chunk_index': i,
-                    'total_chunks': len(chunks)
-                }
+            self._add_chunks(document_id, 0, chunks, embeddings, len(chunks))
             
+            self._autosave()
             return True, "Document processed successfully"
             
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
             return False, f"Processing error: {str(e)}"
 
+    def _document_index(self, document_id: str):
+        """Return an exact sub-index over one document's vectors; called with the read lock held.
+        
+        Sub-indexes are cached by the document's chunk ID range. Chunk IDs are
+        never reused, so a re-ingested document gets a new entry. A document
+        larger than the whole cache budget is rebuilt for every search.
+        """
+        ids = self.chunk_store.document_chunk_ids(document_id)
+        if not len(ids):
+            return None
+        key = (document_id, int(ids[0]), int(ids[-1]), len(ids))
+        index = self.scope_cache.get(key)
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlat(self.index.d, self.index.metric_type))
+            index.add_with_ids(self.index_factory.reconstruct(self.index, ids, document_id), ids)
+            self.scope_cache.put(key, index)
+        return index
+
+    def _search_index(self, query_embeddings: np.ndarray, k: int,
+                      scope: Optional[Tuple[str, ...]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Search the whole index, or only the documents in scope; called with the read lock held."""
+        if scope is None:
+            return self.index_factory.search(self.index, query_embeddings, k)
+        sub_indexes = [index for index in map(self._document_index, scope) if index is not None]
+        if not sub_indexes:
+            return (np.zeros((len(query_embeddings), k), dtype=np.float32),
+                    np.full((len(query_embeddings), k), -1, dtype=np.int64))
+        return ShardedIndex(sub_indexes).search(query_embeddings, k)
+
+    def _similarity_threshold(self, index, min_similarity: Optional[float]) -> Optional[float]:
+        """Return the cutoff for an index's scores; only inner-product scores are similarities."""
+        if index is None or index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return None
+        return self.min_similarity if min_similarity is None else min_similarity
+
     # PUBLIC_INTERFACE
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, k: int = 5, document_ids: Optional[Iterable[str]] = None,
+               min_similarity: Optional[float] = None) -> List[Dict[str, Any]]:
         """Search for relevant text chunks based on a query.
         
         Args:
             query (str): Search query
             k (int): Number of results to return
+            document_ids (Iterable[str], optional): Only search these documents
+            min_similarity (float, optional): Drop results less similar than this;
+                defaults to the service's min_similarity
             
         Returns:
             List[Dict[str, Any]]: List of search results with text and metadata
         """
-        try:
-            if not self.index:
-                return []
+        return self.search_batch([query], k, document_ids, min_similarity)[0]
+
+    # PUBLIC_INTERFACE
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed search queries in one model forward pass, reusing recently seen embeddings.
+        
+        The embeddings can be passed to search_batch, so that queries for
+        different document scopes share a single encoding call.
+        
+        Args:
+            queries (List[str]): Search queries
+            
+        Returns:
+            np.ndarray: One embedding per query, in input order
+        """
+        keys = [self._normalize_query(query) for query in queries]
+        embeddings = {}
+        to_encode = []
+        for row, key in enumerate(keys):
+            if key in embeddings:
+                continue
+            cached = self.embedding_cache.get(key)
+            if cached is None:
+                to_encode.append(row)
+                embeddings[key] = None
+            else:
+                embeddings[key] = cached
+        if to_encode:
+            encoded = self.index_factory.normalize(self.model.encode([queries[row] for row in to_encode]))
+            for row, embedding in zip(to_encode, encoded):
+                embeddings[keys[row]] = embedding
+                self.embedding_cache.put(keys[row], embedding)
+        return np.stack([embeddings[key] for key in keys])
 
-            # Generate query embedding
-            query_embedding = self.model.encode([query])
+    # PUBLIC_INTERFACE
+    def search_batch(self, queries: List[str], k: int = 5, document_ids: Optional[Iterable[str]] = None,
+                     min_similarity: Optional[float] = None,
+                     query_embeddings: Optional[np.ndarray] = None) -> List[List[Dict[str, Any]]]:
+        """Search for relevant text chunks for several queries at once.
+        
+        All queries are embedded in one model forward pass and looked up with a
+        single index search, which is much cheaper than searching one by one.
+        
+        A scoped search (document_ids given) does not touch the global index:
+        it searches exact per-document sub-indexes built from the stored
+        vectors, so its cost follows the size of the scoped documents and it
+        returns k results whenever they hold at least k chunks.
+        
+        A result's score is its L2 distance (lower is closer) or, with
+        metric='cosine', its cosine similarity (higher is closer). In cosine
+        mode results below min_similarity are dropped before their text and
+        metadata are looked up.
+        
+        Args:
+            queries (List[str]): Search queries
+            k (int): Number of results to return per query
+            document_ids (Iterable[str], optional): Only search these documents
+            min_similarity (float, optional): Drop results less similar than this;
+                defaults to the service's min_similarity
+            query_embeddings (np.ndarray, optional): Embeddings of the queries from
+                encode_queries; the queries are encoded here if omitted
             
-            # Search index
-            distances, indices = self.index.search(query_embedding, k)
+        Returns:
+            List[List[Dict[str, Any]]]: Search results for each query, in input order
+        """
+        try:
+            if self.index is None or not queries:
+                return [[] for _ in queries]
+
+            scope = None if document_ids is None else tuple(sorted({str(d) for d in document_ids}))
+            threshold = self._similarity_threshold(self.index, min_similarity)
+            keys = [self._normalize_query(query) for query in queries]
+            generation = self.index_generation
+            batch_results = [self.result_cache.get((generation, key, k, scope, threshold)) for key in keys]
+            pending = [row for row, results in enumerate(batch_results) if results is None]
+            if not pending:
+                return batch_results
+
+            # Embed only the queries whose results are not cached
+            if query_embeddings is None:
+                query_embeddings = self.encode_queries([queries[row] for row in pending])
+            else:
+                query_embeddings = np.asarray(query_embeddings)[pending]
             
-            # Format results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.text_chunks):
-                    results.append({
-                        'text': self.text_chunks[idx],
-                        'score': float(distances[0][i]),
-                        'document_info': self.document_map.get(idx, {})
-                    })
+            # Search the index and resolve chunk IDs against the same version of the store
+            with self._index_lock.read_locked():
+                if self.index is None:
+                    return [[] for _ in queries]
+                generation = self.index_generation
+                threshold = self._similarity_threshold(self.index, min_similarity)
+                distances, indices = self._search_index(query_embeddings, k, scope)
+                
+                # Format results
+                for i, row in enumerate(pending):
+                    results = []
+                    for j, idx in enumerate(indices[i]):
+                        score = float(distances[i][j])
+                        if threshold is not None and score < threshold:
+                            break  # Similarities come sorted, so the rest are lower still
+                        idx = int(idx)
+                        text = self.chunk_store.get_text(idx)
+                        if text is not None:
+                            results.append({
+                                'text': text,
+                                'score': score,
+                                'document_info': self.chunk_store.get_info(idx)
+                            })
+                    batch_results[row] = results
+                    self.result_cache.put((generation, keys[row], k, scope, threshold), results)
             
-            return results
+            return batch_results
             
         except Exception as e:
             logger.error(f"Error during search: {str(e)}")
-            return []
+            return [[] for _ in queries]
 
     # PUBLIC_INTERFACE
     def get_document_chunks(self, document_id: str) -> List[str]:
@@ -175,11 +680,9 @@ class RAGService:
             List[str]: List of text chunks for the document
         """
         try:
-            chunks = []
-            for idx, chunk in enumerate(self.text_chunks):
-                if self.document_map.get(idx, {}).get('document_id') == document_id:
-                    chunks.append(chunk)
-            return chunks
+            with self._index_lock.read_locked():
+                return [self.chunk_store.get_text(idx)
+                        for idx in self.chunk_store.document_chunk_ids(document_id).tolist()]
         except Exception as e:
             logger.error(f"Error retrieving document chunks: {str(e)}")
             return []
@@ -195,44 +698,259 @@ class RAGService:
             bool: True if successful, False otherwise
         """
         try:
-            # Find indices to remove
-            indices_to_remove = []
-            for idx, info in self.document_map.items():
-                if info['document_id'] == document_id:
-                    indices_to_remove.append(idx)
+            # Look up and remove the chunks under the update lock so a concurrent
+            # ingest or delete of the same document cannot interleave
+            with self._update_lock:
+                ids_to_remove = self.chunk_store.document_chunk_ids(document_id)
+                
+                if not len(ids_to_remove):
+                    return True
+                
+                self._remove_chunks(ids_to_remove, document_id)
+            self._autosave()
+            return True
             
-            if not indices_to_remove:
-                return True
+        except Exception as e:
+            logger.error(f"Error clearing document: {str(e)}")
+            return False
+
+    # PUBLIC_INTERFACE
+    def save_snapshot(self) -> bool:
+        """Persist the index, chunk texts and document mapping to the snapshot directory.
+        
+        Worker processes sharing the directory each hold their own state. If
+        another process saved since this one last loaded or saved, its snapshot
+        is merged in first: documents this process changed in the meantime
+        keep their local version, all others follow the snapshot. Nothing is
+        written when there is nothing new.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.index_store:
+            return False
+        try:
+            # Changes wait for the save; searches do not, as saving only reads the state
+            with self._update_lock, self.index_store.locked():
+                if not self._overwrite_snapshot:
+                    current = self.index_store.current_name()
+                    if current is not None and current != self._snapshot_name:
+                        self._merge_snapshot()
+                    elif not self._changed_documents:
+                        return True
+                path = self.index_store.save(self.index, self.chunk_store, self._next_chunk_id)
+                self._snapshot_name = os.path.basename(path)
+                self._changed_documents.clear()
+                self._overwrite_snapshot = False
+            return True
+        except Exception as e:
+            logger.error(f"Error saving index snapshot: {str(e)}")
+            return False
+
+    def _merge_snapshot(self) -> None:
+        """Fold the on-disk snapshot into this process's state; called with the update and store locks held."""
+        snapshot = self.index_store.load(mmap=False)
+        theirs, their_index = snapshot['chunks'], snapshot['index']
+        if their_index is not None and (their_index.metric_type != self.index_factory.metric_type or (
+                self.index is not None and their_index.d != self.index.d)):
+            raise ValueError("Snapshot on disk was built with a different embedding dimension or metric")
+        changed = self._changed_documents
+
+        # Work on copies while searches continue on the current state
+        index = clone_index(self.index) if self.index is not None else None
+        chunks = ChunkStore.from_arrays(**self.chunk_store.arrays())
+        next_chunk_id = self._next_chunk_id
+
+        def same_chunks(document_id: str) -> bool:
+            ours, their_ids = chunks.document_chunk_ids(document_id), theirs.document_chunk_ids(document_id)
+            return len(ours) == len(their_ids) and all(
+                chunks.get_text(a) == theirs.get_text(b) for a, b in zip(ours.tolist(), their_ids.tolist()))
+
+        # Unchanged documents follow the snapshot: dropped if it no longer has them, replaced if it differs
+        outdated = [document_id for document_id in chunks.by_document
+                    if document_id not in changed and not same_chunks(document_id)]
+        if outdated:
+            ids = np.concatenate([chunks.document_chunk_ids(document_id) for document_id in outdated])
+            index = self.index_factory.remove_ids(index, ids)
+            chunks.remove(ids)
+        for document_id in theirs.by_document:
+            if document_id in changed or len(chunks.document_chunk_ids(document_id)):
+                continue
+            ids = theirs.document_chunk_ids(document_id)
+            info = theirs.get_info(int(ids[0]))
+            new_ids = np.arange(next_chunk_id, next_chunk_id + len(ids), dtype=np.int64)
+            if index is None:
+                index = self.index_factory.create(their_index.d)
+            vectors = self.index_factory.reconstruct(their_index, ids, document_id)
+            index = self.index_factory.add(index, vectors, new_ids, document_id)
+            chunks.add(document_id, next_chunk_id, info['chunk_index'],
+                       [theirs.get_text(chunk_id) for chunk_id in ids.tolist()], info['total_chunks'])
+            next_chunk_id += len(ids)
+
+        with self._index_lock.write_locked():
+            self.index = index if len(chunks) else None
+            self.chunk_store = chunks
+            self._next_chunk_id = next_chunk_id
+            self._index_mmapped = False
+            self.index_generation += 1
+        logger.info(f"Merged RAG snapshot {snapshot['name']} into local state")
+
+    # PUBLIC_INTERFACE
+    def sync_snapshot(self) -> bool:
+        """Save pending changes, or load the snapshot if another process has written a newer one.
+        
+        Returns:
+            bool: True if the state on disk and in memory now agree, False on error
+        """
+        if not self.index_store:
+            return False
+        try:
+            with self._update_lock:
+                if self._changed_documents or self._overwrite_snapshot:
+                    return self.save_snapshot()
+                current = self.index_store.current_name()
+                if current is None or current == self._snapshot_name:
+                    return True
+                return self.load_snapshot()
+        except Exception as e:
+            logger.error(f"Error syncing index snapshot: {str(e)}")
+            return False
+
+    # PUBLIC_INTERFACE
+    def close(self) -> None:
+        """Stop the autosave thread and save any pending changes."""
+        self._autosave_stop.set()
+        worker = self._autosave_worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join()
+        if self.index_store and self.autosave and (self._changed_documents or self._overwrite_snapshot):
+            self.save_snapshot()
+
+    # PUBLIC_INTERFACE
+    def load_snapshot(self, mmap: bool = True) -> bool:
+        """Replace the in-memory state with the latest snapshot from disk.
+        
+        The index is memory-mapped by default so that worker processes on the
+        same host share one page-cached copy; it is copied into private memory
+        only when this process first modifies it. A snapshot built with another
+        metric than the configured one is not loaded; its scores would not mean
+        what searches expect, so the index has to be rebuilt instead.
+        
+        Args:
+            mmap (bool): Memory-map the snapshot instead of reading it into memory
             
-            # Create new index without the document
-            remaining_indices = [i for i in range(len(self.text_chunks)) 
-                              if i not in indices_to_remove]
+        Returns:
+            bool: True if a snapshot was loaded, False otherwise
+        """
+        if not self.index_store:
+            return False
+        try:
+            with self.index_store.locked():
+                snapshot = self.index_store.load(mmap=mmap)
+            if snapshot is None:
+                return False
+            index = snapshot['index']
+            if index is not None and index.metric_type != self.index_factory.metric_type:
+                raise ValueError("Snapshot index metric differs from the configured metric; "
+                                 "rebuild the index to switch between 'l2' and 'cosine'")
+            self.index_factory.configure_search(index)
+            with self._update_lock, self._index_lock.write_locked():
+                self.index = snapshot['index']
+                self.chunk_store = snapshot['chunks']
+                self._next_chunk_id = snapshot['next_chunk_id']
+                self._index_mmapped = snapshot['mmapped']
+                self._snapshot_name = snapshot['name']
+                self._changed_documents.clear()
+                self._overwrite_snapshot = False
+                self.index_generation += 1
+            return True
+        except Exception as e:
+            logger.error(f"Error loading index snapshot: {str(e)}")
+            return False
+
+    # PUBLIC_INTERFACE
+    def load_from_database(self, session, document_ids: Optional[List[int]] = None) -> bool:
+        """Replace the in-memory state with the chunks stored in the database.
+        
+        Stored embeddings are binary vectors, so the index is rebuilt without
+        re-encoding or parsing any text.
+        
+        Args:
+            session: SQLAlchemy session, e.g. db.session
+            document_ids (List[int], optional): Only load these documents
             
-            if not remaining_indices:
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            stored = load_document_chunks(session, document_ids)
+            # Searches wait for the rebuild instead of seeing a partly loaded index
+            with self._update_lock, self._index_lock.write_locked():
                 self.index = None
-                self.text_chunks = []
-                self.document_map = {}
-                return True
-            
-            # Get remaining embeddings
-            remaining_chunks = [self.text_chunks[i] for i in remaining_indices]
-            embeddings = self.model.encode(remaining_chunks)
-            
-            # Create new index
-            dimension = embeddings.shape[1]
-            new_index = faiss.IndexFlatL2(dimension)
-            new_index.add(embeddings)
-            
-            # Update storage
-            self.index = new_index
-            self.text_chunks = remaining_chunks
-            self.document_map = {
-                new_idx: self.document_map[old_idx]
-                for new_idx, old_idx in enumerate(remaining_indices)
-            }
-            
+                self._index_mmapped = False
+                self.chunk_store = ChunkStore()
+                # The database holds every document, so the next save replaces the snapshot
+                self._overwrite_snapshot = True
+                
+                # Rows arrive grouped by document and in chunk order
+                owners = stored['document_ids']
+                if len(owners):
+                    boundaries = np.flatnonzero(np.diff(owners)) + 1
+                    for start, end in zip([0, *boundaries.tolist()], [*boundaries.tolist(), len(owners)]):
+                        self._add_chunks(str(owners[start]), 0, stored['texts'][start:end],
+                                         stored['embeddings'][start:end], end - start)
+                self.index_generation += 1
+            self._autosave()
             return True
+        except Exception as e:
+            logger.error(f"Error loading chunks from database: {str(e)}")
+            return False
+
+    # PUBLIC_INTERFACE
+    def index_report(self, num_queries: int = 100, k: int = 5,
+                     settings: Optional[List[Dict[str, int]]] = None) -> List[Dict[str, Any]]:
+        """Report recall@k and search latency of the current index against exact search.
+        
+        Queries are sampled from the stored vectors, so the report reflects the
+        live corpus. Use it to pick nprobe/ef_search values for the latency budget.
+        The settings are tried on a copy taken under the read lock, so searches
+        running meanwhile keep their own parameters and are not held up.
+        
+        Args:
+            num_queries (int): Number of stored vectors to use as queries
+            k (int): Number of neighbours to compare
+            settings (List[Dict[str, int]], optional): nprobe/ef_search combinations to try
             
+        Returns:
+            List[Dict[str, Any]]: One row per setting with recall_at_k, p50_ms and p99_ms
+        """
+        try:
+            with self._index_lock.read_locked():
+                if self.index is None or not len(self.chunk_store):
+                    return []
+                ids = self.chunk_store.ids()
+                rng = np.random.default_rng(0)
+                sample = ids[rng.choice(len(ids), size=min(num_queries, len(ids)), replace=False)]
+                owners = [self.chunk_store.get_info(chunk_id)['document_id'] for chunk_id in sample.tolist()]
+                index = clone_index(self.index)
+            queries = np.vstack([self.index_factory.reconstruct(index, sample[row:row + 1], owner)
+                                 for row, owner in enumerate(owners)])
+            return recall_latency_report(index, None, ids, queries, k, settings, self.index_factory)
         except Exception as e:
-            logger.error(f"Error clearing document: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error(f"Error building index report: {str(e)}")
+            return []
+
+    # PUBLIC_INTERFACE
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit, miss and eviction counters for the query caches.
+        
+        Returns:
+            Dict[str, Any]: Counters for the embedding, result and scoped sub-index caches
+            and the current index generation
+        """
+        return {
+            'embeddings': self.embedding_cache.stats(),
+            'results': self.result_cache.stats(),
+            'scopes': self.scope_cache.stats(),
+            'index_generation': self.index_generation
+        }
@@ -0,0 +1,650 @@
+"""Vector Index factory for building, training and tuning the FAISS indexes used by the RAG service."""
+
+import os
+import time
+import zlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import faiss
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq8', 'sq_fp16', 'pq')
+
+# 'cosine' searches unit-normalized vectors by inner product; scores are then cosine similarities
+METRICS = {
+    'l2': faiss.METRIC_L2,
+    'cosine': faiss.METRIC_INNER_PRODUCT,
+}
+
+# Index types storing compressed codes instead of the float32 vectors; these accept a refine stage
+QUANTIZED_TYPES = ('ivf_pq', 'sq8', 'sq_fp16', 'pq')
+
+# Refine stages re-ranking the top k * refine_k_factor candidates with stored exact vectors
+REFINE_TYPES = {
+    'flat': 'RFlat',               # float32 copies: exact distances, 4 bytes per dimension
+    'fp16': 'Refine(SQfp16)',      # float16 copies: near-exact distances, 2 bytes per dimension
+}
+
+DEFAULT_INDEX_PARAMS = {
+    'nlist': 1024,        # IVF: number of inverted lists
+    'nprobe': 16,         # IVF: lists visited per query
+    'pq_m': 48,           # IVF-PQ/PQ: sub-quantizers, must divide the dimension
+    'pq_nbits': 8,        # IVF-PQ/PQ: bits per sub-quantizer code
+    'metric': os.getenv('RAG_INDEX_METRIC', 'l2'),                     # 'l2' or 'cosine'
+    'refine': os.getenv('RAG_INDEX_REFINE') or None,                    # None, 'flat' or 'fp16'
+    'refine_k_factor': float(os.getenv('RAG_INDEX_REFINE_K_FACTOR', '4')),  # Candidates re-ranked per result
+    'hnsw_m': 32,         # HNSW: graph neighbours per node
+    'ef_construction': 40,
+    'ef_search': 64,      # HNSW: candidate list size per query
+    'train_size': None,   # Vectors to collect before training; defaults to 39 per centroid
+    'num_shards': int(os.getenv('RAG_INDEX_SHARDS', '1')),        # Sub-indexes searched in parallel
+    'shard_workers': int(os.getenv('RAG_SHARD_WORKERS', '0')),    # Shard searches run at once; 0 = CPU count
+    'search_threads': int(os.getenv('RAG_SEARCH_THREADS', '0')),  # OpenMP threads per search; 0 = default
+}
+
+_omp_threads = threading.local()
+
+
+def _limit_omp_threads(threads: int) -> None:
+    """Set the OpenMP thread count FAISS uses for searches made from the calling thread.
+
+    The OpenMP setting is per thread, so it is applied lazily in every thread
+    that searches and only when it changes.
+    """
+    if threads > 0 and getattr(_omp_threads, 'value', None) != threads:
+        faiss.omp_set_num_threads(threads)
+        _omp_threads.value = threads
+
+
+class ShardedIndex:
+    """Set of FAISS sub-indexes searched in parallel and merged into one top-k result.
+
+    Each document's chunks live in one shard, chosen by a stable hash of the
+    document ID. A query is searched on every non-empty shard from a thread
+    pool shared by all requests; FAISS releases the GIL while searching, so
+    shards use separate cores. Pool size and per-search OpenMP threads are set
+    by VectorIndexFactory.configure_search, which keeps the total number of
+    busy threads bounded when many requests search at once.
+    """
+
+    def __init__(self, shards: List[Any]):
+        """Initialize the sharded index.
+
+        Args:
+            shards (List[faiss.Index]): Sub-indexes with the same dimension and metric
+        """
+        if not shards:
+            raise ValueError("A sharded index needs at least one shard")
+        self.shards = list(shards)
+        self.executor = None
+        self.search_threads = 1
+
+    @property
+    def d(self) -> int:
+        """int: Embedding dimension."""
+        return self.shards[0].d
+
+    @property
+    def ntotal(self) -> int:
+        """int: Number of vectors across all shards."""
+        return sum(shard.ntotal for shard in self.shards)
+
+    @property
+    def metric_type(self) -> int:
+        """int: FAISS metric shared by the shards."""
+        return self.shards[0].metric_type
+
+    @property
+    def is_trained(self) -> bool:
+        """bool: Whether every shard can accept vectors."""
+        return all(shard.is_trained for shard in self.shards)
+
+    # PUBLIC_INTERFACE
+    def shard_for(self, key: Any) -> int:
+        """Return the shard a document is stored in.
+
+        Args:
+            key (Any): Document ID; the hash is stable across processes
+
+        Returns:
+            int: Shard number
+        """
+        return zlib.crc32(str(key).encode('utf-8')) % len(self.shards)
+
+    # PUBLIC_INTERFACE
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray, shard: Optional[int] = None) -> None:
+        """Add vectors to one shard, or spread them by ID when no shard is given.
+
+        Args:
+            vectors (np.ndarray): float32 matrix with one vector per row
+            ids (np.ndarray): int64 chunk IDs
+            shard (int, optional): Shard to add to, e.g. from shard_for(document_id)
+        """
+        if shard is not None:
+            self.shards[shard].add_with_ids(vectors, ids)
+            return
+        owners = ids % len(self.shards)
+        for number, index in enumerate(self.shards):
+            selected = owners == number
+            if selected.any():
+                index.add_with_ids(np.ascontiguousarray(vectors[selected]), np.ascontiguousarray(ids[selected]))
+
+    def _search_shard(self, shard, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search one shard from a pool thread."""
+        _limit_omp_threads(self.search_threads)
+        return shard.search(queries, k)
+
+    # PUBLIC_INTERFACE
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search all non-empty shards and merge their results.
+
+        Args:
+            queries (np.ndarray): float32 query matrix
+            k (int): Number of neighbours per query
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distances and IDs shaped (len(queries), k),
+            padded with -1 IDs like a FAISS search
+        """
+        shards = [shard for shard in self.shards if shard.ntotal]
+        if not shards:
+            distances = np.full((len(queries), k), np.finfo(np.float32).max, dtype=np.float32)
+            if self.metric_type == faiss.METRIC_INNER_PRODUCT:
+                distances = -distances
+            return distances, np.full((len(queries), k), -1, dtype=np.int64)
+
+        if self.executor is None or len(shards) == 1:
+            results = [self._search_shard(shard, queries, k) for shard in shards]
+        else:
+            results = list(self.executor.map(self._search_shard, shards, [queries] * len(shards),
+                                              [k] * len(shards)))
+
+        distances = np.hstack([result[0] for result in results])
+        ids = np.hstack([result[1] for result in results])
+        # Padding uses the worst possible distance, so it sorts behind real hits
+        order = distances if self.metric_type != faiss.METRIC_INNER_PRODUCT else -distances
+        best = np.argsort(order, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(distances, best, axis=1), np.take_along_axis(ids, best, axis=1)
+
+    # PUBLIC_INTERFACE
+    def reconstruct_batch(self, ids: np.ndarray, shard: Optional[int] = None) -> np.ndarray:
+        """Return the stored vectors for chunk IDs.
+
+        Args:
+            ids (np.ndarray): int64 chunk IDs
+            shard (int, optional): Shard holding all of the IDs, e.g. from shard_for(document_id).
+                Without it every shard's stored IDs are scanned to find the owners.
+
+        Returns:
+            np.ndarray: float32 matrix with one row per ID
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if shard is not None:
+            return self.shards[shard].reconstruct_batch(ids)
+        vectors = np.zeros((len(ids), self.d), dtype=np.float32)
+        found = np.zeros(len(ids), dtype=bool)
+        for index in self.shards:
+            selected = np.isin(ids, stored_ids(index))
+            if selected.any():
+                vectors[selected] = index.reconstruct_batch(ids[selected])
+                found |= selected
+        if not found.all():
+            raise KeyError(f"Unknown chunk IDs: {ids[~found][:10].tolist()}")
+        return vectors
+
+
+class VectorIndexFactory:
+    """Factory for the FAISS indexes backing RAGService.
+
+    Every index it builds is addressed by external chunk IDs. Index types that
+    need training start out as an exact IndexIDMap2/IndexFlat staging index
+    and are promoted to the trained index once ``train_size`` vectors exist.
+
+    Quantized types trade accuracy for memory: 'sq8' keeps one byte and
+    'sq_fp16' two bytes per dimension, 'pq' and 'ivf_pq' keep ``pq_m`` codes
+    per vector. With ``refine`` set they also keep exact ('flat') or float16
+    ('fp16') vectors and re-rank the top ``k * refine_k_factor`` candidates
+    with them, recovering most of the recall lost to quantization.
+
+    With ``metric='cosine'`` every index compares vectors by inner product;
+    callers normalize vectors to unit length (see normalize()) so that the
+    scores are cosine similarities, higher meaning more relevant.
+    """
+
+    def __init__(self, index_type: str = 'flat', params: Optional[Dict[str, Any]] = None):
+        """Initialize the index factory.
+
+        Args:
+            index_type (str): One of 'flat', 'ivf_flat', 'ivf_pq' or 'hnsw'
+            params (Dict[str, Any], optional): Overrides for DEFAULT_INDEX_PARAMS
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+        self.index_type = index_type
+        self.params = dict(DEFAULT_INDEX_PARAMS)
+        self.params.update(params or {})
+        if self.params['metric'] not in METRICS:
+            raise ValueError(f"Unknown metric '{self.params['metric']}', expected one of {tuple(METRICS)}")
+        self.metric_type = METRICS[self.params['metric']]
+        refine = self.params['refine']
+        if refine is not None and refine not in REFINE_TYPES:
+            raise ValueError(f"Unknown refine type '{refine}', expected one of {tuple(REFINE_TYPES)}")
+        if refine is not None and index_type not in QUANTIZED_TYPES:
+            # Exact index types have nothing to re-rank
+            self.params['refine'] = None
+        self.params['num_shards'] = max(1, int(self.params['num_shards']))
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        if self.params['train_size'] is None:
+            if index_type == 'sq8':
+                # Only per-dimension value ranges are learned
+                centroids = 64
+            elif index_type == 'pq':
+                centroids = 1 << self.params['pq_nbits']
+            else:
+                centroids = self.params['nlist']
+                if index_type == 'ivf_pq':
+                    centroids = max(centroids, 1 << self.params['pq_nbits'])
+            self.params['train_size'] = 39 * centroids
+
+    @property
+    def normalizes(self) -> bool:
+        """bool: Whether vectors must be unit-normalized before they are added or searched."""
+        return self.params['metric'] == 'cosine'
+
+    # PUBLIC_INTERFACE
+    def normalize(self, vectors: np.ndarray) -> np.ndarray:
+        """Prepare vectors for this factory's indexes.
+
+        Args:
+            vectors (np.ndarray): Matrix with one vector per row
+
+        Returns:
+            np.ndarray: Contiguous float32 matrix, unit-normalized in cosine mode; the
+            input is never modified
+        """
+        if not self.normalizes:
+            return np.ascontiguousarray(vectors, dtype=np.float32)
+        vectors = np.array(vectors, dtype=np.float32, order='C')
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    @property
+    def needs_training(self) -> bool:
+        """bool: Whether the configured index type must be trained before use."""
+        return self.index_type in ('ivf_flat', 'ivf_pq', 'sq8', 'pq')
+
+    def _factory_string(self) -> str:
+        """Return the faiss.index_factory description for the configured index type."""
+        p = self.params
+        # 'np' skips polysemous training, which only serves Hamming-filtered searches and dominates training time
+        if self.index_type == 'ivf_flat':
+            return f"IVF{p['nlist']},Flat"
+        if self.index_type == 'ivf_pq':
+            codes = f"IVF{p['nlist']},PQ{p['pq_m']}x{p['pq_nbits']}np"
+        elif self.index_type == 'sq8':
+            codes = "SQ8"
+        elif self.index_type == 'sq_fp16':
+            codes = "SQfp16"
+        elif self.index_type == 'pq':
+            codes = f"PQ{p['pq_m']}x{p['pq_nbits']}np"
+        elif self.index_type == 'hnsw':
+            return f"IDMap2,HNSW{p['hnsw_m']}"
+        else:
+            return "IDMap2,Flat"
+        if p['refine'] is not None:
+            # A refine stage cannot take IDs itself, so the whole stack goes behind the ID map
+            return f"IDMap2,{codes},{REFINE_TYPES[p['refine']]}"
+        return codes if self.index_type == 'ivf_pq' else f"IDMap2,{codes}"
+
+    def _build(self, dimension: int):
+        """Build an empty index of the configured type."""
+        index = faiss.index_factory(dimension, self._factory_string(), self.metric_type)
+        if self.index_type == 'hnsw':
+            faiss.downcast_index(index.index).hnsw.efConstruction = self.params['ef_construction']
+        if self.index_type in ('ivf_flat', 'ivf_pq'):
+            # A hashtable direct map keeps reconstruct() working after remove_ids()
+            faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        self.configure_search(index)
+        return index
+
+    def _create_shard(self, dimension: int):
+        """Create one empty index: the trained-index type directly, or a flat staging index."""
+        if self.needs_training:
+            return faiss.IndexIDMap2(faiss.IndexFlat(dimension, self.metric_type))
+        return self._build(dimension)
+
+    # PUBLIC_INTERFACE
+    def create(self, dimension: int):
+        """Create the index a new, empty corpus should start with.
+
+        Args:
+            dimension (int): Embedding dimension
+
+        Returns:
+            faiss.Index: The trained-index type directly, a flat staging index, or a
+            ShardedIndex of those when num_shards > 1
+        """
+        if self.params['num_shards'] == 1:
+            return self._create_shard(dimension)
+        index = ShardedIndex([self._create_shard(dimension) for _ in range(self.params['num_shards'])])
+        self.configure_search(index)
+        return index
+
+    # PUBLIC_INTERFACE
+    def add(self, index, vectors: np.ndarray, ids: np.ndarray, document_id: Optional[str] = None,
+            promote: bool = True):
+        """Add a document's vectors, promoting the index (or its shard) once it can be trained.
+
+        Args:
+            index (faiss.Index): Index created by create()
+            vectors (np.ndarray): float32 matrix with one vector per row
+            ids (np.ndarray): int64 chunk IDs
+            document_id (str, optional): Document the vectors belong to; selects the shard
+            promote (bool): Train the index here once it is due; callers that train
+                separately, e.g. outside a lock, pass False and check should_promote()
+
+        Returns:
+            faiss.Index: The index to use from now on (may be a new object)
+        """
+        if not isinstance(index, ShardedIndex):
+            index.add_with_ids(vectors, ids)
+            return self.promote(index) if promote and self.should_promote(index) else index
+
+        shard = index.shard_for(document_id) if document_id is not None else None
+        index.add_with_ids(vectors, ids, shard)
+        if not promote:
+            return index
+        for number, sub_index in enumerate(index.shards):
+            if self.should_promote(sub_index):
+                index.shards[number] = self.promote(sub_index)
+                self.configure_search(index.shards[number])
+        return index
+
+    # PUBLIC_INTERFACE
+    def reconstruct(self, index, ids: np.ndarray, document_id: Optional[str] = None) -> np.ndarray:
+        """Return a document's stored vectors, reading only the shard that holds them.
+
+        Args:
+            index (faiss.Index): Index created by create()
+            ids (np.ndarray): int64 chunk IDs
+            document_id (str, optional): Document the IDs belong to; selects the shard
+
+        Returns:
+            np.ndarray: float32 matrix with one row per ID
+        """
+        if isinstance(index, ShardedIndex) and document_id is not None:
+            return index.reconstruct_batch(ids, index.shard_for(document_id))
+        return index.reconstruct_batch(ids)
+
+    # PUBLIC_INTERFACE
+    def should_promote(self, index) -> bool:
+        """Check whether a staging index has collected enough vectors to train on.
+
+        Args:
+            index (faiss.Index): Current index
+
+        Returns:
+            bool: True if the index should be replaced via promote()
+        """
+        return (self.needs_training and index is not None and index.is_trained
+                and _is_flat_idmap(index) and index.ntotal >= self.params['train_size'])
+
+    # PUBLIC_INTERFACE
+    def promote(self, index):
+        """Train the configured index on the staged vectors and move them into it.
+
+        Args:
+            index (faiss.Index): Flat IndexIDMap2 staging index
+
+        Returns:
+            faiss.Index: Trained index holding the same vectors under the same IDs
+        """
+        ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        vectors = index.index.reconstruct_n(0, index.ntotal)
+        trained = self._build(index.d)
+        start = time.perf_counter()
+        trained.train(vectors[:self.params['train_size']])
+        trained.add_with_ids(vectors, ids)
+        logger.info(f"Trained {self.index_type} index on {min(len(vectors), self.params['train_size'])} "
+                    f"vectors in {time.perf_counter() - start:.1f}s")
+        return trained
+
+    # PUBLIC_INTERFACE
+    def configure_search(self, index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """Apply the query-time accuracy/speed knobs to an index.
+
+        For a ShardedIndex this also attaches the shared shard search pool and
+        the per-search OpenMP thread count.
+
+        Args:
+            index (faiss.Index): Index to tune
+            nprobe (int, optional): IVF lists to visit. Defaults to the configured value.
+            ef_search (int, optional): HNSW candidate list size. Defaults to the configured value.
+        """
+        if index is None:
+            return
+        if isinstance(index, ShardedIndex):
+            # Shards already run in parallel; one OpenMP thread each avoids oversubscription
+            index.search_threads = self.params['search_threads'] or 1
+            index.executor = self._shard_executor()
+            for shard in index.shards:
+                self.configure_search(shard, nprobe, ef_search)
+            return
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe or self.params['nprobe']
+        except (RuntimeError, AttributeError):
+            pass
+        inner = faiss.downcast_index(index.index) if hasattr(index, 'id_map') else index
+        if isinstance(inner, faiss.IndexRefine):
+            inner.k_factor = self.params['refine_k_factor']
+        if hasattr(inner, 'hnsw'):
+            inner.hnsw.efSearch = ef_search or self.params['ef_search']
+
+    def _shard_executor(self) -> ThreadPoolExecutor:
+        """Return the pool shared by all shard searches of this factory's indexes."""
+        with self._executor_lock:
+            if self._executor is None:
+                workers = self.params['shard_workers'] or os.cpu_count() or 1
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='faiss-shard')
+            return self._executor
+
+    # PUBLIC_INTERFACE
+    def search(self, index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search an index with the configured OpenMP thread count.
+
+        Args:
+            index (faiss.Index): Index to search
+            queries (np.ndarray): float32 query matrix
+            k (int): Number of neighbours per query
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Distances and chunk IDs
+        """
+        if not isinstance(index, ShardedIndex):
+            _limit_omp_threads(self.params['search_threads'])
+        return index.search(queries, k)
+
+    # PUBLIC_INTERFACE
+    def supports_removal(self, index) -> bool:
+        """Check whether remove_ids() deletes from an index in place.
+
+        Args:
+            index (faiss.Index): Index or ShardedIndex
+
+        Returns:
+            bool: True if vectors are deleted in place; False if remove_ids() builds a
+            new index instead, leaving the given one untouched
+        """
+        if isinstance(index, ShardedIndex):
+            return all(self.supports_removal(shard) for shard in index.shards)
+        inner = faiss.downcast_index(index.index) if hasattr(index, 'id_map') else index
+        # HNSW graphs and refine stages cannot delete
+        return not (hasattr(inner, 'hnsw') or isinstance(inner, faiss.IndexRefine))
+
+    # PUBLIC_INTERFACE
+    def remove_ids(self, index, ids: np.ndarray):
+        """Remove vectors by ID, rebuilding indexes that do not support removal.
+
+        Args:
+            index (faiss.Index): Index to remove from
+            ids (np.ndarray): int64 chunk IDs
+
+        Returns:
+            faiss.Index: The index to use from now on (may be a new object)
+        """
+        if isinstance(index, ShardedIndex):
+            index.shards = [self.remove_ids(shard, ids) for shard in index.shards]
+            return index
+        if self.supports_removal(index):
+            index.remove_ids(ids)
+            return index
+
+        # Rebuild from the stored vectors
+        all_ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+        keep = all_ids[~np.isin(all_ids, ids)]
+        if len(keep) == len(all_ids):
+            return index
+        if index.is_trained and self.needs_training:
+            # Keep the trained quantizer instead of training again
+            rebuilt = faiss.clone_index(index)
+            rebuilt.reset()
+        else:
+            rebuilt = self._build(index.d)
+        if len(keep):
+            rebuilt.add_with_ids(index.reconstruct_batch(keep), keep)
+        return rebuilt
+
+
+# PUBLIC_INTERFACE
+def stored_ids(index) -> np.ndarray:
+    """Return the chunk IDs held by an index built by VectorIndexFactory.
+
+    Args:
+        index (faiss.Index): IndexIDMap2-wrapped index or IVF index with a direct map
+
+    Returns:
+        np.ndarray: int64 chunk IDs, in no particular order
+    """
+    if isinstance(index, ShardedIndex):
+        return np.concatenate([stored_ids(shard) for shard in index.shards])
+    if hasattr(index, 'id_map'):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    invlists = faiss.extract_index_ivf(index).invlists
+    lists = [faiss.rev_swig_ptr(invlists.get_ids(number), invlists.list_size(number)).copy()
+             for number in range(invlists.nlist) if invlists.list_size(number)]
+    return np.concatenate(lists).astype(np.int64) if lists else np.empty(0, dtype=np.int64)
+
+
+# PUBLIC_INTERFACE
+def clone_index(index):
+    """Copy an index into private memory, e.g. before modifying a memory-mapped one.
+
+    Args:
+        index (faiss.Index): Index or ShardedIndex to copy
+
+    Returns:
+        faiss.Index: Independent copy using the same search settings
+    """
+    if not isinstance(index, ShardedIndex):
+        # faiss.clone_index keeps memory-mapped codes as views, which cannot be written to
+        return faiss.deserialize_index(faiss.serialize_index(index))
+    copy = ShardedIndex([clone_index(shard) for shard in index.shards])
+    copy.executor = index.executor
+    copy.search_threads = index.search_threads
+    return copy
+
+
+def _is_flat_idmap(index) -> bool:
+    """Return True for the IndexIDMap2/IndexFlat staging layout."""
+    return hasattr(index, 'id_map') and isinstance(faiss.downcast_index(index.index), faiss.IndexFlat)
+
+
+def _exact_neighbours(index, ids: np.ndarray, queries: np.ndarray, k: int,
+                      batch_size: int = 65536) -> np.ndarray:
+    """Find the exact top-k chunk IDs for each query, reconstructing stored vectors block by block.
+
+    Args:
+        index (faiss.Index): Index holding the vectors
+        ids (np.ndarray): Chunk IDs stored in the index; a ShardedIndex reads each shard's own
+        queries (np.ndarray): Query vectors
+        k (int): Number of neighbours to return
+        batch_size (int): Vectors reconstructed at a time
+
+    Returns:
+        np.ndarray: (len(queries), k) chunk IDs
+    """
+    keep_max = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    heap = faiss.ResultHeap(len(queries), k, keep_max=keep_max)
+    # Shards are read one at a time, each from its own stored IDs
+    parts = [(shard, stored_ids(shard)) for shard in index.shards] if isinstance(index, ShardedIndex) \
+        else [(index, ids)]
+    blocks = ((part, part_ids[start:start + batch_size].astype(np.int64))
+              for part, part_ids in parts for start in range(0, len(part_ids), batch_size))
+    for part, block_ids in blocks:
+        block = np.ascontiguousarray(part.reconstruct_batch(block_ids), dtype=np.float32)
+        distances, positions = faiss.knn(queries, block, min(k, len(block_ids)), metric=index.metric_type)
+        found = np.where(positions >= 0, block_ids[np.maximum(positions, 0)], -1)
+        if distances.shape[1] < k:
+            pad = ((0, 0), (0, k - distances.shape[1]))
+            distances = np.pad(distances, pad, constant_values=-np.inf if keep_max else np.inf)
+            found = np.pad(found, pad, constant_values=-1)
+        heap.add_result(distances, found)
+    heap.finalize()
+    return heap.I
+
+
+# PUBLIC_INTERFACE
+def recall_latency_report(index, vectors: Optional[np.ndarray], ids: np.ndarray, queries: np.ndarray,
+                          k: int = 5, settings: Optional[List[Dict[str, int]]] = None,
+                          factory: Optional[VectorIndexFactory] = None) -> List[Dict[str, Any]]:
+    """Measure recall@k and per-query latency of an index against exact search.
+
+    Each setting is applied to ``index`` itself, so pass a private copy
+    (see clone_index) rather than an index that is serving searches.
+
+    Args:
+        index (faiss.Index): Index under test
+        vectors (np.ndarray, optional): Exact vectors stored in the index; if None they are
+            reconstructed from the index a block at a time
+        ids (np.ndarray): Chunk IDs of the stored vectors
+        queries (np.ndarray): Query vectors
+        k (int): Number of neighbours to compare
+        settings (List[Dict[str, int]], optional): nprobe/ef_search combinations to try
+        factory (VectorIndexFactory, optional): Factory used to apply each setting
+
+    Returns:
+        List[Dict[str, Any]]: One row per setting with recall_at_k, p50_ms and p99_ms
+    """
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if vectors is None:
+        truth = _exact_neighbours(index, ids, queries, k)
+    else:
+        exact = faiss.IndexIDMap2(faiss.IndexFlat(vectors.shape[1], index.metric_type))
+        exact.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids.astype(np.int64))
+        _, truth = exact.search(queries, k)
+
+    report = []
+    for setting in settings or [{}]:
+        if factory is not None:
+            factory.configure_search(index, setting.get('nprobe'), setting.get('ef_search'))
+        latencies = []
+        hits = 0
+        for row, query in enumerate(queries):
+            start = time.perf_counter()
+            _, found = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(set(found[0]) & set(truth[row]))
+        report.append(dict(setting, **{
+            'recall_at_k': hits / float(len(queries) * k),
+            'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99)),
+        }))
+
+    if factory is not None:
+        factory.configure_search(index)
+    return report
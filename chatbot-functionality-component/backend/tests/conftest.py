@@ -22,6 +22,34 @@ def test_client(app):
     """Create a test client for the application."""
     return app.test_client()
 
+@pytest.fixture(scope='function')
+def db_app(tmp_path):
+    """Create a minimal application serving the chat blueprint over an empty file-backed SQLite database.
+    
+    Unlike the in-memory database of app, a file is shared by the worker threads
+    that ingestion, write-behind and streaming tests start. Tests seed their own rows.
+    """
+    from flask import Flask
+    from app.routes import chat_bp
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    app.register_blueprint(chat_bp, url_prefix='/api/chat')
+    with app.app_context():
+        db.create_all()
+    return app
+
+@pytest.fixture(scope='function')
+def db_client(db_app):
+    """Create a test client for db_app."""
+    return db_app.test_client()
+
+@pytest.fixture(autouse=True)
+def clear_session_scopes():
+    """Forget cached session-to-document bindings; tests reuse session IDs across databases."""
+    from app.routes import _session_documents
+    _session_documents.clear()
+
 @pytest.fixture(scope='function')
 def init_database(app):
     """Initialize test database before each test function."""
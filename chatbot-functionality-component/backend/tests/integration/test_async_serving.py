@@ -0,0 +1,102 @@
+"""Benchmark of the async (ASGI) serving path against the sync Flask path.
+
+Both paths serve the same burst of concurrent chat requests. Retrieval is
+simulated as a 50 ms round trip behind the query batcher and messages go
+through the write-behind buffer, so request time is dominated by waiting.
+The sync path is given a 32-thread server, as a threaded WSGI worker would
+have; the async path holds every connection in a coroutine.
+"""
+
+import json
+import time
+import asyncio
+import concurrent.futures
+from unittest.mock import patch
+import pytest
+import numpy as np
+from app import create_app, db
+from app.models import User, ChatSession
+from app.asgi import create_asgi_app
+from app.services.query_batcher import QueryBatcher
+from app.services.message_buffer import MessageWriteBuffer
+
+NUM_REQUESTS = 400
+SERVER_THREADS = 32
+SEARCH_LATENCY = 0.05
+
+@pytest.fixture
+def flask_app(monkeypatch, tmp_path):
+    """Create an application over a file-backed SQLite database with one chat session."""
+    monkeypatch.setenv('TEST_DATABASE_URL', f"sqlite:///{tmp_path / 'bench.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        db.session.add(User(id=1, username='benchuser'))
+        db.session.add(ChatSession(id=1, user_id=1))
+        db.session.commit()
+    return app
+
+def encode_queries(queries):
+    """Return placeholder query embeddings."""
+    return np.zeros((len(queries), 1), dtype=np.float32)
+
+def slow_search_batch(queries, k, document_ids=None, query_embeddings=None):
+    """Simulate a remote retrieval round trip."""
+    time.sleep(SEARCH_LATENCY)
+    return [[{'text': 'context', 'score': 0.0}] for _ in queries]
+
+def run_sync(app):
+    """Serve the burst with a fixed pool of server threads; return elapsed seconds."""
+    def request(n):
+        response = app.test_client().post('/api/chat/sessions/1/messages', json={'content': f"question {n}"})
+        assert response.status_code == 200
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SERVER_THREADS) as executor:
+        list(executor.map(request, range(NUM_REQUESTS)))
+    return time.perf_counter() - started
+
+async def run_async(application):
+    """Serve the burst with every request in flight at once; return elapsed seconds."""
+    async def request(n):
+        body = json.dumps({'content': f"question {n}"}).encode()
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat/sessions/1/messages',
+                 'query_string': b'', 'headers': [(b'content-type', b'application/json')]}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        assert sent[0]['status'] == 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(n) for n in range(NUM_REQUESTS)))
+    return time.perf_counter() - started
+
+def test_async_path_serves_more_concurrent_requests(flask_app):
+    """Compare wall time and thread usage of both serving paths for the same burst."""
+    results = {}
+    for mode in ('sync', 'async'):
+        rag_service = type('SlowRAG', (), {'encode_queries': staticmethod(encode_queries),
+                                           'search_batch': staticmethod(slow_search_batch)})()
+        batcher = QueryBatcher(rag_service, max_batch_size=NUM_REQUESTS, max_wait_ms=10)
+        buffer = MessageWriteBuffer(flush_interval_ms=10, max_batch_size=NUM_REQUESTS)
+        with patch('app.routes.query_batcher', batcher), patch('app.routes.message_buffer', buffer):
+            if mode == 'sync':
+                elapsed = run_sync(flask_app)
+                threads = SERVER_THREADS
+            else:
+                application = create_asgi_app(flask_app)
+                elapsed = asyncio.run(run_async(application))
+                threads = len(application.executor._threads)
+                application.executor.shutdown(wait=True)
+                application.wsgi_app.executor.shutdown(wait=True)
+        buffer.close()
+        results[mode] = (elapsed, threads)
+        print(f"\n{mode}: {NUM_REQUESTS} requests in {elapsed:.2f}s "
+              f"({NUM_REQUESTS / elapsed:,.0f} req/s) using {threads} worker threads")
+
+    assert results['async'][0] < results['sync'][0]
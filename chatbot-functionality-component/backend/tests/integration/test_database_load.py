@@ -0,0 +1,73 @@
+"""Load test for chat history queries under concurrent sessions.
+
+Runs the same concurrent workload with and without the secondary indexes
+and reports the latency of each.
+"""
+
+import random
+import statistics
+import time
+import concurrent.futures
+from datetime import datetime, timedelta
+import pytest
+from app import create_app, db
+from app.models import User, ChatSession, ChatMessage
+
+NUM_SESSIONS = 200
+MESSAGES_PER_SESSION = 100
+NUM_WORKERS = 8
+REQUESTS_PER_WORKER = 50
+
+@pytest.fixture
+def loaded_app(monkeypatch, tmp_path):
+    """Create an application on a file-backed SQLite database holding many chat sessions."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'load.db'}")
+    app = create_app()
+    with app.app_context():
+        db.session.add(User(id=1, username='loaduser'))
+        db.session.execute(db.insert(ChatSession), [{'id': i, 'user_id': 1} for i in range(1, NUM_SESSIONS + 1)])
+        start = datetime(2024, 1, 1)
+        # Interleave sessions so each session's messages are spread over the table
+        db.session.execute(db.insert(ChatMessage), [
+            {'session_id': session_id, 'content': f"message {n}", 'type': 'user',
+             'timestamp': start + timedelta(seconds=n * NUM_SESSIONS + session_id)}
+            for n in range(MESSAGES_PER_SESSION) for session_id in range(1, NUM_SESSIONS + 1)
+        ])
+        db.session.commit()
+    return app
+
+def run_workload(app):
+    """Fetch history pages for random sessions from concurrent workers; return latencies in ms."""
+    def worker(seed):
+        client = app.test_client()
+        rng = random.Random(seed)
+        latencies = []
+        for _ in range(REQUESTS_PER_WORKER):
+            session_id = rng.randint(1, NUM_SESSIONS)
+            started = time.perf_counter()
+            response = client.get(f'/api/chat/sessions/{session_id}/messages?limit=20')
+            latencies.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 200
+            assert len(response.get_json()['messages']) == 20
+        return latencies
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
+        results = executor.map(worker, range(NUM_WORKERS))
+    return sorted(latency for latencies in results for latency in latencies)
+
+def summarize(latencies):
+    """Return the median and 95th percentile of a sorted latency list."""
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+def test_indexes_reduce_history_latency(loaded_app):
+    """Test that the secondary indexes lower history latency under concurrent sessions."""
+    indexed = summarize(run_workload(loaded_app))
+
+    with loaded_app.app_context():
+        for index in ChatMessage.__table__.indexes:
+            index.drop(db.engine)
+    unindexed = summarize(run_workload(loaded_app))
+
+    print(f"\nindexed:   p50 {indexed[0]:.2f} ms, p95 {indexed[1]:.2f} ms"
+          f"\nunindexed: p50 {unindexed[0]:.2f} ms, p95 {unindexed[1]:.2f} ms")
+    assert indexed[0] < unindexed[0]
@@ -0,0 +1,49 @@
+"""Latency benchmark for sharded index search.
+
+Compares one exact index against the same corpus split over several shards,
+for single queries and for concurrent requests. Speed-ups depend on the
+number of cores available; on a single core the sharded index is expected
+to be about as fast as the single one.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.services.vector_index import VectorIndexFactory
+
+NUM_VECTORS = 200000
+DIMENSION = 384
+NUM_QUERIES = 64
+K = 5
+
+def build(num_shards, data, ids):
+    """Build a flat index over the corpus with the given number of shards."""
+    factory = VectorIndexFactory('flat', {'num_shards': num_shards, 'search_threads': 1})
+    return factory, factory.add(factory.create(DIMENSION), data, ids)
+
+def test_sharded_search_latency():
+    """Measure per-query and concurrent search time for 1 and cpu_count shards."""
+    rng = np.random.default_rng(0)
+    data = rng.random((NUM_VECTORS, DIMENSION), dtype=np.float32)
+    ids = np.arange(NUM_VECTORS, dtype=np.int64)
+    queries = rng.random((NUM_QUERIES, DIMENSION), dtype=np.float32)
+    shards = max(2, os.cpu_count() or 1)
+
+    results = {}
+    for num_shards in (1, shards):
+        factory, index = build(num_shards, data, ids)
+        start = time.perf_counter()
+        found = [factory.search(index, query.reshape(1, -1), K)[1][0] for query in queries]
+        single = (time.perf_counter() - start) / NUM_QUERIES
+
+        with ThreadPoolExecutor(max_workers=8) as requests:
+            start = time.perf_counter()
+            list(requests.map(lambda query: factory.search(index, query.reshape(1, -1), K), queries))
+            concurrent = time.perf_counter() - start
+
+        results[num_shards] = np.array(found)
+        print(f"\n{num_shards} shard(s): {single * 1000:.1f} ms/query, "
+              f"{NUM_QUERIES} concurrent queries in {concurrent:.2f}s")
+
+    np.testing.assert_array_equal(results[1], results[shards])
@@ -0,0 +1,44 @@
+"""Unit tests for application and database engine configuration."""
+
+from app import create_app, db, _engine_options
+
+class TestEngineOptions:
+    """Test cases for the engine configuration built from the environment."""
+
+    def test_postgres_pool_and_timeout(self, monkeypatch):
+        """Test that server databases get pool sizing, pre-ping and a statement timeout."""
+        monkeypatch.setenv('DB_POOL_SIZE', '5')
+        monkeypatch.setenv('DB_MAX_OVERFLOW', '2')
+        monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '1500')
+        options = _engine_options('postgresql://user:secret@db/chatbot')
+
+        assert options['pool_size'] == 5
+        assert options['max_overflow'] == 2
+        assert options['pool_pre_ping'] is True
+        assert options['pool_recycle'] == 1800
+        assert options['connect_args'] == {'options': '-c statement_timeout=1500'}
+
+    def test_statement_timeout_can_be_disabled(self, monkeypatch):
+        """Test that a zero timeout leaves the connection options untouched."""
+        monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '0')
+        assert 'connect_args' not in _engine_options('postgresql://db/chatbot')
+
+    def test_sqlite_has_no_pool_sizing(self):
+        """Test that SQLite only gets a busy timeout."""
+        options = _engine_options('sqlite:///:memory:')
+        assert 'pool_size' not in options
+        assert options['connect_args']['timeout'] == 30.0
+
+    def test_sqlite_file_uses_wal(self, monkeypatch, tmp_path):
+        """Test that file-backed SQLite databases are switched to WAL mode."""
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'chatbot.db'}")
+        app = create_app()
+        with app.app_context():
+            mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        assert mode == 'wal'
+
+    def test_testing_config(self):
+        """Test that the testing configuration uses an in-memory database."""
+        app = create_app('testing')
+        assert app.config['TESTING']
+        assert app.config['SQLALCHEMY_DATABASE_URI'] == 'sqlite:///:memory:'
@@ -0,0 +1,115 @@
+"""Unit tests for the ASGI serving path."""
+
+import json
+import asyncio
+import pytest
+from unittest.mock import patch
+from app import create_app, db
+from app.models import User, ChatSession, ChatMessage
+from app.asgi import create_asgi_app
+from app.services.message_buffer import MessageWriteBuffer
+
+CONTEXT = [{'text': 'Paris is the capital.', 'score': 0.1, 'document_info': {'document_id': '1'}}]
+
+@pytest.fixture
+def asgi_app(monkeypatch, tmp_path):
+    """Create the ASGI application over a file-backed SQLite database with one session."""
+    monkeypatch.setenv('TEST_DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    flask_app = create_app('testing')
+    with flask_app.app_context():
+        db.session.add(User(id=1, username='testuser'))
+        db.session.add(ChatSession(id=1, user_id=1))
+        db.session.commit()
+    application = create_asgi_app(flask_app)
+    yield application
+    application.executor.shutdown(wait=True)
+    application.wsgi_app.executor.shutdown(wait=True)
+
+async def call(application, method, path, payload=None, query=b''):
+    """Issue one HTTP request against an ASGI application; return (status, headers, body chunks)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(b'content-type', b'application/json')], 'http_version': '1.1',
+             'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234)}
+    requests = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    messages = []
+
+    async def receive():
+        return requests.pop(0) if requests else {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    start = messages[0]
+    chunks = [message['body'] for message in messages[1:] if message['body']]
+    return start['status'], dict(start['headers']), chunks
+
+class TestAsyncChatApp:
+    """Test cases for AsyncChatApp."""
+
+    def test_send_message(self, asgi_app):
+        """Test that the async send route stores both messages and answers from the context."""
+        with patch('app.routes.rag_service.search', return_value=CONTEXT):
+            status, _, chunks = asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages',
+                                                 {'content': 'Capital of France?'}))
+
+        assert status == 200
+        data = json.loads(b''.join(chunks))
+        assert data['assistant_message']['content'] == "Based on the available information: Paris is the capital."
+        with asgi_app.flask_app.app_context():
+            assert [m.type for m in ChatMessage.query.order_by(ChatMessage.id)] == ['user', 'assistant']
+
+    def test_send_message_failure_stores_nothing(self, asgi_app):
+        """Test that a failed retrieval leaves no user message behind, as in the synchronous route."""
+        with patch('app.routes.rag_service.search', side_effect=RuntimeError("index unavailable")):
+            status, _, _ = asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages',
+                                            {'content': 'Capital of France?'}))
+
+        assert status == 500
+        with asgi_app.flask_app.app_context():
+            assert ChatMessage.query.count() == 0
+
+    def test_send_message_requires_content(self, asgi_app):
+        """Test that an empty message is rejected."""
+        status, _, _ = asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages', {}))
+        assert status == 400
+
+    def test_stream_message_sends_events_incrementally(self, asgi_app):
+        """Test that the async stream route emits each event as its own chunk."""
+        with patch('app.routes.rag_service.search', return_value=CONTEXT):
+            status, headers, chunks = asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages/stream',
+                                                       {'content': 'Capital of France?'}))
+
+        assert status == 200
+        assert headers[b'content-type'].startswith(b'text/event-stream')
+        events = [chunk.decode().split('\n', 1)[0] for chunk in chunks]
+        assert events == ['event: user_message', 'event: context', 'event: answer', 'event: done']
+
+    def test_buffered_writes_are_awaited(self, asgi_app):
+        """Test that the async path awaits the write-behind buffer for message IDs."""
+        buffer = MessageWriteBuffer(flush_interval_ms=5)
+        with patch('app.routes.message_buffer', buffer), \
+             patch('app.routes.rag_service.search', return_value=CONTEXT):
+            status, _, chunks = asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages',
+                                                 {'content': 'Hello'}))
+        buffer.close()
+
+        data = json.loads(b''.join(chunks))
+        assert status == 200
+        assert data['user_message']['id'] < data['assistant_message']['id']
+
+    def test_other_routes_use_flask(self, asgi_app):
+        """Test that routes without an async handler are served by the Flask app."""
+        asyncio.run(call(asgi_app, 'POST', '/api/chat/sessions/1/messages', {'content': 'Hi'}))
+        status, headers, chunks = asyncio.run(call(asgi_app, 'GET', '/api/chat/sessions/1/messages',
+                                                   query=b'limit=1'))
+
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        data = json.loads(b''.join(chunks))
+        assert len(data['messages']) == 1
+        assert data['next_cursor'] is not None
+
+        status, _, _ = asyncio.run(call(asgi_app, 'GET', '/no-such-route'))
+        assert status == 404
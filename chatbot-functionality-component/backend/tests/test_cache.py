@@ -0,0 +1,63 @@
+"""Unit tests for cache utilities."""
+
+import time
+from app.services.cache import LRUCache
+
+class TestLRUCache:
+    """Test cases for LRUCache."""
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted as hits or misses."""
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = LRUCache(max_size=2, ttl=0.01)
+        cache.put('a', 1)
+        time.sleep(0.02)
+
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+        assert len(cache) == 0
+
+    def test_zero_size_disables_cache(self):
+        """Test that a cache with max_size 0 stores nothing."""
+        cache = LRUCache(max_size=0)
+        cache.put('a', 1)
+        assert cache.get('a') is None
+
+    def test_sizeof_bounds_total_size(self):
+        """Test that with sizeof the cache evicts by summed entry size."""
+        cache = LRUCache(max_size=10, sizeof=len)
+        cache.put('a', 'x' * 4)
+        cache.put('b', 'x' * 4)
+        cache.put('a', 'x' * 2)
+        assert cache.stats()['weight'] == 6
+        cache.put('c', 'x' * 5)
+        assert cache.get('b') is None
+        assert cache.get('a') == 'xx'
+        assert cache.stats()['weight'] == 7
+        cache.put('d', 'x' * 11)
+        assert len(cache) == 0
+        assert cache.stats()['weight'] == 0
@@ -0,0 +1,128 @@
+"""Unit tests for chunk persistence."""
+
+import pytest
+import numpy as np
+import csv
+import io
+from unittest.mock import Mock, patch
+from app import db
+from app.models import PDFDocument, DocumentChunk
+from app.services.chunk_persistence import (
+    pack_embeddings, unpack_embeddings, save_document_chunks, load_document_chunks
+)
+from app.services.rag_service import RAGService
+
+@pytest.fixture
+def app(db_app):
+    """Run each test inside the context of an application with an empty database."""
+    with db_app.app_context():
+        yield db_app
+
+def create_document(filename='test.pdf'):
+    """Insert a PDFDocument row and return its ID."""
+    document = PDFDocument(filename=filename, status='completed')
+    db.session.add(document)
+    db.session.commit()
+    return document.id
+
+class TestChunkPersistence:
+    """Test cases for the chunk persistence helpers."""
+
+    @pytest.mark.parametrize('dtype, tolerance', [('float32', 0), ('float16', 1e-3)])
+    def test_pack_roundtrip(self, dtype, tolerance):
+        """Test that embeddings survive packing and unpacking."""
+        embeddings = np.random.default_rng(0).random((5, 384), dtype=np.float32)
+        blobs = pack_embeddings(embeddings, dtype)
+
+        assert len(blobs) == 5
+        assert len(blobs[0]) == 384 * np.dtype(dtype).itemsize
+        restored = unpack_embeddings(blobs, dtype)
+        assert restored.dtype == np.float32
+        np.testing.assert_allclose(restored, embeddings, atol=tolerance)
+
+    def test_int8_roundtrip(self):
+        """Test that int8 storage keeps a per-vector scale and one byte per dimension."""
+        embeddings = np.random.default_rng(0).standard_normal((5, 384)).astype(np.float32)
+        embeddings[0] *= 100
+        blobs = pack_embeddings(embeddings, 'int8')
+
+        assert len(blobs[0]) == 4 + 384
+        restored = unpack_embeddings(blobs, 'int8')
+        assert restored.dtype == np.float32
+        scales = np.abs(embeddings).max(axis=1, keepdims=True) / 127
+        assert np.all(np.abs(restored - embeddings) <= scales / 2 + 1e-6)
+        np.testing.assert_array_equal(unpack_embeddings(pack_embeddings(np.zeros((1, 4)), 'int8'), 'int8'),
+                                      np.zeros((1, 4)))
+
+    def test_unsupported_dtype(self):
+        """Test that unknown storage precisions are rejected."""
+        with pytest.raises(ValueError):
+            pack_embeddings(np.zeros((1, 2)), 'float64')
+
+    def test_save_and_load(self, app):
+        """Test that chunks are stored in bulk and loaded back in document order."""
+        first, second = create_document(), create_document()
+        save_document_chunks(db.session, second, ["c"], np.array([[0.0, 1.0]]))
+        save_document_chunks(db.session, first, ["a", "b"], np.array([[1.0, 0.0], [0.5, 0.5]]), 'float16')
+        db.session.commit()
+
+        assert isinstance(db.session.get(DocumentChunk, 1).embedding, bytes)
+        stored = load_document_chunks(db.session)
+        assert stored['texts'] == ["a", "b", "c"]
+        assert stored['document_ids'].tolist() == [first, first, second]
+        np.testing.assert_allclose(stored['embeddings'], [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+
+        only_second = load_document_chunks(db.session, [second])
+        assert only_second['texts'] == ["c"]
+
+    def test_save_uses_executemany_batches(self, app):
+        """Test that large documents are inserted in batches within one transaction."""
+        document_id = create_document()
+        with patch.object(db.session, 'execute', wraps=db.session.execute) as execute:
+            save_document_chunks(db.session, document_id, ["a", "b", "c"], np.eye(3), batch_size=2)
+        assert execute.call_count == 2
+        db.session.rollback()
+        assert DocumentChunk.query.count() == 0
+
+    def test_save_uses_copy_on_postgres(self):
+        """Test that PostgreSQL connections receive the rows through COPY."""
+        copied = {}
+        cursor = Mock()
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.update(sql=sql, data=buffer.read())
+        connection = Mock()
+        connection.dialect.name = 'postgresql'
+        connection.dialect.driver = 'psycopg2'
+        connection.connection.cursor.return_value = cursor
+        session = Mock()
+        session.connection.return_value = connection
+
+        assert save_document_chunks(session, 7, ['say "hi", then\nleave'], np.array([[1.0, 2.0]])) == 1
+
+        session.execute.assert_not_called()
+        assert copied['sql'].startswith("COPY document_chunks")
+        row = next(csv.reader(io.StringIO(copied['data'])))
+        assert row[0] == '7'
+        assert row[1] == 'say "hi", then\nleave'
+        assert bytes.fromhex(row[2][2:]) == np.array([1.0, 2.0], dtype=np.float32).tobytes()
+
+    def test_rag_service_rebuilds_from_database(self, app):
+        """Test that the index is rebuilt from stored vectors without encoding anything."""
+        first, second = create_document(), create_document()
+        save_document_chunks(db.session, first, ["alpha", "beta"], np.array([[1.0, 0.0], [0.8, 0.2]]))
+        save_document_chunks(db.session, second, ["gamma"], np.array([[0.0, 1.0]]))
+        db.session.commit()
+
+        with patch('app.services.rag_service.SentenceTransformer') as mock_transformer, \
+             patch('boto3.client'):
+            mock_transformer.return_value.encode.return_value = np.array([[0.0, 1.0]])
+            service = RAGService(model_name='test-model', index_path=None)
+            assert service.load_from_database(db.session)
+            assert mock_transformer.return_value.encode.call_count == 0
+
+            assert service.index.ntotal == 3
+            assert service.get_document_chunks(str(first)) == ["alpha", "beta"]
+            assert service.document_map[service.document_chunks[str(first)][1]] == {
+                'document_id': str(first), 'chunk_index': 1, 'total_chunks': 2
+            }
+            results = service.search("query", k=1)
+            assert results[0]['text'] == "gamma"
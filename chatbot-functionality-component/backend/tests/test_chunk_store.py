@@ -0,0 +1,90 @@
+"""Unit tests for Chunk Store."""
+
+import gc
+import pytest
+from app.services.chunk_store import ChunkStore
+
+@pytest.fixture
+def chunk_store():
+    """Create a chunk store holding two documents."""
+    store = ChunkStore(capacity=2)
+    store.add('doc1', 0, 0, ["alpha", "beta"], 3)
+    store.add('doc2', 2, 0, ["gamma ü"], 1)
+    store.add('doc1', 3, 2, ["delta"], 3)
+    return store
+
+class TestChunkStore:
+    """Test cases for ChunkStore."""
+
+    def test_lookups(self, chunk_store):
+        """Test that texts and document information are returned by chunk ID."""
+        assert len(chunk_store) == 4
+        assert chunk_store.get_text(2) == "gamma ü"
+        assert chunk_store.get_info(3) == {'document_id': 'doc1', 'chunk_index': 2, 'total_chunks': 3}
+        assert chunk_store.get_text(99) is None
+        assert 1 in chunk_store.texts and 99 not in chunk_store.texts
+        assert chunk_store.document_chunk_ids('doc1').tolist() == [0, 1, 3]
+        assert dict(chunk_store.by_document) == {'doc1': [0, 1, 3], 'doc2': [2]}
+
+    def test_ids_must_increase(self, chunk_store):
+        """Test that chunk IDs cannot be added out of order."""
+        with pytest.raises(ValueError):
+            chunk_store.add('doc3', 1, 0, ["late"], 1)
+
+    def test_remove_and_compact(self, chunk_store):
+        """Test that removed chunks disappear and compaction keeps the survivors intact."""
+        removed = chunk_store.remove([0, 1, 3, 42])
+        assert removed.tolist() == [0, 1, 3]
+        assert chunk_store.get_text(0) is None
+        assert chunk_store.document_chunk_ids('doc1').size == 0
+        assert 'doc1' not in chunk_store.by_document
+
+        # More dead rows than live ones triggers compaction
+        assert chunk_store.ids().tolist() == [2]
+        assert chunk_store.documents == ['doc2']
+        assert chunk_store.get_text(2) == "gamma ü"
+        assert chunk_store.get_info(2)['document_id'] == 'doc2'
+
+        chunk_store.add('doc1', 4, 0, ["epsilon"], 1)
+        assert chunk_store.texts == {2: "gamma ü", 4: "epsilon"}
+
+    def test_arrays_leave_the_store_untouched(self, chunk_store):
+        """Test that arrays() returns compacted copies without compacting the store itself."""
+        chunk_store.remove([1])
+        rows, text = chunk_store._rows, chunk_store._text
+
+        arrays = chunk_store.arrays()
+        assert arrays['rows']['chunk_id'].tolist() == [0, 2, 3]
+        assert bytes(arrays['text']) == "alphagamma üdelta".encode('utf-8')
+        assert chunk_store._rows is rows and chunk_store._text is text
+        assert chunk_store.get_text(3) == "delta"
+
+        arrays['rows']['total_chunks'] = 9
+        assert chunk_store.get_info(0)['total_chunks'] == 3
+
+    def test_read_only_arrays_are_copied_on_write(self, chunk_store):
+        """Test that a store over read-only arrays copies them before modifying them."""
+        arrays = chunk_store.arrays()
+        rows = arrays['rows'].copy()
+        rows.flags.writeable = False
+        restored = ChunkStore.from_arrays(rows, bytes(arrays['text']), arrays['documents'])
+
+        assert restored.infos == chunk_store.infos
+        restored.set_total_chunks([2], 5)
+        restored.remove([0])
+        assert restored.get_info(2)['total_chunks'] == 5
+        assert rows['total_chunks'][2] == 1
+        assert rows['document'][0] != -1
+
+    def test_no_python_objects_per_chunk(self):
+        """Test that stored chunks are not tracked individually by the garbage collector."""
+        store = ChunkStore()
+        texts = [f"chunk number {i}" for i in range(20000)]
+        gc.collect()
+        before = len(gc.get_objects())
+        for start in range(0, len(texts), 1000):
+            store.add(f"doc{start}", start, 0, texts[start:start + 1000], 1000)
+        del texts
+        gc.collect()
+        assert len(gc.get_objects()) - before < 1000
+        assert store.get_text(12345) == "chunk number 12345"
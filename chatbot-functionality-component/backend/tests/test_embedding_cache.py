@@ -0,0 +1,56 @@
+"""Unit tests for the embedding cache."""
+
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from app.services.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def embedding_cache(tmp_path):
+    """Create an EmbeddingCache backed by a temporary database."""
+    return EmbeddingCache(str(tmp_path / "cache" / "embeddings.db"), 'test-model')
+
+def fake_encoder():
+    """Create an encoder that embeds each text as [len(text), 1]."""
+    return Mock(side_effect=lambda texts: np.array([[len(t), 1.0] for t in texts]))
+
+class TestEmbeddingCache:
+    """Test cases for EmbeddingCache."""
+
+    def test_encode_only_unseen_chunks(self, embedding_cache):
+        """Test that previously embedded chunks are served from the cache."""
+        encoder = fake_encoder()
+        first = embedding_cache.encode(["a", "bb"], encoder)
+        second = embedding_cache.encode(["bb", "ccc", "a"], encoder)
+
+        assert encoder.call_args_list[1][0][0] == ["ccc"]
+        assert second.dtype == np.float32
+        np.testing.assert_array_equal(second, [[2, 1], [3, 1], [1, 1]])
+        np.testing.assert_array_equal(first, [[1, 1], [2, 1]])
+
+    def test_duplicate_chunks_encoded_once(self, embedding_cache):
+        """Test that repeated chunks within one call are encoded once."""
+        encoder = fake_encoder()
+        embeddings = embedding_cache.encode(["same", "same"], encoder)
+
+        encoder.assert_called_once_with(["same"])
+        assert embeddings.shape == (2, 2)
+
+    def test_cache_is_keyed_by_model(self, tmp_path):
+        """Test that embeddings from a different model are not reused."""
+        path = str(tmp_path / "embeddings.db")
+        EmbeddingCache(path, 'model-a').encode(["text"], fake_encoder())
+        encoder = fake_encoder()
+        EmbeddingCache(path, 'model-b').encode(["text"], encoder)
+        encoder.assert_called_once()
+
+    def test_file_chunks(self, embedding_cache, tmp_path):
+        """Test storing and retrieving chunks by file hash and chunk size."""
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_bytes(b'%PDF-1.4\ncontent\n%EOF\n')
+        file_hash = EmbeddingCache.file_hash(str(pdf))
+
+        assert embedding_cache.get_file_chunks(file_hash, 500) is None
+        embedding_cache.put_file_chunks(file_hash, 500, ["one", "two"])
+        assert embedding_cache.get_file_chunks(file_hash, 500) == ["one", "two"]
+        assert embedding_cache.get_file_chunks(file_hash, 100) is None
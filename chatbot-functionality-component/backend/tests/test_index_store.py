@@ -0,0 +1,90 @@
+"""Unit tests for Index Store."""
+
+import os
+import pytest
+import numpy as np
+import faiss
+from app.services.index_store import IndexStore
+from app.services.chunk_store import ChunkStore
+from app.services.vector_index import ShardedIndex, clone_index
+
+@pytest.fixture
+def index_store(tmp_path):
+    """Create an IndexStore backed by a temporary directory."""
+    return IndexStore(str(tmp_path / "index"))
+
+@pytest.fixture
+def sample_state():
+    """Create a small index with matching chunk metadata."""
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(2))
+    index.add_with_ids(np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32),
+                       np.array([3, 7], dtype=np.int64))
+    chunks = ChunkStore()
+    chunks.add('doc1', 3, 0, ["First chunk"], 1)
+    chunks.add('doc2', 7, 0, ["Zweiter Abschnitt ü"], 1)
+    return index, chunks
+
+class TestIndexStore:
+    """Test cases for IndexStore."""
+
+    def test_load_without_snapshot(self, index_store):
+        """Test loading when nothing has been saved yet."""
+        assert not index_store.exists()
+        assert index_store.load() is None
+
+    def test_save_and_load_roundtrip(self, index_store, sample_state):
+        """Test that a saved snapshot loads back with identical contents."""
+        index, chunks = sample_state
+        index_store.save(index, chunks, next_chunk_id=8)
+
+        snapshot = index_store.load()
+        assert snapshot['chunks'].texts == {3: "First chunk", 7: "Zweiter Abschnitt ü"}
+        assert snapshot['chunks'].infos == {
+            3: {'document_id': 'doc1', 'chunk_index': 0, 'total_chunks': 1},
+            7: {'document_id': 'doc2', 'chunk_index': 0, 'total_chunks': 1}
+        }
+        assert snapshot['next_chunk_id'] == 8
+        assert snapshot['index'].ntotal == 2
+        _, ids = snapshot['index'].search(np.array([[0.0, 1.0]], dtype=np.float32), 1)
+        assert ids[0][0] == 7
+
+    def test_save_replaces_previous_snapshot(self, index_store, sample_state):
+        """Test that only the latest snapshot is kept on disk."""
+        index, chunks = sample_state
+        first = index_store.save(index, chunks, next_chunk_id=8)
+        second = index_store.save(None, ChunkStore(), next_chunk_id=8)
+
+        assert not os.path.exists(first)
+        assert os.path.exists(second)
+        snapshot = index_store.load()
+        assert snapshot['index'] is None
+        assert len(snapshot['chunks']) == 0
+
+    def test_sharded_index_roundtrip(self, index_store, sample_state):
+        """Test that a sharded index is saved one file per shard and loads back sharded."""
+        _, chunks = sample_state
+        index = ShardedIndex([faiss.IndexIDMap2(faiss.IndexFlatL2(2)) for _ in range(2)])
+        index.add_with_ids(np.array([[1.0, 0.0]], dtype=np.float32), np.array([3], dtype=np.int64), shard=0)
+        index.add_with_ids(np.array([[0.0, 1.0]], dtype=np.float32), np.array([7], dtype=np.int64), shard=1)
+        path = index_store.save(index, chunks, next_chunk_id=8)
+
+        assert sorted(name for name in os.listdir(path) if name.endswith('.faiss')) == ['index-0.faiss', 'index-1.faiss']
+        snapshot = index_store.load()
+        assert isinstance(snapshot['index'], ShardedIndex)
+        assert [shard.ntotal for shard in snapshot['index'].shards] == [1, 1]
+        _, ids = snapshot['index'].search(np.array([[0.0, 1.0]], dtype=np.float32), 1)
+        assert ids[0][0] == 7
+
+    def test_mmap_load_maps_flat_codes(self, index_store, sample_state):
+        """Test that a memory-mapped flat index views the file and clones into writable memory."""
+        index, chunks = sample_state
+        index_store.save(index, chunks, next_chunk_id=8)
+
+        mapped = index_store.load()['index']
+        assert not faiss.downcast_index(mapped.index).codes.is_owned
+        assert faiss.downcast_index(index_store.load(mmap=False)['index'].index).codes.is_owned
+
+        copy = clone_index(mapped)
+        assert faiss.downcast_index(copy.index).codes.is_owned
+        copy.add_with_ids(np.array([[1.0, 1.0]], dtype=np.float32), np.array([9], dtype=np.int64))
+        assert copy.ntotal == 3 and mapped.ntotal == 2
@@ -0,0 +1,148 @@
+"""Unit tests for the background ingestion queue."""
+
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from app import db
+from app.models import PDFDocument, DocumentChunk
+from app.services.ingestion_queue import IngestionQueue
+
+@pytest.fixture
+def rag_service():
+    """Create a mock RAG service that reports streaming progress."""
+    service = Mock()
+    service.pdf_service.s3_bucket = None
+    service.pdf_service.extract_metadata.return_value = {'num_pages': 3}
+
+    def process_document(pdf, document_id, streaming, progress_callback, chunk_sink=None):
+        if chunk_sink:
+            chunk_sink(["first", "second"], np.array([[1.0, 0.0], [0.0, 1.0]]))
+        progress_callback({'pages': 3, 'chunks': 7})
+        return True, "Document processed successfully"
+
+    service.process_document.side_effect = process_document
+    return service
+
+def create_document(app):
+    """Insert a pending PDFDocument row and return its ID."""
+    with app.app_context():
+        document = PDFDocument(filename='test.pdf', file_path='/tmp/test.pdf')
+        db.session.add(document)
+        db.session.commit()
+        return document.id
+
+class TestIngestionQueue:
+    """Test cases for IngestionQueue."""
+
+    def test_successful_job(self, db_app, rag_service):
+        """Test that a job moves the document to completed and records progress."""
+        queue = IngestionQueue(rag_service, max_workers=1)
+        document_id = create_document(db_app)
+
+        queue.submit(db_app, document_id, '/tmp/test.pdf').result(timeout=10)
+
+        with db_app.app_context():
+            document = db.session.get(PDFDocument, document_id)
+            assert document.status == 'completed'
+            assert document.doc_metadata == {'num_pages': 3}
+        progress = queue.get_progress(document_id)
+        assert progress['status'] == 'completed'
+        assert progress['chunks'] == 7
+        assert progress['total_pages'] == 3
+        args, kwargs = rag_service.process_document.call_args
+        assert args[1] == str(document_id)
+        assert kwargs['streaming']
+
+    def test_chunks_persisted(self, db_app, rag_service):
+        """Test that chunks handed to the sink are stored with the completed document."""
+        queue = IngestionQueue(rag_service, max_workers=1, persist_chunks=True)
+        document_id = create_document(db_app)
+
+        queue.submit(db_app, document_id, '/tmp/test.pdf').result(timeout=10)
+
+        with db_app.app_context():
+            chunks = DocumentChunk.query.filter_by(document_id=document_id).order_by(DocumentChunk.id).all()
+            assert [chunk.content for chunk in chunks] == ["first", "second"]
+            assert np.frombuffer(chunks[1].embedding, dtype=np.float32).tolist() == [0.0, 1.0]
+
+    def test_failed_job_persists_no_chunks(self, db_app, rag_service):
+        """Test that chunks written before a failure are rolled back with the job."""
+        def process_document(pdf, document_id, streaming, progress_callback, chunk_sink=None):
+            chunk_sink(["first"], np.array([[1.0, 0.0]]))
+            raise RuntimeError("encoder crashed")
+
+        rag_service.process_document.side_effect = process_document
+        queue = IngestionQueue(rag_service, max_workers=1, persist_chunks=True)
+        document_id = create_document(db_app)
+
+        queue.submit(db_app, document_id, '/tmp/test.pdf').result(timeout=10)
+
+        with db_app.app_context():
+            assert db.session.get(PDFDocument, document_id).status == 'error'
+            assert DocumentChunk.query.filter_by(document_id=document_id).count() == 0
+
+    def test_failed_commit_clears_index(self, db_app, rag_service):
+        """Test that a document indexed before its completion commit fails is removed from the index."""
+        queue = IngestionQueue(rag_service, max_workers=1, persist_chunks=True)
+        set_status = queue._set_status
+
+        def failing_set_status(document_id, status, **columns):
+            if status == 'completed':
+                raise RuntimeError("database unavailable")
+            set_status(document_id, status, **columns)
+
+        queue._set_status = failing_set_status
+        document_id = create_document(db_app)
+
+        queue.submit(db_app, document_id, '/tmp/test.pdf').result(timeout=10)
+
+        rag_service.clear_document.assert_called_once_with(str(document_id))
+        with db_app.app_context():
+            assert db.session.get(PDFDocument, document_id).status == 'error'
+            assert DocumentChunk.query.filter_by(document_id=document_id).count() == 0
+
+    def test_failed_job(self, db_app, rag_service):
+        """Test that a processing failure is recorded on the document."""
+        rag_service.process_document.side_effect = None
+        rag_service.process_document.return_value = (False, "No text content found in document")
+        queue = IngestionQueue(rag_service, max_workers=1)
+        document_id = create_document(db_app)
+
+        queue.submit(db_app, document_id, '/tmp/test.pdf').result(timeout=10)
+
+        with db_app.app_context():
+            document = db.session.get(PDFDocument, document_id)
+            assert document.status == 'error'
+            assert "No text content" in document.error_message
+        assert queue.get_progress(document_id)['status'] == 'error'
+        rag_service.clear_document.assert_not_called()
+
+    def test_recover_unfinished_jobs(self, db_app, rag_service, tmp_path):
+        """Test that jobs orphaned by a restart are queued again, or failed when their PDF is gone."""
+        stored = tmp_path / "stored.pdf"
+        stored.write_bytes(b"%PDF-1.4")
+        with db_app.app_context():
+            documents = [PDFDocument(filename='a.pdf', file_path=str(stored), status='pending'),
+                         PDFDocument(filename='b.pdf', file_path=str(stored), status='processing'),
+                         PDFDocument(filename='c.pdf', file_path=str(tmp_path / "gone.pdf"), status='processing'),
+                         PDFDocument(filename='d.pdf', file_path=str(stored), status='completed')]
+            db.session.add_all(documents)
+            db.session.commit()
+            pending, processing, missing, completed = [document.id for document in documents]
+        queue = IngestionQueue(rag_service, max_workers=1)
+
+        assert queue.recover(db_app) == 2
+        queue.shutdown(wait=True)
+
+        with db_app.app_context():
+            assert db.session.get(PDFDocument, pending).status == 'completed'
+            assert db.session.get(PDFDocument, processing).status == 'completed'
+            assert db.session.get(PDFDocument, missing).status == 'error'
+            assert "missing" in db.session.get(PDFDocument, missing).error_message
+        rag_service.clear_document.assert_called_once_with(str(processing))
+        assert sorted(call.args[1] for call in rag_service.process_document.call_args_list) == \
+            [str(pending), str(processing)]
+
+    def test_unknown_job(self, rag_service):
+        """Test progress lookup for a document that was never submitted."""
+        assert IngestionQueue(rag_service).get_progress(42) is None
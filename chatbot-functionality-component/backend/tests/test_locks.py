@@ -0,0 +1,93 @@
+"""Unit tests for lock utilities."""
+
+import time
+import threading
+import pytest
+from app.services.locks import ReadWriteLock
+
+class TestReadWriteLock:
+    """Test cases for ReadWriteLock."""
+
+    def test_readers_share_the_lock(self):
+        """Test that several readers hold the lock at the same time."""
+        lock = ReadWriteLock()
+        inside = threading.Barrier(3, timeout=5)
+
+        def read():
+            with lock.read_locked():
+                inside.wait()
+
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert not any(thread.is_alive() for thread in threads)
+
+    def test_writer_excludes_readers(self):
+        """Test that a reader waits until the writer releases the lock."""
+        lock = ReadWriteLock()
+        events = []
+        lock.acquire_write()
+
+        def read():
+            with lock.read_locked():
+                events.append('read')
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+        events.append('write done')
+        lock.release_write()
+        reader.join(timeout=5)
+
+        assert events == ['write done', 'read']
+
+    def test_waiting_writer_blocks_new_readers(self):
+        """Test that readers arriving after a waiting writer queue behind it."""
+        lock = ReadWriteLock()
+        events = []
+        lock.acquire_read()
+
+        def write():
+            with lock.write_locked():
+                events.append('write')
+
+        def read():
+            with lock.read_locked():
+                events.append('read')
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.05)
+        reader = threading.Thread(target=read)
+        reader.start()
+        time.sleep(0.05)
+        assert events == []
+
+        lock.release_read()
+        writer.join(timeout=5)
+        reader.join(timeout=5)
+        assert events == ['write', 'read']
+
+    def test_writer_can_reenter(self):
+        """Test that the writing thread can take the lock again for reading or writing."""
+        lock = ReadWriteLock()
+        with lock.write_locked():
+            with lock.write_locked():
+                with lock.read_locked():
+                    pass
+
+        # Fully released: another thread can now write
+        acquired = []
+        thread = threading.Thread(target=lambda: (lock.acquire_write(), acquired.append(True), lock.release_write()))
+        thread.start()
+        thread.join(timeout=5)
+        assert acquired == [True]
+
+    def test_release_write_from_other_thread_fails(self):
+        """Test that only the holding thread can release the write lock."""
+        lock = ReadWriteLock()
+        with pytest.raises(RuntimeError):
+            lock.release_write()
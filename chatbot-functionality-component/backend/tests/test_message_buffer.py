@@ -0,0 +1,107 @@
+"""Unit tests for the chat message write-behind buffer."""
+
+import threading
+import pytest
+from unittest.mock import patch
+from flask import json
+from app import db
+from app.models import User, ChatSession, ChatMessage
+from app.services.message_buffer import MessageWriteBuffer
+
+@pytest.fixture
+def app(db_app):
+    """Create an application with one chat session."""
+    app = db_app
+    with app.app_context():
+        db.session.add(User(id=1, username='testuser'))
+        db.session.add(ChatSession(id=1, user_id=1))
+        db.session.commit()
+    return app
+
+class TestMessageWriteBuffer:
+    """Test cases for MessageWriteBuffer."""
+
+    def test_concurrent_messages_share_commits(self, app):
+        """Test that messages from concurrent threads are written in fewer, larger commits."""
+        buffer = MessageWriteBuffer(flush_interval_ms=100, max_batch_size=1000)
+        barrier = threading.Barrier(20)
+        ids = {}
+
+        def worker(n):
+            with app.app_context():
+                barrier.wait()
+                ids[n] = buffer.add(1, f"message {n}", 'user').result(timeout=10)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        buffer.close()
+
+        stats = buffer.stats()
+        assert stats['messages_written'] == 20
+        assert stats['flushes'] < 20
+        with app.app_context():
+            stored = {message.id: message.content for message in ChatMessage.query.all()}
+        assert all(stored[ids[n]] == f"message {n}" for n in range(20))
+
+    def test_close_flushes_pending_messages(self, app):
+        """Test that messages still buffered at shutdown are written."""
+        buffer = MessageWriteBuffer(flush_interval_ms=60000)
+        with app.app_context():
+            futures = [buffer.add(1, "first", 'user'), buffer.add(1, "second", 'assistant')]
+        buffer.close()
+
+        first_id, second_id = [future.result(timeout=1) for future in futures]
+        assert first_id < second_id
+        with app.app_context():
+            assert [m.content for m in ChatMessage.query.order_by(ChatMessage.id)] == ["first", "second"]
+        with pytest.raises(RuntimeError):
+            buffer.add(1, "late", 'user')
+
+    def test_bad_message_does_not_fail_batch(self, app):
+        """Test that a row the database rejects fails alone."""
+        buffer = MessageWriteBuffer(flush_interval_ms=60000)
+        with app.app_context():
+            good = buffer.add(1, "fine", 'user')
+            bad = buffer.add(1, None, 'user')
+        assert buffer.flush() == 1
+        buffer.close()
+
+        assert isinstance(good.result(timeout=1), int)
+        with pytest.raises(Exception):
+            bad.result(timeout=1)
+
+    def test_get_messages_flushes_before_reading(self, app, db_client):
+        """Test that history reads include messages still waiting in the buffer."""
+        buffer = MessageWriteBuffer(flush_interval_ms=60000)
+
+        with patch('app.routes.message_buffer', buffer), \
+             patch('app.routes._search_context', return_value=[{'text': 'ctx', 'score': 0.0}]):
+            with app.app_context():
+                buffer.add(1, "queued", 'user')
+            response = db_client.get('/api/chat/sessions/1/messages')
+            buffer.flush_interval = 0.01
+            sent = db_client.post('/api/chat/sessions/1/messages', json={'content': 'hello'})
+        buffer.close()
+
+        assert [msg['content'] for msg in json.loads(response.data)['messages']] == ["queued"]
+        data = json.loads(sent.data)
+        assert data['user_message']['id'] < data['assistant_message']['id']
+        assert data['assistant_message']['content'] == "Based on the available information: ctx"
+
+    def test_stream_writes_through_buffer(self, app, db_client):
+        """Test that the synchronous stream route stores its messages through the buffer too."""
+        buffer = MessageWriteBuffer(flush_interval_ms=10)
+
+        with patch('app.routes.message_buffer', buffer), \
+             patch('app.routes._search_context', return_value=[{'text': 'ctx', 'score': 0.0}]):
+            response = db_client.post('/api/chat/sessions/1/messages/stream', json={'content': 'hello'})
+            body = response.get_data(as_text=True)
+        buffer.close()
+
+        assert 'event: done' in body
+        assert buffer.stats()['messages_written'] == 2
+        with app.app_context():
+            assert [m.type for m in ChatMessage.query.order_by(ChatMessage.id)] == ['user', 'assistant']
@@ -0,0 +1,67 @@
+"""Unit tests for paginated chat message history."""
+
+import pytest
+from datetime import datetime, timedelta
+from flask import json
+from app import db
+from app.models import User, ChatSession, ChatMessage
+
+@pytest.fixture
+def session_id(db_app):
+    """Create a session holding 25 messages, several of which share a timestamp."""
+    with db_app.app_context():
+        db.session.add(User(id=1, username='testuser'))
+        session = ChatSession(user_id=1)
+        db.session.add(session)
+        db.session.flush()
+        start = datetime(2024, 1, 1)
+        db.session.add_all([
+            ChatMessage(session_id=session.id, content=f"message {i}", type='user',
+                        timestamp=start + timedelta(seconds=i // 3))
+            for i in range(25)
+        ])
+        db.session.commit()
+        return session.id
+
+class TestMessageHistory:
+    """Test cases for GET /sessions/<id>/messages."""
+
+    def test_pages_cover_history_in_order(self, db_client, session_id):
+        """Test that following next_cursor returns every message exactly once, in order."""
+        contents, cursor, pages = [], None, 0
+        while True:
+            url = f'/api/chat/sessions/{session_id}/messages?limit=7'
+            response = db_client.get(url + (f'&cursor={cursor}' if cursor else ''))
+            assert response.status_code == 200
+            data = json.loads(response.data)
+            contents.extend(msg['content'] for msg in data['messages'])
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+
+        assert pages == 4
+        assert contents == [f"message {i}" for i in range(25)]
+
+    def test_stream_mode(self, db_client, session_id):
+        """Test that the streamed response is one JSON document with the whole history."""
+        response = db_client.get(f'/api/chat/sessions/{session_id}/messages?stream=true')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/json'
+        data = json.loads(response.get_data())
+        assert [msg['content'] for msg in data['messages']] == [f"message {i}" for i in range(25)]
+
+    def test_invalid_parameters(self, db_client, session_id):
+        """Test that bad limits and cursors are rejected."""
+        assert db_client.get(f'/api/chat/sessions/{session_id}/messages?limit=0').status_code == 400
+        assert db_client.get(f'/api/chat/sessions/{session_id}/messages?cursor=bogus').status_code == 400
+
+    def test_history_query_uses_index(self, db_app, session_id):
+        """Test that the keyset query is answered from the composite index."""
+        with db_app.app_context():
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT id FROM chat_messages WHERE session_id = :sid "
+                "ORDER BY timestamp, id LIMIT 10"), {'sid': session_id}).all()
+        details = " ".join(str(row[-1]) for row in plan)
+        assert 'ix_chat_messages_session_timestamp_id' in details
+        assert 'TEMP B-TREE' not in details
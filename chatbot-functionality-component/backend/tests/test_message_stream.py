@@ -0,0 +1,66 @@
+"""Unit tests for the streaming send-message route."""
+
+import pytest
+from unittest.mock import patch
+from flask import json
+from app import db
+from app.models import User, ChatSession, ChatMessage
+
+@pytest.fixture
+def session_id(db_app):
+    """Create an empty chat session."""
+    with db_app.app_context():
+        db.session.add(User(id=1, username='testuser'))
+        session = ChatSession(user_id=1)
+        db.session.add(session)
+        db.session.commit()
+        return session.id
+
+def parse_events(body):
+    """Split a Server-Sent Events body into (event, data) pairs."""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+class TestMessageStream:
+    """Test cases for POST /sessions/<id>/messages/stream."""
+
+    def test_stream_emits_context_answer_and_done(self, db_client, db_app, session_id):
+        """Test that the response arrives as context, the answer in one event and a final stored message."""
+        context = [{'text': 'Paris is the capital.', 'score': 0.1, 'document_info': {'document_id': '1'}}]
+        with patch('app.routes._search_context', return_value=context):
+            response = db_client.post(f'/api/chat/sessions/{session_id}/messages/stream',
+                                      json={'content': 'Capital of France?'})
+            body = response.get_data(as_text=True)
+
+        assert response.mimetype == 'text/event-stream'
+        events = parse_events(body)
+        names = [name for name, _ in events]
+        assert names == ['user_message', 'context', 'answer', 'done']
+
+        assert events[1][1][0]['text'] == 'Paris is the capital.'
+        streamed = events[2][1]['text']
+        assert streamed == "Based on the available information: Paris is the capital."
+
+        with db_app.app_context():
+            stored = ChatMessage.query.filter_by(session_id=session_id).order_by(ChatMessage.id).all()
+            assert [message.type for message in stored] == ['user', 'assistant']
+            assert stored[1].content == streamed
+            assert events[-1][1]['assistant_message']['id'] == stored[1].id
+
+    def test_stream_reports_errors(self, db_client, session_id):
+        """Test that a retrieval failure ends the stream with an error event."""
+        with patch('app.routes._search_context', side_effect=RuntimeError("index unavailable")):
+            response = db_client.post(f'/api/chat/sessions/{session_id}/messages/stream',
+                                      json={'content': 'Hello'})
+            events = parse_events(response.get_data(as_text=True))
+
+        assert events[0][0] == 'user_message'
+        assert events[-1] == ('error', {'error': 'index unavailable'})
+
+    def test_stream_requires_content(self, db_client, session_id):
+        """Test that an empty message is rejected before streaming starts."""
+        response = db_client.post(f'/api/chat/sessions/{session_id}/messages/stream', json={})
+        assert response.status_code == 400
@@ -0,0 +1,104 @@
+"""Unit tests for the shared embedding model server."""
+
+import os
+import stat
+import time
+import threading
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from app.services.model_server import EmbeddingServer, RemoteEncoder, default_address
+
+@pytest.fixture
+def server_address(tmp_path):
+    """Start an EmbeddingServer with a fake model in a background thread."""
+    address = str(tmp_path / "model.sock")
+    server = EmbeddingServer('test-model', address, authkey=b'test')
+    server.model = Mock()
+
+    def encode(texts, **kwargs):
+        if texts == ["boom"]:
+            raise ValueError("model failure")
+        return np.array([[len(t), 0.0] for t in texts])
+
+    server.model.encode.side_effect = encode
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for _ in range(100):
+        if os.path.exists(address):
+            break
+        time.sleep(0.01)
+    return address
+
+class TestModelServer:
+    """Test cases for EmbeddingServer and RemoteEncoder."""
+
+    def test_remote_encode(self, server_address):
+        """Test that a client receives the server model's embeddings."""
+        encoder = RemoteEncoder(server_address, authkey=b'test')
+        embeddings = encoder.encode(["a", "abc"])
+
+        assert embeddings.dtype == np.float32
+        np.testing.assert_array_equal(embeddings, [[1, 0], [3, 0]])
+        np.testing.assert_array_equal(encoder.encode("ab"), [2, 0])
+
+    def test_concurrent_clients(self, server_address):
+        """Test that several threads can share one encoder."""
+        encoder = RemoteEncoder(server_address, authkey=b'test')
+        results = {}
+
+        def worker(n):
+            results[n] = encoder.encode(["x" * n])[0][0]
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == {n: float(n) for n in range(1, 6)}
+
+    def test_server_errors_raise(self, server_address):
+        """Test that encode failures on the server surface as RuntimeError."""
+        encoder = RemoteEncoder(server_address, authkey=b'test')
+        with pytest.raises(RuntimeError, match="model failure"):
+            encoder.encode(["boom"])
+        # The connection stays usable after an error
+        np.testing.assert_array_equal(encoder.encode(["a"]), [[1, 0]])
+
+    def test_socket_is_private(self, server_address):
+        """Test that only the server's owner can connect to the socket."""
+        assert stat.S_IMODE(os.stat(server_address).st_mode) == 0o600
+
+    def test_authkey_is_required(self, monkeypatch, tmp_path):
+        """Test that neither side falls back to a well-known shared secret."""
+        monkeypatch.delenv('RAG_MODEL_SERVER_AUTHKEY', raising=False)
+        with pytest.raises(ValueError, match="RAG_MODEL_SERVER_AUTHKEY"):
+            EmbeddingServer('test-model', str(tmp_path / "model.sock"))
+        with pytest.raises(ValueError, match="RAG_MODEL_SERVER_AUTHKEY"):
+            RemoteEncoder(str(tmp_path / "model.sock"))
+
+        monkeypatch.setenv('RAG_MODEL_SERVER_AUTHKEY', 'secret')
+        assert RemoteEncoder(str(tmp_path / "model.sock")).authkey == b'secret'
+
+    def test_existing_file_is_not_replaced(self, tmp_path):
+        """Test that the server refuses to unlink a path that is not a socket."""
+        address = tmp_path / "model.sock"
+        address.write_text("keep me")
+        server = EmbeddingServer('test-model', str(address), authkey=b'test')
+        server.model = Mock()
+
+        with pytest.raises(FileExistsError):
+            server.serve_forever()
+        assert address.read_text() == "keep me"
+
+    def test_default_address_is_in_a_private_directory(self, monkeypatch, tmp_path):
+        """Test that the default socket lives in a 0700 directory and shared directories are refused."""
+        monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path / "run"))
+        address = default_address()
+
+        assert os.path.dirname(address) == str(tmp_path / "run")
+        assert stat.S_IMODE(os.stat(tmp_path / "run").st_mode) == 0o700
+
+        os.chmod(tmp_path / "run", 0o777)
+        with pytest.raises(PermissionError):
+            default_address()
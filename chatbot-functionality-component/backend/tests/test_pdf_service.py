@@ -108,4 +108,18 @@ class TestPDFService:
             success, message, metadata = pdf_service.process_pdf_upload(sample_pdf)
             assert not success
             assert "Invalid PDF" in message
-            assert metadata == {}
\ No newline at end of file
+            assert metadata == {}
+
+    def test_process_pdf_upload_parses_once(self, pdf_service, sample_pdf):
+        """Test that validation and metadata extraction share a single parse."""
+        with patch('app.services.pdf_service.PdfReader') as mock_reader, \
+             patch.object(pdf_service.mime, 'from_file', return_value='application/pdf'):
+            mock_reader.return_value.pages = [Mock(), Mock()]
+            mock_reader.return_value.is_encrypted = False
+            mock_reader.return_value.metadata = None
+
+            success, _, metadata = pdf_service.process_pdf_upload(sample_pdf)
+
+        assert success
+        assert metadata['num_pages'] == 2
+        mock_reader.assert_called_once_with(sample_pdf)
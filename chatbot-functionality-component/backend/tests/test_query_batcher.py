@@ -0,0 +1,101 @@
+"""Unit tests for the query batcher."""
+
+import threading
+import pytest
+import numpy as np
+from unittest.mock import Mock
+from app.services.query_batcher import QueryBatcher
+
+@pytest.fixture
+def rag_service():
+    """Create a mock RAG service that echoes each query back as k results."""
+    service = Mock()
+    service.batches = []
+    service.scopes = []
+    service.embeddings = []
+
+    def encode_queries(queries):
+        return np.array([[float(ord(query[0]))] for query in queries])
+
+    def search_batch(queries, k, document_ids=None, query_embeddings=None):
+        service.batches.append(list(queries))
+        service.scopes.append(document_ids)
+        service.embeddings.append(query_embeddings)
+        return [[{'text': f"{query}-{i}", 'score': float(i)} for i in range(k)] for query in queries]
+
+    service.encode_queries.side_effect = encode_queries
+    service.search_batch.side_effect = search_batch
+    return service
+
+class TestQueryBatcher:
+    """Test cases for QueryBatcher."""
+
+    def test_concurrent_queries_share_a_batch(self, rag_service):
+        """Test that queries arriving within the window are searched together."""
+        batcher = QueryBatcher(rag_service, max_batch_size=8, max_wait_ms=200)
+        barrier = threading.Barrier(4)
+        results = {}
+
+        def worker(n):
+            barrier.wait()
+            results[n] = batcher.search(f"q{n}", k=2)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(len(batch) for batch in rag_service.batches) == 4
+        assert len(rag_service.batches) < 4
+        for n in range(4):
+            assert [r['text'] for r in results[n]] == [f"q{n}-0", f"q{n}-1"]
+
+    def test_results_trimmed_to_requested_k(self, rag_service):
+        """Test that each caller gets only the k results it asked for."""
+        batcher = QueryBatcher(rag_service, max_batch_size=2, max_wait_ms=200)
+        small = batcher.submit("a", k=1)
+        large = batcher.submit("b", k=3)
+
+        assert len(small.result(timeout=5)) == 1
+        assert len(large.result(timeout=5)) == 3
+
+    def test_errors_propagate_to_callers(self, rag_service):
+        """Test that a failing batch fails every waiting future."""
+        rag_service.search_batch.side_effect = RuntimeError("index unavailable")
+        batcher = QueryBatcher(rag_service, max_wait_ms=1)
+
+        with pytest.raises(RuntimeError):
+            batcher.search("a", timeout=5)
+
+    def test_scoped_queries_batched_per_scope(self, rag_service):
+        """Test that queries for different document scopes are searched in separate batches."""
+        batcher = QueryBatcher(rag_service, max_batch_size=8, max_wait_ms=200)
+        futures = [batcher.submit("a", 1), batcher.submit("b", 1, document_ids=['7']),
+                   batcher.submit("c", 1, document_ids=[7]), batcher.submit("d", 1)]
+        for future in futures:
+            future.result(timeout=5)
+
+        batches = dict(zip(rag_service.scopes, rag_service.batches))
+        assert batches == {None: ["a", "d"], ('7',): ["b", "c"]}
+
+    def test_scoped_queries_encoded_once(self, rag_service):
+        """Test that a batch spanning several scopes is encoded in a single call."""
+        batcher = QueryBatcher(rag_service, max_batch_size=8, max_wait_ms=200)
+        queries = "abcdefgh"
+        futures = [batcher.submit(query, 1, document_ids=[n % 4]) for n, query in enumerate(queries)]
+        for future in futures:
+            future.result(timeout=5)
+
+        assert rag_service.encode_queries.call_count == 1
+        assert len(rag_service.batches) == 4
+        for batch, embeddings in zip(rag_service.batches, rag_service.embeddings):
+            assert embeddings[:, 0].tolist() == [float(ord(query)) for query in batch]
+
+    def test_encoding_errors_propagate_to_callers(self, rag_service):
+        """Test that a failing encoding call fails every waiting future."""
+        rag_service.encode_queries.side_effect = RuntimeError("model unavailable")
+        batcher = QueryBatcher(rag_service, max_wait_ms=1)
+
+        with pytest.raises(RuntimeError):
+            batcher.search("a", timeout=5)
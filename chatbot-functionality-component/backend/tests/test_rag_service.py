@@ -1,19 +1,24 @@
 """Unit tests for RAG Service."""
 
 import pytest
+import threading
 from unittest.mock import Mock, patch, MagicMock
 import numpy as np
 import faiss
+from concurrent.futures import ProcessPoolExecutor
 from app.services.rag_service import RAGService
+from app.services.index_store import IndexStore
+from app.services.embedding_cache import EmbeddingCache
 
 @pytest.fixture
 def rag_service():
     """Create a RAGService instance for testing."""
-    with patch('sentence_transformers.SentenceTransformer') as mock_transformer:
+    with patch('app.services.rag_service.SentenceTransformer') as mock_transformer, \
+         patch('boto3.client'):
         # Mock the encode method to return predictable embeddings
         mock_transformer.return_value.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]])
         service = RAGService(model_name='test-model', chunk_size=100)
-        return service
+        yield service
 
 @pytest.fixture
 def sample_pdf(tmp_path):
@@ -23,12 +28,65 @@ def sample_pdf(tmp_path):
         f.write(b'%PDF-1.4\nTest content\n%EOF\n')
     return str(pdf_path)
 
+def ingest(service, pdf_path, documents, vectors=None, **kwargs):
+    """Process documents given as text, with PDF validation and extraction stubbed out.
+
+    The service's model is replaced by a stub that embeds each chunk, and
+    later each query, as the vector of its first word; other words embed
+    as [1, 0].
+
+    Args:
+        service (RAGService): Service to ingest into
+        pdf_path (str): PDF passed to process_document; its content is not read
+        documents (Dict[str, str]): Text of each document, by document ID
+        vectors (Dict[str, List[float]], optional): Embedding of chunks by first word
+        **kwargs: Further arguments for process_document
+
+    Returns:
+        List[Tuple[bool, str]]: process_document's result for each document
+    """
+    vectors = vectors or {}
+    service.model = Mock(encode=Mock(side_effect=lambda texts: np.array(
+        [vectors.get(text.split()[0], [1.0, 0.0]) for text in texts], dtype=np.float32)))
+    results = []
+    with patch.object(service.pdf_service, 'validate_pdf', return_value=(True, "")):
+        for document_id, text in documents.items():
+            with patch.object(service, '_extract_text_from_pdf', return_value=text), \
+                 patch.object(service, '_iter_page_texts', return_value=iter([text])):
+                results.append(service.process_document(pdf_path, document_id, **kwargs))
+    return results
+
+def write_text_pdf(path, page_texts):
+    """Write a minimal PDF with one line of text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+    return str(path)
+
 class TestRAGService:
     """Test cases for RAGService."""
 
     def test_extract_text_from_pdf(self, rag_service, sample_pdf):
         """Test PDF text extraction."""
-        with patch('PyPDF2.PdfReader') as mock_reader:
+        with patch('app.services.pdf_service.PdfReader') as mock_reader:
             mock_page = Mock()
             mock_page.extract_text.return_value = "Test content"
             mock_reader.return_value.pages = [mock_page]
@@ -82,13 +140,9 @@ class TestRAGService:
     def test_search_with_results(self, rag_service):
         """Test search with existing index and content."""
         # Setup test data
-        rag_service.text_chunks = ["Test chunk 1", "Test chunk 2"]
+        rag_service.chunk_store.add('doc1', 0, 0, ["Test chunk 1", "Test chunk 2"], 2)
         rag_service.index = faiss.IndexFlatL2(2)  # 2D vectors for testing
         rag_service.index.add(np.array([[1.0, 0.0], [0.0, 1.0]]))
-        rag_service.document_map = {
-            0: {'document_id': 'doc1', 'chunk_index': 0, 'total_chunks': 2},
-            1: {'document_id': 'doc1', 'chunk_index': 1, 'total_chunks': 2}
-        }
 
         results = rag_service.search("test query", k=2)
         assert len(results) == 2
@@ -98,12 +152,9 @@ class TestRAGService:
     def test_get_document_chunks(self, rag_service):
         """Test retrieving document chunks."""
         # Setup test data
-        rag_service.text_chunks = ["Chunk 1", "Chunk 2", "Chunk 3"]
-        rag_service.document_map = {
-            0: {'document_id': 'doc1', 'chunk_index': 0},
-            1: {'document_id': 'doc2', 'chunk_index': 0},
-            2: {'document_id': 'doc1', 'chunk_index': 1}
-        }
+        rag_service.chunk_store.add('doc1', 0, 0, ["Chunk 1"], 2)
+        rag_service.chunk_store.add('doc2', 1, 0, ["Chunk 2"], 1)
+        rag_service.chunk_store.add('doc1', 2, 1, ["Chunk 3"], 2)
 
         chunks = rag_service.get_document_chunks('doc1')
         assert len(chunks) == 2
@@ -113,15 +164,452 @@ class TestRAGService:
     def test_clear_document(self, rag_service):
         """Test document clearing functionality."""
         # Setup test data
-        rag_service.text_chunks = ["Chunk 1", "Chunk 2"]
+        rag_service.chunk_store.add('doc1', 0, 0, ["Chunk 1", "Chunk 2"], 2)
         rag_service.index = faiss.IndexFlatL2(2)
         rag_service.index.add(np.array([[1.0, 0.0], [0.0, 1.0]]))
-        rag_service.document_map = {
-            0: {'document_id': 'doc1', 'chunk_index': 0},
-            1: {'document_id': 'doc1', 'chunk_index': 1}
-        }
 
         success = rag_service.clear_document('doc1')
         assert success
         assert len(rag_service.text_chunks) == 0
-        assert len(rag_service.document_map) == 0
\ No newline at end of file
+        assert len(rag_service.document_map) == 0
+        assert len(rag_service.document_chunks) == 0
+
+    def test_clear_document_keeps_other_documents(self, rag_service, sample_pdf):
+        """Test that removing one document leaves the others searchable without re-encoding."""
+        ingest(rag_service, sample_pdf, {"doc1": "alpha", "doc2": "beta"},
+               vectors={'alpha': [1.0, 0.0], 'beta': [0.0, 1.0]})
+
+        with patch.object(rag_service.model, 'encode', return_value=np.array([[1.0, 0.0]])) as mock_encode:
+            assert rag_service.clear_document('doc1')
+            mock_encode.assert_not_called()
+
+            assert rag_service.index.ntotal == 1
+            assert rag_service.get_document_chunks('doc2') == ["beta"]
+            results = rag_service.search("query", k=5)
+            assert [r['text'] for r in results] == ["beta"]
+            assert results[0]['document_info']['document_id'] == 'doc2'
+
+    def test_snapshot_restores_state(self, rag_service, sample_pdf, tmp_path):
+        """Test that a new service instance starts from the saved snapshot."""
+        rag_service.index_store = IndexStore(str(tmp_path / "index"))
+        rag_service.autosave_interval = 0
+        ingest(rag_service, sample_pdf, {"doc1": "alpha", "doc2": "beta"},
+               vectors={'alpha': [1.0, 0.0], 'beta': [0.0, 1.0]})
+
+        with patch('app.services.rag_service.SentenceTransformer') as mock_transformer:
+            mock_transformer.return_value.encode.return_value = np.array([[0.0, 1.0]])
+            restored = RAGService(model_name='test-model', index_path=str(tmp_path / "index"))
+
+            assert restored.text_chunks == rag_service.text_chunks
+            assert restored.document_map == rag_service.document_map
+            assert restored.search("query", k=1)[0]['text'] == "beta"
+
+        # Mutating a memory-mapped index works on a private copy
+        assert restored.clear_document('doc2')
+        assert restored.index.ntotal == 1
+
+    def test_snapshot_with_other_metric_is_not_loaded(self, tmp_path):
+        """Test that a cosine service refuses an L2 snapshot instead of misreading its scores."""
+        path = str(tmp_path / "index")
+        writer = RAGService(model_name='test-model', index_path=path, autosave_interval=0)
+        writer._add_chunks('doc1', 0, ["alpha"], np.array([[3.0, 0.0]]), 1)
+        writer.save_snapshot()
+
+        reader = RAGService(model_name='test-model', index_path=path, autosave_interval=0,
+                            index_params={'metric': 'cosine'}, min_similarity=0.5)
+        reader.model = Mock(encode=Mock(return_value=np.array([[1.0, 0.0]])))
+
+        assert not reader.load_snapshot()
+        assert reader.index is None
+        assert reader.search("alpha") == []
+
+    def test_workers_sharing_a_snapshot_keep_each_others_documents(self, tmp_path):
+        """Test that processes saving to one snapshot directory merge instead of overwriting."""
+        path = str(tmp_path / "index")
+        first = RAGService(model_name='test-model', index_path=path, autosave_interval=0)
+        second = RAGService(model_name='test-model', index_path=path, autosave_interval=0)
+        first._add_chunks('doc1', 0, ["alpha"], np.array([[1.0, 0.0]]), 1)
+        first.save_snapshot()
+        second._add_chunks('doc2', 0, ["beta"], np.array([[0.0, 1.0]]), 1)
+        second.save_snapshot()
+
+        reader = RAGService(model_name='test-model', index_path=path, autosave_interval=0)
+        assert sorted(reader.text_chunks.values()) == ["alpha", "beta"]
+        assert sorted(second.document_chunks) == ['doc1', 'doc2']
+
+        # A delete in one process reaches the others on their next sync
+        assert first.clear_document('doc1')
+        assert reader.sync_snapshot()
+        assert list(reader.text_chunks.values()) == ["beta"]
+        assert reader.index.ntotal == 1
+        assert reader.index.reconstruct_batch(np.array(list(reader.text_chunks))).tolist() == [[0.0, 1.0]]
+
+    def test_autosave_runs_periodically(self, tmp_path):
+        """Test that changes are saved by the autosave thread or on close, not after every change."""
+        store = IndexStore(str(tmp_path / "index"))
+        service = RAGService(model_name='test-model', index_path=store.directory, autosave_interval=3600)
+        service._add_chunks('doc1', 0, ["alpha"], np.array([[1.0, 0.0]]), 1)
+        service._autosave()
+        assert not store.exists()
+
+        service.close()
+        assert store.exists()
+        assert store.load()['chunks'].texts == {0: "alpha"}
+
+    def test_sharded_index(self, sample_pdf, tmp_path):
+        """Test ingest, search, removal, snapshots and reports with a sharded index."""
+        documents = {f"doc{i}": np.eye(4, dtype=np.float32)[i:i + 1] for i in range(4)}
+        with patch('app.services.rag_service.SentenceTransformer') as mock_transformer:
+            mock_transformer.return_value.encode.side_effect = lambda texts: np.vstack(
+                [documents[text.split()[0]] for text in texts])
+            service = RAGService(model_name='test-model', index_path=str(tmp_path / "index"),
+                                 index_params={'num_shards': 3}, autosave_interval=0)
+            ingest(service, sample_pdf, {document_id: document_id for document_id in documents},
+                   vectors={document_id: vector[0] for document_id, vector in documents.items()})
+
+            assert service.index.ntotal == 4
+            for document_id in documents:
+                shard = service.index.shards[service.index.shard_for(document_id)]
+                assert shard.ntotal >= 1
+                assert service.search(document_id, k=1)[0]['document_info']['document_id'] == document_id
+            assert service.index_report(num_queries=4, k=1)[0]['recall_at_k'] == 1.0
+
+            restored = RAGService(model_name='test-model', index_path=str(tmp_path / "index"),
+                                  index_params={'num_shards': 3})
+            assert restored.search("doc2", k=1)[0]['text'] == "doc2"
+            assert restored.clear_document("doc2")
+            assert restored.index.ntotal == 3
+            assert sorted(r['text'] for r in restored.search("doc2", k=4)) == ["doc0", "doc1", "doc3"]
+
+    def test_index_report(self, rag_service, sample_pdf):
+        """Test the recall/latency report on the live index."""
+        ingest(rag_service, sample_pdf, {"doc1": "alpha"})
+
+        report = rag_service.index_report(num_queries=1, k=1)
+        assert len(report) == 1
+        assert report[0]['recall_at_k'] == 1.0
+
+    def test_index_report_leaves_live_index_alone(self, rag_service, sample_pdf):
+        """Test that report settings are applied to a copy, never to the index serving searches."""
+        ingest(rag_service, sample_pdf, {"doc1": "alpha", "doc2": "beta"})
+        live = rag_service.index
+
+        with patch.object(rag_service.index_factory, 'configure_search') as configure:
+            report = rag_service.index_report(num_queries=2, k=1, settings=[{'nprobe': 1}, {'nprobe': 4}])
+        assert len(report) == 2
+        assert configure.call_count == 3
+        assert all(call.args[0] is not live for call in configure.call_args_list)
+        assert rag_service.index is live
+
+    def test_search_batch(self, rag_service):
+        """Test that a batch of queries is encoded and searched in one call."""
+        rag_service.chunk_store.add('doc1', 0, 0, ["Test chunk 1", "Test chunk 2"], 2)
+        rag_service.index = faiss.IndexFlatL2(2)
+        rag_service.index.add(np.array([[1.0, 0.0], [0.0, 1.0]]))
+
+        with patch.object(rag_service.model, 'encode',
+                          return_value=np.array([[0.0, 1.0], [1.0, 0.0]])) as mock_encode:
+            results = rag_service.search_batch(["second", "first"], k=1)
+
+        mock_encode.assert_called_once_with(["second", "first"])
+        assert [r[0]['text'] for r in results] == ["Test chunk 2", "Test chunk 1"]
+
+    def test_search_uses_caches(self, rag_service, sample_pdf):
+        """Test that repeated queries skip encoding and index changes invalidate results."""
+        ingest(rag_service, sample_pdf, {"doc1": "alpha"})
+        with patch.object(rag_service.index, 'search', wraps=rag_service.index.search) as mock_search:
+            first = rag_service.search("What is  Alpha?", k=1)
+            second = rag_service.search("what is alpha?", k=1)
+            assert second == first
+            assert mock_search.call_count == 1
+
+        ingest(rag_service, sample_pdf, {"doc2": "beta"})
+        assert len(rag_service.search("what is alpha?", k=2)) == 2
+
+        stats = rag_service.get_cache_stats()
+        assert stats['results']['hits'] == 1
+        assert stats['embeddings']['hits'] == 1
+        assert stats['index_generation'] == 2
+
+    @pytest.mark.parametrize('streaming', [False, True])
+    def test_reupload_skips_extraction_and_encoding(self, rag_service, sample_pdf, tmp_path, streaming):
+        """Test that an identical re-upload reuses cached chunks and embeddings, streamed or not."""
+        rag_service.chunk_embedding_cache = EmbeddingCache(str(tmp_path / "embeddings.db"), 'test-model')
+        with patch.object(rag_service.pdf_service, 'validate_pdf', return_value=(True, "")), \
+             patch.object(rag_service, '_extract_text_from_pdf', return_value="Test content") as mock_extract, \
+             patch.object(rag_service, '_iter_page_texts', return_value=iter(["Test content"])) as mock_pages, \
+             patch.object(rag_service.model, 'encode', return_value=np.array([[1.0, 0.0]])) as mock_encode:
+            assert rag_service.process_document(sample_pdf, "doc1", streaming=streaming)[0]
+            assert rag_service.process_document(sample_pdf, "doc2", streaming=streaming)[0]
+
+        assert mock_extract.call_count + mock_pages.call_count == 1
+        assert mock_encode.call_count == 1
+        assert rag_service.get_document_chunks("doc2") == ["Test content"]
+
+    def test_process_document_parses_once(self, rag_service, sample_pdf):
+        """Test that validation and text extraction share a single parse."""
+        with patch('app.services.pdf_service.PdfReader') as mock_reader, \
+             patch.object(rag_service.pdf_service.mime, 'from_file', return_value='application/pdf'), \
+             patch.object(rag_service.model, 'encode', return_value=np.array([[1.0, 0.0]])):
+            mock_page = Mock()
+            mock_page.extract_text.return_value = "Test content"
+            mock_reader.return_value.pages = [mock_page]
+
+            success, _ = rag_service.process_document(sample_pdf, "doc1")
+
+        assert success
+        mock_reader.assert_called_once_with(sample_pdf)
+
+    def test_parallel_extraction_matches_serial(self, rag_service, tmp_path):
+        """Test that process-pool extraction returns the same text in page order."""
+        pdf_path = write_text_pdf(tmp_path / "manual.pdf", [f"Page {i} text" for i in range(12)])
+        serial = rag_service._extract_text_from_pdf(pdf_path)
+
+        rag_service.extraction_workers = 2
+        with patch.object(RAGService, 'PARALLEL_EXTRACTION_MIN_PAGES', 4), \
+             patch('app.services.rag_service.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as mock_pool:
+            parallel = rag_service._extract_text_from_pdf(pdf_path)
+
+        mock_pool.assert_called_once()
+        assert parallel == serial
+        assert serial.split("\n")[:3] == ["Page 0 text", "Page 1 text", "Page 2 text"]
+
+    def test_streaming_matches_batch_processing(self, rag_service, tmp_path):
+        """Test that streaming ingestion indexes the same chunks in bounded batches."""
+        pdf_path = write_text_pdf(tmp_path / "manual.pdf", [f"Page {i} " + "word " * 30 for i in range(6)])
+        rag_service.stream_batch_size = 2
+        progress = []
+        encode = lambda chunks: np.ones((len(chunks), 2))
+
+        with patch.object(rag_service.pdf_service, 'validate_pdf', return_value=(True, "")), \
+             patch.object(rag_service.model, 'encode', side_effect=encode) as mock_encode:
+            rag_service.process_document(pdf_path, "batch")
+            success, _ = rag_service.process_document(pdf_path, "stream", streaming=True,
+                                                      progress_callback=progress.append)
+
+        assert success
+        expected = rag_service.get_document_chunks("batch")
+        assert rag_service.get_document_chunks("stream") == expected
+        assert all(len(call[0][0]) <= 2 for call in mock_encode.call_args_list[1:])
+        assert progress[-1]['chunks'] == len(expected)
+        assert [p['chunks'] for p in progress] == sorted(p['chunks'] for p in progress)
+        infos = [info for info in rag_service.document_map.values() if info['document_id'] == "stream"]
+        assert [info['chunk_index'] for info in infos] == list(range(len(expected)))
+        assert all(info['total_chunks'] == len(expected) for info in infos)
+
+    def test_streaming_failure_rolls_back(self, rag_service, tmp_path):
+        """Test that a failure part-way through streaming removes the partial document."""
+        pdf_path = write_text_pdf(tmp_path / "manual.pdf", [f"Page {i} " + "word " * 30 for i in range(6)])
+        rag_service.stream_batch_size = 1
+        encode = Mock(side_effect=[np.ones((1, 2)), RuntimeError("model crashed")])
+
+        with patch.object(rag_service.pdf_service, 'validate_pdf', return_value=(True, "")), \
+             patch.object(rag_service.model, 'encode', encode):
+            success, message = rag_service.process_document(pdf_path, "doc1", streaming=True)
+
+        assert not success
+        assert "model crashed" in message
+        assert rag_service.get_document_chunks("doc1") == []
+
+    def test_model_loaded_lazily(self):
+        """Test that constructing the service does not load the model."""
+        with patch('app.services.rag_service.SentenceTransformer') as mock_transformer:
+            service = RAGService(model_name='test-model')
+            mock_transformer.assert_not_called()
+
+            assert service.warm_up()
+            mock_transformer.assert_called_once_with('test-model')
+            service.model.encode.assert_called_once_with(["warm up"])
+
+    def test_document_chunk_index_stays_consistent(self, rag_service, sample_pdf):
+        """Test that the document-to-chunk index follows ingestion and removal."""
+        ingest(rag_service, sample_pdf, {"doc1": "a " * 80, "doc2": "b " * 80})
+
+        doc1_ids = rag_service.document_chunks['doc1']
+        assert [rag_service.document_map[i]['chunk_index'] for i in doc1_ids] == list(range(len(doc1_ids)))
+        assert all(rag_service.document_map[i]['document_id'] == 'doc2'
+                   for i in rag_service.document_chunks['doc2'])
+
+        assert rag_service.clear_document('doc1')
+        assert 'doc1' not in rag_service.document_chunks
+        assert rag_service.get_document_chunks('doc1') == []
+        assert len(rag_service.get_document_chunks('doc2')) == len(rag_service.document_chunks['doc2'])
+
+    def test_chunk_sink_receives_every_batch(self, rag_service, sample_pdf):
+        """Test that the chunk sink sees each chunk and embedding once, in both ingestion modes."""
+        rag_service.stream_batch_size = 2
+        pages = ["one " * 120, "two " * 120]
+        received = []
+        with patch.object(rag_service.pdf_service, 'validate_pdf', return_value=(True, "")), \
+             patch.object(rag_service, '_iter_page_texts', side_effect=lambda pdf: iter(pages)), \
+             patch.object(rag_service.model, 'encode', side_effect=lambda chunks: np.ones((len(chunks), 2))):
+            rag_service.process_document(sample_pdf, "stream", streaming=True,
+                                         chunk_sink=lambda chunks, embeddings: received.append((chunks, embeddings)))
+            rag_service.process_document(sample_pdf, "batch",
+                                         chunk_sink=lambda chunks, embeddings: received.append((chunks, embeddings)))
+
+        streamed, batched = received[:-1], received[-1]
+        assert len(streamed) > 1
+        assert [chunk for chunks, _ in streamed for chunk in chunks] == batched[0]
+        assert all(len(chunks) == len(embeddings) for chunks, embeddings in received)
+        assert batched[0] == rag_service.get_document_chunks("batch")
+
+    def test_concurrent_ingest_delete_and_search(self, rag_service, sample_pdf):
+        """Stress test: searches never fail or see torn state while documents are added and removed."""
+        current = threading.local()
+        stop = threading.Event()
+        failures = []
+        ingested = []
+
+        def encode(texts):
+            # Deterministic vectors so documents land all over the index
+            return np.array([np.random.default_rng(abs(hash(text)) % 2**32).random(8) for text in texts],
+                            dtype=np.float32)
+
+        def ingest(worker):
+            for n in range(15):
+                current.document_id = f"w{worker}-{n}"
+                success, message = rag_service.process_document(sample_pdf, current.document_id,
+                                                                 streaming=n % 2 == 1)
+                if not success:
+                    failures.append(message)
+                ingested.append(current.document_id)
+
+        def delete():
+            rng = np.random.default_rng(1)
+            while not stop.is_set():
+                if ingested:
+                    rag_service.clear_document(ingested[rng.integers(len(ingested))])
+
+        def search():
+            rng = np.random.default_rng(threading.get_ident() % 2**32)
+            while not stop.is_set():
+                for result in rag_service.search(f"query {rng.integers(10000)}", k=10):
+                    info = result['document_info']
+                    if result['text'].split()[0] != info['document_id'] or info['chunk_index'] >= max(
+                            info['total_chunks'], info['chunk_index'] + 1):
+                        failures.append(result)
+
+        pages = lambda: iter([(current.document_id + " ") * 150] * 2)
+        with patch.object(rag_service.pdf_service, 'validate_pdf', return_value=(True, "")), \
+             patch.object(rag_service, '_extract_text_from_pdf', side_effect=lambda pdf: "".join(pages())), \
+             patch.object(rag_service, '_iter_page_texts', side_effect=lambda pdf: pages()), \
+             patch.object(rag_service.model, 'encode', side_effect=encode), \
+             patch('app.services.rag_service.logger') as mock_logger:
+            rag_service.stream_batch_size = 3
+            ingesters = [threading.Thread(target=ingest, args=(worker,)) for worker in range(3)]
+            others = [threading.Thread(target=delete)] + [threading.Thread(target=search) for _ in range(4)]
+            for thread in ingesters + others:
+                thread.start()
+            for thread in ingesters:
+                thread.join(timeout=60)
+            stop.set()
+            for thread in others:
+                thread.join(timeout=60)
+
+        assert not failures
+        mock_logger.error.assert_not_called()
+        ntotal = rag_service.index.ntotal if rag_service.index is not None else 0
+        assert ntotal == len(rag_service.chunk_store)
+        for document_id, chunk_ids in rag_service.document_chunks.items():
+            assert [rag_service.document_map[i]['chunk_index'] for i in chunk_ids] == list(range(len(chunk_ids)))
+
+    @pytest.mark.parametrize('index_type, slow_step', [('ivf_flat', 'promote'), ('hnsw', 'remove_ids')])
+    def test_search_runs_during_slow_index_updates(self, index_type, slow_step):
+        """Test that training or rebuilding the index does not hold the exclusive lock."""
+        service = RAGService(model_name='test-model', index_type=index_type,
+                             index_params={'nlist': 2, 'train_size': 4})
+        service.model = Mock(encode=Mock(return_value=np.array([[1.0, 0.0]])))
+        vectors = np.random.default_rng(0).random((6, 2), dtype=np.float32)
+        service._add_chunks('doc1', 0, ["one", "two", "three"], vectors[:3], 3)
+        started, release = threading.Event(), threading.Event()
+        original = getattr(service.index_factory, slow_step)
+
+        def slow(*args):
+            started.set()
+            release.wait(timeout=10)
+            return original(*args)
+
+        def update():
+            if slow_step == 'promote':
+                service._add_chunks('doc2', 0, ["four", "five", "six"], vectors[3:], 3)
+            else:
+                service.clear_document('doc1')
+
+        with patch.object(service.index_factory, slow_step, side_effect=slow):
+            updater = threading.Thread(target=update)
+            updater.start()
+            assert started.wait(timeout=10)
+            found = []
+            searcher = threading.Thread(target=lambda: found.extend(service.search("query", k=6)))
+            searcher.start()
+            searcher.join(timeout=5)
+            finished_while_blocked = not searcher.is_alive()
+            release.set()
+            updater.join(timeout=10)
+
+        assert finished_while_blocked
+        # Searches during the slow step see the index as it was before the swap
+        assert len(found) == (6 if slow_step == 'promote' else 3)
+        if slow_step == 'promote':
+            assert type(faiss.downcast_index(service.index)).__name__ == 'IndexIVFFlat'
+            assert service.index.ntotal == 6
+        else:
+            assert service.index is None or service.index.ntotal == 0
+
+    def test_scoped_search_returns_k_results_from_scope(self, rag_service, sample_pdf):
+        """Test that a scoped search fills k results from the scoped documents only."""
+        vectors = {'near': [1.0, 0.0], 'far': [0.0, 1.0]}
+        ingest(rag_service, sample_pdf, {"nearby": "near " * 60, "distant": "far " * 60}, vectors=vectors)
+
+        everything = rag_service.search("near", k=3)
+        scoped = rag_service.search("near", k=3, document_ids=["distant"])
+        again = rag_service.search("near", k=3, document_ids=["distant"])
+        other_query = rag_service.search("far", k=1, document_ids=["distant"])
+
+        assert {r['document_info']['document_id'] for r in everything} == {'nearby'}
+        assert len(scoped) == 3
+        assert {r['document_info']['document_id'] for r in scoped} == {'distant'}
+        assert again == scoped
+        assert other_query[0]['document_info']['document_id'] == 'distant'
+        assert rag_service.get_cache_stats()['scopes']['hits'] == 1
+        assert rag_service.search("near", k=3, document_ids=["missing"]) == []
+        # One sub-index was built for 'distant'; the repeated query was answered from the result cache
+        assert rag_service.get_cache_stats()['scopes']['misses'] == 1
+        # The cache budget is charged with the bytes of the sub-index's float32 vectors
+        distant_chunks = len(rag_service.get_document_chunks("distant"))
+        assert rag_service.get_cache_stats()['scopes']['weight'] == distant_chunks * 2 * 4
+
+    def test_scoped_search_beyond_cache_budget(self, rag_service, sample_pdf):
+        """Test that a document larger than the scope cache budget is still searched, but not cached."""
+        rag_service.scope_cache.max_size = 8
+        ingest(rag_service, sample_pdf, {"large": "text " * 60})
+        results = rag_service.search("text", k=3, document_ids=["large"])
+
+        assert len(results) == 3
+        assert len(rag_service.scope_cache) == 0
+        assert rag_service.get_cache_stats()['scopes']['evictions'] == 1
+
+    def test_cosine_search_applies_min_similarity(self, sample_pdf):
+        """Test that cosine mode scores results by similarity and drops those below the cutoff."""
+        vectors = {'north': [3.0, 0.0], 'northeast': [2.0, 2.0], 'east': [0.0, 0.5]}
+        service = RAGService(model_name='test-model', index_params={'metric': 'cosine'}, min_similarity=0.5)
+        ingest(service, sample_pdf, {document_id: document_id for document_id in vectors}, vectors=vectors)
+
+        default_cutoff = service.search("north", k=3)
+        everything = service.search("north", k=3, min_similarity=-1.0)
+        strict = service.search("north", k=3, min_similarity=0.9)
+
+        assert [r['text'] for r in everything] == ["north", "northeast", "east"]
+        assert [r['score'] for r in everything] == pytest.approx([1.0, 2 ** -0.5, 0.0], abs=1e-6)
+        assert [r['text'] for r in default_cutoff] == ["north", "northeast"]
+        assert [r['text'] for r in strict] == ["north"]
+
+    def test_scoped_search_follows_reingestion(self, rag_service, sample_pdf):
+        """Test that a re-ingested document is searched with its new chunks, not a stale sub-index."""
+        ingest(rag_service, sample_pdf, {"doc1": "old"})
+        assert rag_service.search("q", k=1, document_ids=["doc1"])[0]['text'] == "old"
+
+        rag_service.clear_document("doc1")
+        ingest(rag_service, sample_pdf, {"doc1": "new"})
+        assert rag_service.search("q", k=1, document_ids=["doc1"])[0]['text'] == "new"
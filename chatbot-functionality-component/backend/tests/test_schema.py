@@ -0,0 +1,101 @@
+"""Unit tests for upgrading databases created by earlier versions of the models."""
+
+import sqlite3
+import pytest
+from sqlalchemy import inspect, text
+from app import create_app, db
+from app.models import PDFDocument, ChatSession
+from app.schema import upgrade_schema
+from app.services.chunk_persistence import load_document_chunks
+
+# Tables as the first release of the models created them
+LEGACY_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50) NOT NULL UNIQUE, created_at DATETIME);
+CREATE TABLE pdf_documents (id INTEGER PRIMARY KEY, filename VARCHAR(255) NOT NULL, upload_date DATETIME,
+                            status VARCHAR(50) NOT NULL, metadata JSON);
+CREATE TABLE chat_sessions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+                            start_time DATETIME, end_time DATETIME);
+CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL REFERENCES chat_sessions (id),
+                            content VARCHAR NOT NULL, timestamp DATETIME, type VARCHAR(20) NOT NULL);
+CREATE TABLE document_chunks (id INTEGER PRIMARY KEY, document_id INTEGER NOT NULL REFERENCES pdf_documents (id),
+                              content VARCHAR NOT NULL, embedding JSON);
+INSERT INTO users (id, username) VALUES (1, 'testuser');
+INSERT INTO chat_sessions (id, user_id) VALUES (1, 1);
+INSERT INTO pdf_documents (id, filename, status) VALUES (1, 'old.pdf', 'completed');
+INSERT INTO document_chunks (id, document_id, content, embedding) VALUES (1, 1, 'first', '[1.0, 0.5]');
+INSERT INTO document_chunks (id, document_id, content, embedding) VALUES (2, 1, 'second', NULL);
+"""
+
+@pytest.fixture
+def legacy_app(monkeypatch, tmp_path):
+    """Create an application over a database that still has the legacy schema."""
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(LEGACY_SCHEMA)
+    monkeypatch.setenv('TEST_DATABASE_URL', f"sqlite:///{path}")
+    return create_app('testing')
+
+def columns(table):
+    """Return the names of a table's columns in the application database."""
+    return {column['name'] for column in inspect(db.engine).get_columns(table)}
+
+def indexes(table):
+    """Return the names of a table's indexes in the application database."""
+    return {index['name'] for index in inspect(db.engine).get_indexes(table)}
+
+class TestUpgradeSchema:
+    """Test cases for upgrade_schema."""
+
+    def test_pdf_documents_gain_ingestion_columns(self, legacy_app):
+        """Test that an existing pdf_documents table gets the ingestion queue's columns."""
+        with legacy_app.app_context():
+            assert {'file_path', 'error_message'} <= columns('pdf_documents')
+            document = db.session.get(PDFDocument, 1)
+            document.error_message = "boom"
+            db.session.commit()
+            assert db.session.get(PDFDocument, 1).file_path is None
+
+    def test_json_embeddings_become_binary_vectors(self, legacy_app):
+        """Test that JSON embeddings are rewritten as float32 blobs that load like new ones."""
+        with legacy_app.app_context():
+            assert 'embedding_dtype' in columns('document_chunks')
+            stored = load_document_chunks(db.session)
+            assert stored['embeddings'].tolist() == [[1.0, 0.5]]
+            assert stored['texts'] == ['first']
+
+    def test_history_index_serves_keyset_pages(self, legacy_app):
+        """Test that an existing chat_messages table gets the history index and pages need no sort."""
+        with legacy_app.app_context():
+            assert 'ix_chat_messages_session_timestamp_id' in indexes('chat_messages')
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM chat_messages WHERE session_id = 1 "
+                "ORDER BY timestamp DESC, id DESC LIMIT 20")).all()
+            details = " ".join(row[-1] for row in plan)
+            assert 'ix_chat_messages_session_timestamp_id' in details
+            assert 'TEMP B-TREE' not in details
+
+    def test_foreign_keys_are_indexed(self, legacy_app):
+        """Test that existing sessions and chunks tables get their foreign key indexes."""
+        with legacy_app.app_context():
+            assert 'ix_chat_sessions_user_id' in indexes('chat_sessions')
+            assert 'ix_document_chunks_document_id' in indexes('document_chunks')
+
+    def test_sessions_gain_document_scope(self, legacy_app):
+        """Test that existing sessions get the nullable, indexed document_id foreign key."""
+        with legacy_app.app_context():
+            assert 'ix_chat_sessions_document_id' in indexes('chat_sessions')
+            foreign_keys = inspect(db.engine).get_foreign_keys('chat_sessions')
+            assert any(fk['constrained_columns'] == ['document_id'] and fk['referred_table'] == 'pdf_documents'
+                       for fk in foreign_keys)
+            session = db.session.get(ChatSession, 1)
+            assert session.document_id is None
+            session.document_id = 1
+            db.session.commit()
+
+    def test_upgrade_is_idempotent(self, legacy_app):
+        """Test that running the upgrade on an up-to-date schema changes nothing."""
+        with legacy_app.app_context():
+            tables = inspect(db.engine).get_table_names()
+            before = {table: (columns(table), indexes(table)) for table in tables}
+            upgrade_schema(db.engine)
+            assert {table: (columns(table), indexes(table)) for table in tables} == before
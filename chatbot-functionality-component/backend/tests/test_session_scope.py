@@ -0,0 +1,50 @@
+"""Unit tests for document-scoped chat sessions."""
+
+import pytest
+from unittest.mock import patch
+from app import db
+from app.models import User, ChatSession, PDFDocument
+
+@pytest.fixture
+def app(db_app):
+    """Create an application with one user and document."""
+    app = db_app
+    with app.app_context():
+        db.session.add(User(id=1, username='testuser'))
+        db.session.add(PDFDocument(id=4, filename='manual.pdf', status='completed'))
+        db.session.commit()
+    return app
+
+CONTEXT = [{'text': 'From the manual.', 'score': 0.1, 'document_info': {'document_id': '4'}}]
+
+class TestSessionScope:
+    """Test cases for sessions bound to a document."""
+
+    def test_create_session_with_document(self, app, db_client):
+        """Test that a session can be bound to an existing document."""
+        response = db_client.post('/api/chat/sessions', json={'user_id': 1, 'document_id': 4})
+
+        assert response.status_code == 201
+        assert response.get_json()['document_id'] == 4
+        with app.app_context():
+            assert db.session.get(ChatSession, response.get_json()['session_id']).document_id == 4
+
+    def test_create_session_with_unknown_document(self, app, db_client):
+        """Test that binding a session to a missing document is rejected."""
+        response = db_client.post('/api/chat/sessions', json={'user_id': 1, 'document_id': 99})
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize('document_id, scope', [(4, ['4']), (None, None)])
+    def test_messages_search_the_session_scope(self, app, db_client, document_id, scope):
+        """Test that message retrieval is limited to the session's document, if any."""
+        session_id = db_client.post('/api/chat/sessions',
+                                    json={'user_id': 1, 'document_id': document_id}).get_json()['session_id']
+
+        with patch('app.routes.rag_service.search', return_value=CONTEXT) as mock_search:
+            sent = db_client.post(f'/api/chat/sessions/{session_id}/messages', json={'content': 'How?'})
+            streamed = db_client.post(f'/api/chat/sessions/{session_id}/messages/stream', json={'content': 'How?'})
+            streamed.get_data()
+
+        assert sent.status_code == 200
+        assert [call.args for call in mock_search.call_args_list] == [('How?', 5, scope)] * 2
@@ -0,0 +1,256 @@
+"""Unit tests for the vector index factory."""
+
+import pytest
+import numpy as np
+import faiss
+from app.services.vector_index import VectorIndexFactory, ShardedIndex, clone_index, stored_ids, recall_latency_report, \
+    _exact_neighbours
+
+@pytest.fixture
+def vectors():
+    """Create reproducible random vectors with chunk IDs."""
+    rng = np.random.default_rng(42)
+    return rng.random((2000, 16), dtype=np.float32), np.arange(100, 2100, dtype=np.int64)
+
+def build(factory, vectors):
+    """Add vectors to a fresh index, promoting it when the factory asks for it."""
+    data, ids = vectors
+    return factory.add(factory.create(data.shape[1]), data, ids)
+
+class TestVectorIndexFactory:
+    """Test cases for VectorIndexFactory."""
+
+    def test_unknown_index_type(self):
+        """Test that unsupported index types are rejected."""
+        with pytest.raises(ValueError):
+            VectorIndexFactory('annoy')
+
+    @pytest.mark.parametrize('index_type', ['flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq8', 'sq_fp16', 'pq'])
+    def test_search_returns_chunk_ids(self, index_type, vectors):
+        """Test that every index type returns external chunk IDs."""
+        factory = VectorIndexFactory(index_type, {'nlist': 16, 'nprobe': 16, 'pq_m': 4, 'pq_nbits': 4,
+                                                  'train_size': 1000})
+        index = build(factory, vectors)
+        data, ids = vectors
+
+        assert index.ntotal == len(ids)
+        _, found = index.search(data[:1], 1)
+        assert found[0][0] == ids[0]
+
+    def test_training_waits_for_enough_vectors(self, vectors):
+        """Test that an IVF index stays on the flat staging index until train_size is reached."""
+        data, ids = vectors
+        factory = VectorIndexFactory('ivf_flat', {'nlist': 16, 'train_size': 1000})
+        index = factory.create(data.shape[1])
+        index.add_with_ids(data[:500], ids[:500])
+        assert not factory.should_promote(index)
+
+        index.add_with_ids(data[500:], ids[500:])
+        assert factory.should_promote(index)
+        assert type(factory.promote(index)).__name__ == 'IndexIVFFlat'
+
+    @pytest.mark.parametrize('index_type, refine', [('ivf_flat', None), ('hnsw', None), ('sq8', None),
+                                                   ('sq8', 'flat'), ('ivf_pq', 'fp16')])
+    def test_remove_ids(self, index_type, refine, vectors):
+        """Test removal for indexes with and without native remove_ids support."""
+        factory = VectorIndexFactory(index_type, {'nlist': 16, 'pq_m': 4, 'pq_nbits': 4, 'train_size': 1000,
+                                                  'refine': refine})
+        index = build(factory, vectors)
+        assert factory.supports_removal(index) == (index_type != 'hnsw' and refine is None)
+        index = factory.remove_ids(index, vectors[1][:10])
+
+        assert index.ntotal == len(vectors[1]) - 10
+        _, found = index.search(vectors[0][:10], 1)
+        assert not set(found[:, 0]) & set(vectors[1][:10])
+
+    def test_refine_reranks_with_exact_vectors(self, vectors):
+        """Test that a flat refine stage restores exact top-k results on a product-quantized index."""
+        data, ids = vectors
+        exact = build(VectorIndexFactory('flat'), vectors)
+        coarse = build(VectorIndexFactory('pq', {'pq_m': 4, 'pq_nbits': 6, 'train_size': 1000}), vectors)
+        refined = build(VectorIndexFactory('pq', {'pq_m': 4, 'pq_nbits': 6, 'train_size': 1000,
+                                                  'refine': 'flat', 'refine_k_factor': 10}), vectors)
+
+        _, truth = exact.search(data[:50], 5)
+        _, found_coarse = coarse.search(data[:50], 5)
+        _, found_refined = refined.search(data[:50], 5)
+        assert faiss.downcast_index(refined.index).k_factor == 10
+        recall = lambda found: np.mean([len(set(a) & set(b)) / 5 for a, b in zip(found, truth)])
+        assert recall(found_refined) > recall(found_coarse)
+        assert recall(found_refined) >= 0.95
+        np.testing.assert_allclose(refined.reconstruct_batch(ids[:3]), data[:3])
+
+    def test_refine_ignored_for_exact_types(self):
+        """Test that refine only applies to quantized index types and rejects unknown stages."""
+        assert VectorIndexFactory('flat', {'refine': 'flat'}).params['refine'] is None
+        assert VectorIndexFactory('sq8', {'refine': 'fp16'}).params['refine'] == 'fp16'
+        with pytest.raises(ValueError):
+            VectorIndexFactory('sq8', {'refine': 'int4'})
+
+    @pytest.mark.parametrize('index_type', ['pq', 'ivf_pq'])
+    def test_product_quantizers_skip_polysemous_training(self, index_type):
+        """Test that product quantizers are built without the slow polysemous training step."""
+        factory = VectorIndexFactory(index_type, {'nlist': 4, 'pq_m': 4})
+        index = factory._build(16)
+        while not hasattr(index, 'do_polysemous_training'):
+            index = faiss.downcast_index(index.index)
+        assert not index.do_polysemous_training
+
+    @pytest.mark.parametrize('index_type', ['flat', 'ivf_flat', 'hnsw', 'sq8'])
+    def test_cosine_metric_scores_are_similarities(self, index_type, vectors):
+        """Test that cosine mode builds inner-product indexes whose scores are cosine similarities."""
+        data, ids = vectors
+        factory = VectorIndexFactory(index_type, {'metric': 'cosine', 'nlist': 16, 'nprobe': 16,
+                                                  'train_size': 1000})
+        index = factory.add(factory.create(data.shape[1]), factory.normalize(data), ids)
+        queries = data[:5] * 3.0
+
+        scores, found = index.search(factory.normalize(queries), 3)
+        assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+        assert found[:, 0].tolist() == ids[:5].tolist()
+        assert np.all(np.diff(scores, axis=1) <= 0)
+        unit = data / np.linalg.norm(data, axis=1, keepdims=True)
+        expected = (unit[found - ids[0]] * unit[:5, None, :]).sum(axis=2)
+        np.testing.assert_allclose(scores, expected, atol=0.02)
+
+    def test_normalize_copies_input(self, vectors):
+        """Test that normalize returns unit rows without modifying its input, and only in cosine mode."""
+        data = vectors[0][:3].astype(np.float64) * 5.0
+        original = data.copy()
+
+        normalized = VectorIndexFactory('flat', {'metric': 'cosine'}).normalize(data)
+        np.testing.assert_allclose(np.linalg.norm(normalized, axis=1), 1.0, rtol=1e-6)
+        np.testing.assert_array_equal(data, original)
+        assert normalized.dtype == np.float32
+        np.testing.assert_allclose(VectorIndexFactory('flat').normalize(data), original, rtol=1e-6)
+        with pytest.raises(ValueError):
+            VectorIndexFactory('flat', {'metric': 'dot'})
+
+    def test_recall_latency_report(self, vectors):
+        """Test that recall improves as more IVF lists are probed."""
+        data, ids = vectors
+        factory = VectorIndexFactory('ivf_flat', {'nlist': 32, 'train_size': 2000})
+        index = build(factory, vectors)
+
+        report = recall_latency_report(index, data, ids, data[:50], k=5,
+                                       settings=[{'nprobe': 1}, {'nprobe': 32}], factory=factory)
+        assert [row['nprobe'] for row in report] == [1, 32]
+        assert report[1]['recall_at_k'] == pytest.approx(1.0)
+        assert report[0]['recall_at_k'] <= report[1]['recall_at_k']
+        assert all(row['p99_ms'] >= row['p50_ms'] for row in report)
+
+    def test_recall_report_reconstructs_ground_truth(self, vectors):
+        """Test that exact neighbours merged from reconstructed blocks match a full exact search."""
+        data, ids = vectors
+        factory = VectorIndexFactory('ivf_flat', {'nlist': 32, 'train_size': 2000})
+        index = build(factory, vectors)
+        exact = faiss.IndexIDMap2(faiss.IndexFlat(data.shape[1], index.metric_type))
+        exact.add_with_ids(data, ids)
+        _, expected = exact.search(data[:20], 5)
+
+        np.testing.assert_array_equal(_exact_neighbours(index, ids, data[:20], 5, batch_size=300), expected)
+        report = recall_latency_report(index, None, ids, data[:50], k=5, settings=[{'nprobe': 32}], factory=factory)
+        assert report[0]['recall_at_k'] == pytest.approx(1.0)
+
+class TestShardedIndex:
+    """Test cases for sharded indexes built by VectorIndexFactory."""
+
+    def test_merged_results_match_single_index(self, vectors):
+        """Test that merging per-shard top-k gives the same neighbours as one exact index."""
+        data, ids = vectors
+        sharded = build(VectorIndexFactory('flat', {'num_shards': 4, 'shard_workers': 2}), vectors)
+        single = build(VectorIndexFactory('flat', {'num_shards': 1}), vectors)
+
+        assert isinstance(sharded, ShardedIndex)
+        assert sharded.ntotal == len(ids)
+        assert all(shard.ntotal for shard in sharded.shards)
+        expected_distances, expected_ids = single.search(data[:20], 10)
+        distances, found = sharded.search(data[:20], 10)
+        np.testing.assert_array_equal(found, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    def test_merge_orders_cosine_scores_descending(self, vectors):
+        """Test that merged inner-product results keep the highest similarities first."""
+        data, ids = vectors
+        params = {'metric': 'cosine', 'num_shards': 4}
+        sharded = VectorIndexFactory('flat', params)
+        single = VectorIndexFactory('flat', dict(params, num_shards=1))
+        sharded_index = build(sharded, (sharded.normalize(data), ids))
+        single_index = build(single, (single.normalize(data), ids))
+
+        expected_scores, expected_ids = single_index.search(single.normalize(data[:20]), 10)
+        scores, found = sharded_index.search(sharded.normalize(data[:20]), 10)
+        np.testing.assert_array_equal(found, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_documents_stay_in_one_shard(self, vectors):
+        """Test that the factory places all vectors of a document in its hashed shard."""
+        data, ids = vectors
+        factory = VectorIndexFactory('flat', {'num_shards': 3})
+        index = factory.create(data.shape[1])
+        index = factory.add(index, data[:50], ids[:50], document_id='report.pdf')
+
+        shard = index.shard_for('report.pdf')
+        assert index.shards[shard].ntotal == 50
+        assert shard == ShardedIndex(index.shards).shard_for('report.pdf')
+
+    def test_pads_when_fewer_than_k_vectors(self, vectors):
+        """Test that missing neighbours are padded with -1 behind real hits."""
+        data, ids = vectors
+        factory = VectorIndexFactory('flat', {'num_shards': 3})
+        index = factory.add(factory.create(data.shape[1]), data[:2], ids[:2], document_id='doc1')
+
+        _, found = index.search(data[:1], 5)
+        assert found[0][0] == ids[0]
+        assert found[0].tolist().count(-1) == 3
+
+    def test_shards_are_trained_independently(self, vectors):
+        """Test that each shard is promoted once it has collected train_size vectors."""
+        data, ids = vectors
+        factory = VectorIndexFactory('ivf_flat', {'nlist': 4, 'nprobe': 4, 'train_size': 200, 'num_shards': 2})
+        index = build(factory, vectors)
+
+        assert all(type(shard).__name__ == 'IndexIVFFlat' for shard in index.shards)
+        _, found = index.search(data[:1], 1)
+        assert found[0][0] == ids[0]
+        assert sorted(stored_ids(index).tolist()) == ids.tolist()
+        np.testing.assert_allclose(index.reconstruct_batch(ids[[5, 1500]]), data[[5, 1500]])
+
+    def test_document_vectors_are_read_from_their_shard(self, vectors, monkeypatch):
+        """Test that a document's vectors are reconstructed from its shard without scanning the others."""
+        data, ids = vectors
+        factory = VectorIndexFactory('flat', {'num_shards': 4})
+        index = factory.create(data.shape[1])
+        for number, document_id in enumerate(['doc0', 'doc1', 'doc2']):
+            factory.add(index, data[number * 100:(number + 1) * 100], ids[number * 100:(number + 1) * 100],
+                        document_id)
+        scans = []
+        monkeypatch.setattr('app.services.vector_index.stored_ids', lambda shard: scans.append(shard))
+
+        np.testing.assert_allclose(factory.reconstruct(index, ids[100:200], 'doc1'), data[100:200])
+        assert not scans
+        with pytest.raises(RuntimeError):
+            index.reconstruct_batch(ids[100:200], (index.shard_for('doc1') + 1) % 4)
+
+    def test_remove_and_clone(self, vectors):
+        """Test that removal reaches every shard and clones are independent."""
+        data, ids = vectors
+        factory = VectorIndexFactory('hnsw', {'num_shards': 2})
+        index = factory.remove_ids(build(factory, vectors), ids[:10])
+        copy = clone_index(index)
+        factory.remove_ids(copy, ids[10:20])
+
+        assert index.ntotal == len(ids) - 10
+        assert copy.ntotal == len(ids) - 20
+        _, found = index.search(data[:10], 1)
+        assert not set(found[:, 0]) & set(ids[:10])
+
+    def test_search_limits_openmp_threads(self, vectors, monkeypatch):
+        """Test that the configured OpenMP thread count is applied before searching."""
+        calls = []
+        monkeypatch.setattr(faiss, 'omp_set_num_threads', calls.append)
+        factory = VectorIndexFactory('flat', {'search_threads': 3})
+        index = build(factory, vectors)
+
+        factory.search(index, vectors[0][:1], 1)
+        assert calls == [3]